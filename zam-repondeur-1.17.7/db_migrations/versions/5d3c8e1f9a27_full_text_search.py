@@ -0,0 +1,83 @@
+"""Full-text search on amendements
+
+Revision ID: 5d3c8e1f9a27
+Revises: 4f517bb53d67
+Create Date: 2026-10-18 10:12:31.482113
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+# revision identifiers, used by Alembic.
+revision = "5d3c8e1f9a27"
+down_revision = "4f517bb53d67"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+TSV_COLUMNS = {
+    "amendements": ["expose", "corps"],
+    "amendement_user_contents": ["objet", "reponse", "comments"],
+}
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("CREATE TEXT SEARCH CONFIGURATION zam_french (COPY = french)")
+    op.execute(
+        """
+        ALTER TEXT SEARCH CONFIGURATION zam_french
+        ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem
+        """
+    )
+    for table, fields in TSV_COLUMNS.items():
+        for field in fields:
+            op.add_column(table, sa.Column(f"{field}_tsv", TSVECTOR(), nullable=True))
+        backfill(table, fields)
+        # Indexes are created once the columns are filled, which is much faster
+        for field in fields:
+            op.create_index(
+                f"ix_{table}__{field}_tsv",
+                table,
+                [f"{field}_tsv"],
+                postgresql_using="gin",
+            )
+
+
+def backfill(table, fields):
+    connection = op.get_bind()
+    assignments = ", ".join(
+        f"{field}_tsv = to_tsvector('zam_french', coalesce({field}_search, ''))"
+        for field in fields
+    )
+    statement = sa.text(
+        f"""
+        UPDATE {table} SET {assignments}
+        WHERE pk IN (
+            SELECT pk FROM {table} WHERE pk > :last_pk ORDER BY pk LIMIT :batch_size
+        )
+        RETURNING pk
+        """
+    )
+    last_pk = 0
+    while True:
+        pks = [
+            row[0]
+            for row in connection.execute(
+                statement, last_pk=last_pk, batch_size=BATCH_SIZE
+            )
+        ]
+        if not pks:
+            break
+        last_pk = max(pks)
+        print(f"{table}: {len(pks)} lignes indexées jusqu'à pk={last_pk}")
+
+
+def downgrade():
+    for table, fields in TSV_COLUMNS.items():
+        for field in fields:
+            op.drop_index(f"ix_{table}__{field}_tsv", table_name=table)
+            op.drop_column(table, f"{field}_tsv")
+    op.execute("DROP TEXT SEARCH CONFIGURATION zam_french")
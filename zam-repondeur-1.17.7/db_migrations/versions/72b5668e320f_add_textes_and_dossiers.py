@@ -6,13 +6,17 @@ Create Date: 2019-04-04 14:13:37.173464
 
 """
 from datetime import datetime
+from typing import Dict
 
 import sqlalchemy as sa
 from alembic import op
 
+from zam_repondeur.services.fetch.an.common import download_remote_zip
 from zam_repondeur.services.fetch.an.dossiers.dossiers_legislatifs import (
-    get_dossiers_legislatifs_and_textes,
+    get_url_dossiers,
+    iter_dossiers_legislatifs_and_textes_members,
 )
+from zam_repondeur.services.fetch.an.dossiers.models import DossierRef
 
 LEGISLATURES = [14, 15]
 
@@ -81,7 +85,7 @@ def upgrade():
     )
 
     # Get the data
-    dossiers_by_uid, _ = get_dossiers_legislatifs_and_textes(*LEGISLATURES)
+    dossiers_by_uid = get_dossiers_legislatifs(*LEGISLATURES)
 
     now = datetime.utcnow()
 
@@ -136,6 +140,23 @@ def upgrade():
     op.drop_column("lectures", "dossier_legislatif")
 
 
+def get_dossiers_legislatifs(*legislatures: int) -> Dict[str, DossierRef]:
+    all_dossiers: Dict[str, DossierRef] = {}
+    for legislature in legislatures:
+        downloaded = download_remote_zip(get_url_dossiers(legislature))
+        if downloaded is None:
+            continue
+        archive, _ = downloaded
+        with archive:
+            for member in iter_dossiers_legislatifs_and_textes_members(
+                legislature, archive
+            ):
+                for ref in member.items or []:
+                    if isinstance(ref, DossierRef):
+                        all_dossiers[ref.uid] = ref
+    return all_dossiers
+
+
 def _find_texte_from_lecture(connection, lecture):
     if lecture.chambre == "an":
         chambre = "AN"
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def redis_url():
+    from redis import Redis
+    from redis.exceptions import ConnectionError
+
+    url = os.environ.get("ZAM_TEST_REDIS_URL", "redis://localhost:6379/15")
+    try:
+        Redis.from_url(url).ping()
+    except ConnectionError:
+        pytest.skip(f"Redis is not available at {url}")
+    return url
+
+
+@pytest.fixture
+def progress_repository(redis_url):
+    from zam_repondeur.services.progress import repository
+
+    repository.initialize(redis_url=redis_url)
+    repository.max_duration = 10
+    repository.export_max_duration = 60
+    repository.clear_data()
+    yield repository
+    repository.clear_data()
+
+
+@pytest.fixture(scope="session")
+def huey(redis_url):
+    from zam_repondeur.tasks.huey import init_huey
+
+    return init_huey({"zam.tasks.redis_url": redis_url, "zam.tasks.immediate": "True"})
@@ -0,0 +1,124 @@
+from concurrent.futures import Future
+
+import pytest
+
+
+class FakeRemote:
+    """
+    Amendements that exist on the remote side, and the numbers we asked for
+    """
+
+    def __init__(self, nums):
+        self.nums = set(nums)
+        self.requested = []
+
+    def retrieve(self, lecture, numeros_prefixe):
+        from zam_repondeur.exceptions.alert import AlertOnData
+
+        futures = []
+        for numero in numeros_prefixe:
+            num = int(numero)
+            self.requested.append(num)
+            future = Future()
+            if num in self.nums:
+                future.set_result(num)
+            else:
+                future.set_exception(AlertOnData("Not found", "http", 404))
+            futures.append(future)
+        return futures
+
+    @staticmethod
+    def process(lecture, retrieved, collected):
+        found = {num for num, future in retrieved if future.exception() is None}
+        missing = {num for num, future in retrieved if num not in found}
+        collected[0].extend(sorted(found))
+        return found, missing
+
+
+@pytest.fixture
+def missing_nums(monkeypatch):
+    from zam_repondeur.services.amendements import repository
+
+    cached = {}
+    monkeypatch.setattr(repository, "get_missing_nums", lambda pk: set(cached))
+    monkeypatch.setattr(
+        repository,
+        "add_missing_nums",
+        lambda pk, nums: cached.update(dict.fromkeys(nums)),
+    )
+    return cached
+
+
+def _explore(remote, max_num_seen, max_404=10, discussion_nums=()):
+    from zam_repondeur.models import Lecture
+    from zam_repondeur.services.fetch.an.amendements import AssembleeNationale
+
+    source = AssembleeNationale()
+    source._retrieve_amendements = remote.retrieve
+    source._process_amendements_other = remote.process
+    collected = ([], [], [], [])
+    max_num = source._explore_adaptive(
+        Lecture(pk=1, amendements=[]),
+        set(discussion_nums),
+        "",
+        max_404,
+        max_num_seen,
+        collected,
+    )
+    return max_num, collected[0]
+
+
+def test_finds_amendements_past_the_known_ones(missing_nums):
+    remote = FakeRemote(list(range(1, 101)) + [103])
+
+    max_num, found = _explore(remote, max_num_seen=100)
+
+    assert max_num == 103
+    assert 103 in found
+
+
+def test_scans_max_404_numbers_past_the_last_one_found(missing_nums):
+    remote = FakeRemote(list(range(1, 101)) + [108, 117])
+
+    max_num, found = _explore(remote, max_num_seen=100)
+
+    assert max_num == 117
+    assert set(range(101, 128)) <= set(remote.requested)
+    assert len(remote.requested) == len(set(remote.requested))  # no duplicates
+
+
+def test_stops_after_max_404_missing_numbers(missing_nums):
+    remote = FakeRemote(list(range(1, 101)) + [111])
+
+    max_num, found = _explore(remote, max_num_seen=100)
+
+    assert max_num == 100
+    assert 111 not in remote.requested
+
+
+def test_does_not_remember_missing_numbers_past_the_last_amendement(missing_nums):
+    remote = FakeRemote([1, 3])
+
+    _explore(remote, max_num_seen=5)
+
+    assert set(missing_nums) == {2}
+
+
+def test_explores_past_the_amendements_in_discussion(missing_nums):
+    # Amendements in discussion are not retrieved again
+    remote = FakeRemote([1, 2, 3, 25])
+
+    max_num, found = _explore(remote, max_num_seen=20, discussion_nums=[20])
+
+    assert max_num == 25
+
+
+def test_skips_numbers_known_to_be_missing(missing_nums):
+    missing_nums.update(dict.fromkeys([2, 4]))
+    remote = FakeRemote([1, 3, 5])
+
+    max_num, found = _explore(remote, max_num_seen=5)
+
+    assert max_num == 5
+    assert 2 not in remote.requested
+    assert 4 not in remote.requested
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    from zam_repondeur.services.fetch.cache import SQLiteHTTPCache
+
+    cache = SQLiteHTTPCache(str(tmp_path / "http_cache.sqlite"), max_size=1000)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def redis_cache(redis_url):
+    from redis import Redis
+
+    from zam_repondeur.services.fetch.cache import RedisHTTPCache
+
+    connection = Redis.from_url(redis_url)
+    connection.flushdb()
+    yield RedisHTTPCache(connection, max_size=1000)
+    connection.flushdb()
+
+
+def _accessed(cache, key):
+    with cache._connection() as connection:
+        return connection.execute(
+            "SELECT accessed FROM entries WHERE key = ?", (key,)
+        ).fetchone()[0]
+
+
+def test_sqlite_read_does_not_write_a_recent_access_time(sqlite_cache):
+    sqlite_cache.set("url", b"content")
+    accessed = _accessed(sqlite_cache, "url")
+
+    assert sqlite_cache.get("url") == b"content"
+
+    assert _accessed(sqlite_cache, "url") == accessed
+
+
+def test_sqlite_read_updates_an_old_access_time(sqlite_cache):
+    sqlite_cache.set("url", b"content")
+    with sqlite_cache._connection() as connection:
+        connection.execute("UPDATE entries SET accessed = 0")
+
+    assert sqlite_cache.get("url") == b"content"
+
+    assert _accessed(sqlite_cache, "url") > 0
+
+
+def test_sqlite_counters_are_up_to_date_in_stats(sqlite_cache):
+    sqlite_cache.set("url", b"content")
+
+    sqlite_cache.get("url")
+    sqlite_cache.get("url")
+    sqlite_cache.get("other")
+
+    stats = sqlite_cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_sqlite_size_counts_each_entry_once(sqlite_cache):
+    sqlite_cache.set("url", b"a" * 10)
+    size = sqlite_cache.stats()["size"]
+    assert size > 0
+
+    sqlite_cache.set("url", b"a" * 10)
+    assert sqlite_cache.stats()["size"] == size
+
+    sqlite_cache.delete("url")
+    sqlite_cache.delete("url")
+    assert sqlite_cache.stats()["size"] == 0
+
+
+def test_sqlite_evicts_least_recently_used_entries(sqlite_cache):
+    sqlite_cache.max_size = 1500
+    sqlite_cache.set("old", os.urandom(1000))
+    sqlite_cache.set("new", os.urandom(1000))
+
+    assert sqlite_cache.get("old") is None
+    assert sqlite_cache.stats()["size"] <= 1500
+
+
+def test_redis_size_counts_each_entry_once(redis_cache):
+    redis_cache.set("url", b"a" * 10)
+    size = redis_cache.stats()["size"]
+    assert size > 0
+
+    redis_cache.set("url", b"a" * 10)
+    assert redis_cache.stats()["size"] == size
+
+    redis_cache.delete("url")
+    redis_cache.delete("url")
+    assert redis_cache.stats()["size"] == 0
+
+
+def test_redis_evicts_least_recently_used_entries(redis_cache):
+    redis_cache.max_size = 1500
+    redis_cache.set("old", os.urandom(1000))
+    redis_cache.set("new", os.urandom(1000))
+
+    assert redis_cache.get("old") is None
+    assert redis_cache.stats()["size"] <= 1500
+
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+
+def test_results_are_in_input_order():
+    from zam_repondeur.services.fetch.parallel import map_ordered
+
+    futures = map_ordered(lambda n: n * 2, [3, 1, 2], max_workers=3)
+
+    assert [future.result() for future in futures] == [6, 2, 4]
+
+
+def test_pending_calls_are_cancelled_when_stopping_early():
+    from zam_repondeur.services.fetch.parallel import cancel_pending, map_ordered
+
+    release = threading.Event()
+
+    def download(n):
+        if n == 0:
+            raise ValueError("Boom")
+        release.wait(timeout=5)
+        return n
+
+    futures = map_ordered(download, range(10), max_workers=2)
+    with pytest.raises(ValueError):
+        with cancel_pending(futures):
+            for future in futures:
+                future.result()
+    release.set()
+
+    # At most one call per worker was running when we stopped
+    assert all(future.cancelled() for future in futures[3:])
+
+
+def test_each_thread_gets_its_own_session():
+    from zam_repondeur.services.fetch.http import ThreadLocalSession
+
+    session = ThreadLocalSession(object)
+    sessions = [session.session]
+    thread = threading.Thread(target=lambda: sessions.append(session.session))
+    thread.start()
+    thread.join()
+
+    assert session.session is sessions[0]
+    assert sessions[1] is not sessions[0]
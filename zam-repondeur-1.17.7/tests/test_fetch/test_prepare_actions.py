@@ -0,0 +1,65 @@
+from zam_repondeur.models.division import SubDiv
+
+
+def _create_amendement(num, subdiv, parent_num_raw=""):
+    from zam_repondeur.services.fetch.amendements import CreateAmendement
+
+    return CreateAmendement(
+        num=num,
+        subdiv=subdiv,
+        parent_num_raw=parent_num_raw,
+        rectif=0,
+        position=num,
+        id_discussion_commune=None,
+        id_identique=None,
+        matricule="",
+        groupe="",
+        auteur="",
+        mission_titre=None,
+        mission_titre_court=None,
+        corps="",
+        expose="",
+        sort="",
+    )
+
+
+def test_new_article_and_sous_amendement_of_new_amendement():
+    from zam_repondeur.models import Lecture
+    from zam_repondeur.services.fetch.amendements import prepare_actions
+
+    lecture = Lecture(amendements=[], articles=[])
+    subdiv = SubDiv("article", "2", "", "")
+    actions = [
+        _create_amendement(1, subdiv),
+        _create_amendement(2, subdiv, parent_num_raw="1"),
+    ]
+
+    prepare_actions(lecture, actions)
+    for action in actions:
+        action.apply(lecture)
+
+    assert len(lecture.articles) == 1
+    article = lecture.articles[0]
+    assert article.subdiv == subdiv
+
+    amendement, sous_amendement = sorted(lecture.amendements, key=lambda a: a.num)
+    assert amendement.article is article
+    assert amendement.parent is None
+    assert sous_amendement.article is article
+    assert sous_amendement.parent is amendement
+
+
+def test_existing_article_is_not_created_again():
+    from zam_repondeur.models import Lecture
+    from zam_repondeur.services.fetch.amendements import prepare_actions
+
+    lecture = Lecture(amendements=[], articles=[])
+    subdiv = SubDiv("article", "2", "", "")
+    article, _ = lecture.find_or_create_article(subdiv)
+    action = _create_amendement(1, subdiv)
+
+    prepare_actions(lecture, [action])
+    action.apply(lecture)
+
+    assert lecture.articles == [article]
+    assert lecture.amendements[0].article is article
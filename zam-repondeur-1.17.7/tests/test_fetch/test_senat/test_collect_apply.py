@@ -0,0 +1,108 @@
+import pytest
+
+from zam_repondeur.models.division import SubDiv
+
+SUBDIV = SubDiv("article", "3", "bis", "")
+
+
+def _data(num):
+    from zam_repondeur.services.fetch.senat.amendements import SenatAmendementData
+
+    return SenatAmendementData(
+        num=num,
+        rectif=0,
+        subdiv=SUBDIV,
+        corps=f"Corps {num}",
+        expose=f"Exposé {num}",
+        sort="",
+        alinea="",
+        auteur="M. DUPONT",
+        matricule="01234X",
+        date_depot=None,
+    )
+
+
+def _details(num, parent_num=None):
+    from zam_repondeur.services.fetch.senat.derouleur import DiscussionDetails
+
+    return DiscussionDetails(
+        num=num,
+        position=num,
+        id_discussion_commune=None,
+        id_identique=None,
+        parent_num=parent_num,
+        mission_ref=None,
+    )
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    from zam_repondeur.services.data import repository
+    from zam_repondeur.services.fetch.senat import amendements
+
+    # The sous-amendement comes first in the file
+    parsed = [_data(2), _data(1)]
+    monkeypatch.setattr(
+        amendements, "_fetch_all", lambda lecture: ("url", "", iter(parsed))
+    )
+    monkeypatch.setattr(
+        amendements.Senat, "_parse_rows", lambda self, rows, lecture: list(rows)
+    )
+    monkeypatch.setattr(
+        amendements,
+        "fetch_and_parse_discussion_details",
+        lambda lecture: [_details(1), _details(2, parent_num=1)],
+    )
+    monkeypatch.setattr(repository, "get_senateurs", lambda matricules: {})
+
+
+def test_collect_does_not_change_the_lecture(remote):
+    from zam_repondeur.models import Lecture
+    from zam_repondeur.services.fetch.senat.amendements import Senat
+
+    lecture = Lecture(amendements=[], articles=[])
+
+    changes = Senat().collect_changes(lecture)
+
+    assert [action.num for action in changes.actions] == [1, 2]
+    assert lecture.articles == []
+    assert lecture.amendements == []
+
+
+def test_apply_creates_a_new_subdivision_once(remote):
+    from zam_repondeur.models import Lecture
+    from zam_repondeur.services.fetch.amendements import prepare_actions
+    from zam_repondeur.services.fetch.senat.amendements import Senat
+
+    lecture = Lecture(amendements=[], articles=[])
+    changes = Senat().collect_changes(lecture)
+
+    prepare_actions(lecture, changes.actions)
+    for action in changes.actions:
+        action.apply(lecture)
+
+    assert len(lecture.articles) == 1
+    article = lecture.articles[0]
+    assert article.subdiv == SUBDIV
+
+    amendement, sous_amendement = sorted(lecture.amendements, key=lambda a: a.num)
+    assert amendement.article is article
+    assert amendement.corps == "Corps 1"
+    assert sous_amendement.article is article
+    assert sous_amendement.parent is amendement
+    assert sous_amendement.position == 2
+
+
+def test_apply_does_nothing_without_the_derouleur():
+    from zam_repondeur.models import Lecture
+    from zam_repondeur.services.fetch.amendements import CollectedChanges
+    from zam_repondeur.services.fetch.senat.amendements import Senat
+
+    lecture = Lecture(amendements=[], articles=[])
+
+    result = Senat().apply_changes(
+        lecture, CollectedChanges.create(derouleur_fetch_success=False)
+    )
+
+    assert result.amendements == []
+    assert lecture.articles == []
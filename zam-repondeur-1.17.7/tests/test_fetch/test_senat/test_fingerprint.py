@@ -0,0 +1,73 @@
+import pytest
+import transaction
+
+TSV = (
+    "Amendements\n"
+    "Subdivision\tNuméro\tDispositif\tObjet\tSort\tAlinéa\tAuteur\t"
+    "Fiche Sénateur\tDate de dépôt\n"
+).encode("cp1252")
+
+URL = "https://www.senat.fr/amendements/2019-2020/139/jeu_complet_2019-2020_139.csv"
+
+
+class FakeResponse:
+    status_code = 200
+    content = TSV
+
+
+class FakeSession:
+    def get(self, url):
+        return FakeResponse()
+
+
+@pytest.fixture
+def fingerprints(monkeypatch):
+    from zam_repondeur.services.fetch.http import fingerprints_repository
+    from zam_repondeur.services.fetch.senat import amendements
+
+    stored = {}
+
+    def set_fingerprint(url, digest, **extra):
+        stored[url] = {"digest": digest, **extra}
+
+    monkeypatch.setattr(fingerprints_repository, "get_fingerprint", stored.get)
+    monkeypatch.setattr(fingerprints_repository, "set_fingerprint", set_fingerprint)
+    monkeypatch.setattr(amendements, "get_http_session", FakeSession)
+    monkeypatch.setattr(amendements, "_build_amendements_url", lambda lecture: URL)
+    return stored
+
+
+def _record(lecture, digest):
+    from zam_repondeur.services.fetch.senat.amendements import RecordFingerprint
+
+    with transaction.manager:
+        RecordFingerprint(URL, digest, nums=[1, 2]).apply(lecture)
+
+
+def test_unchanged_file_is_skipped_for_the_same_lecture(fingerprints):
+    from zam_repondeur.models import Lecture
+    from zam_repondeur.services.fetch.exceptions import Unchanged
+    from zam_repondeur.services.fetch.senat.amendements import _fetch_all
+
+    lecture = Lecture(pk=1)
+    url, digest, _ = _fetch_all(lecture)
+    _record(lecture, digest)
+
+    with pytest.raises(Unchanged):
+        _fetch_all(lecture)
+
+
+def test_unchanged_file_is_not_skipped_for_the_other_partie(fingerprints):
+    from zam_repondeur.models import Lecture
+    from zam_repondeur.services.fetch.senat.amendements import _fetch_all
+
+    # Both parties of a PLF are read from the same file
+    partie_1 = Lecture(pk=1, partie=1)
+    partie_2 = Lecture(pk=2, partie=2)
+    url, digest, _ = _fetch_all(partie_1)
+    _record(partie_1, digest)
+
+    url, digest_2, _ = _fetch_all(partie_2)
+
+    assert digest_2 == digest
+    assert len(fingerprints) == 1
@@ -0,0 +1,55 @@
+from zam_repondeur.models.division import SubDiv
+
+
+def test_find_article_created_after_the_index_is_built():
+    from zam_repondeur.models import Lecture
+
+    lecture = Lecture()
+    subdiv = SubDiv("article", "1", "", "")
+    assert lecture.find_article(subdiv) is None  # builds the index
+
+    article, created = lecture.find_or_create_article(subdiv)
+    assert created
+
+    assert lecture.find_article(subdiv) is article
+    assert lecture.find_or_create_article(subdiv) == (article, False)
+    assert lecture.articles == [article]
+
+
+def test_find_amendement_created_after_the_index_is_built():
+    from zam_repondeur.models import Lecture
+
+    lecture = Lecture()
+    article, _ = lecture.find_or_create_article(SubDiv("article", "1", "", ""))
+    assert lecture.find_amendement(42) is None  # builds the index
+
+    amendement, created = lecture.find_or_create_amendement(42, article)
+    assert created
+
+    assert lecture.find_amendement(42) is amendement
+    assert lecture.find_or_create_amendement(42, article) == (amendement, False)
+    assert lecture.amendements == [amendement]
+
+
+def test_find_amendement_attached_through_the_backref():
+    from zam_repondeur.models import Amendement, Lecture
+
+    lecture = Lecture()
+    assert lecture.find_amendement(1) is None  # builds the index
+
+    amendement = Amendement(lecture=lecture, num=1)
+
+    assert lecture.find_amendement(1) is amendement
+
+
+def test_index_is_dropped_when_an_item_is_removed():
+    from zam_repondeur.models import Lecture
+
+    lecture = Lecture()
+    subdiv = SubDiv("article", "1", "", "")
+    article, _ = lecture.find_or_create_article(subdiv)
+    assert lecture.find_article(subdiv) is article
+
+    lecture.articles.remove(article)
+
+    assert lecture.find_article(subdiv) is None
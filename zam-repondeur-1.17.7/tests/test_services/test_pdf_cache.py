@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def fragment_cache(tmp_path):
+    from zam_repondeur.services.import_export.pdf_cache import PdfFragmentCache
+
+    css = tmp_path / "print.css"
+    css.write_text("body {}")
+    return PdfFragmentCache(tmp_path / "cache", css=str(css), max_size=1500)
+
+
+def _set(cache, tmp_path, key, mtime):
+    source = tmp_path / f"{key}.source"
+    source.write_bytes(os.urandom(1000))
+    cache.set(key, source)
+    os.utime(cache._path(key), (mtime, mtime))
+
+
+def test_evicts_least_recently_used_fragments(fragment_cache, tmp_path):
+    _set(fragment_cache, tmp_path, "old", 1000)
+    _set(fragment_cache, tmp_path, "new", 2000)
+
+    fragment_cache.evict()
+
+    assert not fragment_cache._path("old").exists()
+    assert fragment_cache._path("new").exists()
+
+
+def test_evicts_at_most_once_per_interval(fragment_cache, tmp_path):
+    fragment_cache.evict()
+    _set(fragment_cache, tmp_path, "old", 1000)
+    _set(fragment_cache, tmp_path, "new", 2000)
+
+    fragment_cache.evict()
+
+    assert fragment_cache._path("old").exists()
+
+
+def test_key_depends_on_the_stylesheet(fragment_cache, tmp_path):
+    from zam_repondeur.services.import_export.pdf_cache import PdfFragmentCache
+
+    css = tmp_path / "other.css"
+    css.write_text("body { color: red }")
+    other = PdfFragmentCache(tmp_path / "cache", css=str(css))
+
+    assert other.key("<p>") != fragment_cache.key("<p>")
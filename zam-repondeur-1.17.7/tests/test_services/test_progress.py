@@ -0,0 +1,38 @@
+def test_export_is_complete_once_every_lecture_is_counted(progress_repository):
+    progress_repository.start_export_progress(1, "abc", total=2)
+
+    assert not progress_repository.set_lecture_exported(1, "abc", 10, total=2)
+    assert progress_repository.get_export_progress(1) == {"current": 1, "total": 2}
+
+    assert progress_repository.set_lecture_exported(1, "abc", 20, total=2)
+    assert progress_repository.get_export_progress(1) == {"current": 2, "total": 2}
+
+
+def test_retried_lecture_completes_the_export_only_once(progress_repository):
+    progress_repository.start_export_progress(1, "abc", total=1)
+
+    assert progress_repository.set_lecture_exported(1, "abc", 10, total=1)
+    assert not progress_repository.set_lecture_exported(1, "abc", 10, total=1)
+
+
+def test_failed_lectures_are_recorded(progress_repository):
+    progress_repository.start_export_progress(1, "abc", total=2)
+
+    progress_repository.set_lecture_failed(1, "abc", 10)
+
+    assert progress_repository.get_failed_lectures(1, "abc") == {10}
+    assert progress_repository.get_failed_lectures(1, "other") == set()
+
+    progress_repository.reset_export_progress(1, "abc")
+    assert progress_repository.get_failed_lectures(1, "abc") == set()
+
+
+def test_export_ttl_is_pushed_back_on_progress(progress_repository):
+    progress_repository.start_export_progress(1, "abc", total=2)
+    key = progress_repository._key_for_export_progress(1)
+    progress_repository.connection.expire(key, 5)
+
+    progress_repository.set_lecture_exported(1, "abc", 10, total=2)
+
+    # export_max_duration, not max_duration
+    assert progress_repository.connection.ttl(key) > 10 * 60
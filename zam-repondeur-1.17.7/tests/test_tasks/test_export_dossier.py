@@ -0,0 +1,69 @@
+import pytest
+
+
+class FakeTask:
+    def __init__(self, retries):
+        self.retries = retries
+
+
+@pytest.fixture
+def assembled(huey, progress_repository, monkeypatch):
+    from zam_repondeur.tasks import asynchrone
+
+    calls = []
+    monkeypatch.setattr(
+        asynchrone, "assemble_dossier_export", lambda *args: calls.append(args)
+    )
+    monkeypatch.setattr(asynchrone, "progress_repository", progress_repository)
+    return calls
+
+
+def _fail(export_id, lecture_pk):
+    raise RuntimeError("Boom")
+
+
+def test_export_is_assembled_after_the_last_lecture(
+    assembled, progress_repository, monkeypatch
+):
+    from zam_repondeur.tasks import asynchrone
+
+    monkeypatch.setattr(asynchrone, "_export_dossier_lecture", lambda *args: None)
+    progress_repository.start_export_progress(1, "abc", total=2)
+
+    asynchrone.export_dossier_lecture.call_local(1, 2, "abc", 10, 2)
+    assert assembled == []
+
+    asynchrone.export_dossier_lecture.call_local(1, 2, "abc", 20, 2)
+    assert assembled == [(1, 2, "abc")]
+
+
+def test_failing_lecture_is_retried(assembled, progress_repository, monkeypatch):
+    from zam_repondeur.tasks import asynchrone
+
+    monkeypatch.setattr(asynchrone, "_export_dossier_lecture", _fail)
+    progress_repository.start_export_progress(1, "abc", total=1)
+
+    with pytest.raises(RuntimeError):
+        asynchrone.export_dossier_lecture.call_local(
+            1, 2, "abc", 10, 1, task=FakeTask(retries=1)
+        )
+
+    assert assembled == []
+    assert progress_repository.get_export_progress(1)["current"] == 0
+
+
+def test_export_is_assembled_without_a_lecture_out_of_retries(
+    assembled, progress_repository, monkeypatch
+):
+    from zam_repondeur.tasks import asynchrone
+
+    monkeypatch.setattr(asynchrone, "_export_dossier_lecture", _fail)
+    progress_repository.start_export_progress(1, "abc", total=1)
+
+    asynchrone.export_dossier_lecture.call_local(
+        1, 2, "abc", 10, 1, task=FakeTask(retries=0)
+    )
+
+    assert assembled == [(1, 2, "abc")]
+    assert progress_repository.get_failed_lectures(1, "abc") == {10}
+    assert progress_repository.get_export_progress(1) == {"current": 1, "total": 1}
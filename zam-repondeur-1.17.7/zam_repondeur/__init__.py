@@ -26,6 +26,8 @@ BASE_SETTINGS = {
     "zam.refresh.articles": 30,
     # Intervals in seconds for Lecture refresh progress:
     "zam.progress.lecture_refresh": 5,
+    # Duration in minutes without news from an export before we forget about it:
+    "zam.progress.export_max_duration": 24 * 60,
 }
 
 IS_PRODUCTION = True
@@ -76,6 +78,7 @@ def make_app(global_settings: dict, **settings: Any) -> Router:
         config.include("zam_repondeur.services.lectures")
         config.include("zam_repondeur.services.progress")
         config.include("zam_repondeur.services.amendements")
+        config.include("zam_repondeur.services.clean")
         config.include("zam_repondeur.services.fetch.http")
         load_version(config)
         is_production(config)
@@ -2,6 +2,7 @@ import re
 from datetime import date, datetime
 from typing import (
     TYPE_CHECKING,
+    Any,
     Dict,
     Iterable,
     List,
@@ -26,7 +27,8 @@ from sqlalchemy import (
     case,
     func,
 )
-from sqlalchemy.orm import backref, column_property, relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import backref, column_property, deferred, relationship
 
 from zam_repondeur.constants import GROUPS_COLORS
 from zam_repondeur.decorator import reify
@@ -44,6 +46,17 @@ if TYPE_CHECKING:
     from .table import SharedTable, UserTable  # noqa
     from .users import User  # noqa
 
+# French text search configuration, with accents removed (see migration 5d3c8e1f9a27)
+SEARCH_CONFIGURATION = "zam_french"
+
+
+def search_vector(text: Optional[str]) -> Any:
+    """
+    The full-text search vector of a `*_search` text, computed by PostgreSQL
+    """
+    return func.to_tsvector(SEARCH_CONFIGURATION, text or "")
+
+
 DOSSIER_DE_BANC = "Dossier de banc"
 ADD = "add"
 AVIS = [
@@ -164,6 +177,21 @@ class AmendementUserContent(Base):
         Index(
             "ix_amendement_user_contents__amendement_pk", "amendement_pk", unique=True
         ),
+        Index(
+            "ix_amendement_user_contents__objet_tsv",
+            "objet_tsv",
+            postgresql_using="gin",
+        ),
+        Index(
+            "ix_amendement_user_contents__reponse_tsv",
+            "reponse_tsv",
+            postgresql_using="gin",
+        ),
+        Index(
+            "ix_amendement_user_contents__comments_tsv",
+            "comments_tsv",
+            postgresql_using="gin",
+        ),
     )
 
     pk: int = Column(Integer, primary_key=True)
@@ -177,6 +205,11 @@ class AmendementUserContent(Base):
     reponse_search: Optional[str] = Column(Text, nullable=True)
     comments_search: Optional[str] = Column(Text, nullable=True)
 
+    # Index plein texte de ces contenus
+    objet_tsv: Any = deferred(Column(TSVECTOR, nullable=True))
+    reponse_tsv: Any = deferred(Column(TSVECTOR, nullable=True))
+    comments_tsv: Any = deferred(Column(TSVECTOR, nullable=True))
+
     amendement_pk: int = Column(
         Integer, ForeignKey("amendements.pk", ondelete="cascade"), nullable=False
     )
@@ -330,6 +363,8 @@ class Amendement(Base):
     __table_args__ = (
         Index("ix_amendements__lecture_pk", "lecture_pk"),
         Index("ix_amendements__parent_pk", "parent_pk"),
+        Index("ix_amendements__expose_tsv", "expose_tsv", postgresql_using="gin"),
+        Index("ix_amendements__corps_tsv", "corps_tsv", postgresql_using="gin"),
         UniqueConstraint("num", "lecture_pk"),
         UniqueConstraint("position", "lecture_pk"),
     )
@@ -366,6 +401,13 @@ class Amendement(Base):
         Text, nullable=True
     )  # alias dispositif (légistique)
 
+    # Index plein texte de ces contenus
+    expose_tsv: Any = deferred(Column(TSVECTOR, nullable=True))
+    corps_tsv: Any = deferred(Column(TSVECTOR, nullable=True))
+
+    # Pertinence pour la dernière recherche plein texte (non stockée)
+    search_rank: float = 0.0
+
     # Relations.
     parent_pk: Optional[int] = Column(
         Integer, ForeignKey("amendements.pk"), nullable=True
@@ -471,8 +513,10 @@ class Amendement(Base):
             id_identique=id_identique,
             expose=expose,
             expose_search=expose_search,
+            expose_tsv=search_vector(expose_search),
             corps=corps,
             corps_search=corps_search,
+            corps_tsv=search_vector(corps_search),
             resume=resume,
             alinea=alinea,
             parent=parent,
@@ -490,10 +534,13 @@ class Amendement(Base):
             avis=avis,
             objet=objet,
             objet_search=objet_search,
+            objet_tsv=search_vector(objet_search),
             reponse=reponse,
             reponse_search=reponse_search,
+            reponse_tsv=search_vector(reponse_search),
             comments=comments,
             comments_search=comments_search,
+            comments_tsv=search_vector(comments_search),
         )
         DBSession.add(location)
         DBSession.add(user_content)
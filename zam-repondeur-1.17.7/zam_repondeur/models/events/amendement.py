@@ -9,7 +9,7 @@ from pyramid.request import Request
 from zam_repondeur.services.clean import clean_all_for_search, clean_html
 from zam_repondeur.views.jinja2_filters import enumeration
 
-from ..amendement import DOSSIER_DE_BANC, Amendement
+from ..amendement import DOSSIER_DE_BANC, Amendement, search_vector
 from ..batch import Batch
 from ..chambre import Chambre
 from .base import Event
@@ -220,6 +220,7 @@ class CorpsAmendementModifie(AmendementEvent):
     def apply(self) -> None:
         self.amendement.corps = self.data["new_value"]
         self.amendement.corps_search = clean_all_for_search(self.data["new_value"])
+        self.amendement.corps_tsv = search_vector(self.amendement.corps_search)
         if (
             self.amendement.user_content.is_answered
             and not self.amendement.is_abandoned
@@ -248,6 +249,7 @@ class ExposeAmendementModifie(AmendementEvent):
     def apply(self) -> None:
         self.amendement.expose = self.data["new_value"]
         self.amendement.expose_search = clean_all_for_search(self.data["new_value"])
+        self.amendement.expose_tsv = search_vector(self.amendement.expose_search)
         if (
             self.amendement.user_content.is_answered
             and not self.amendement.is_abandoned
@@ -327,6 +329,9 @@ class ObjetAmendementModifie(AmendementEvent):
         self.amendement.user_content.objet_search = clean_all_for_search(
             self.data["new_value"]
         )
+        self.amendement.user_content.objet_tsv = search_vector(
+            self.amendement.user_content.objet_search
+        )
         if self.user:
             user_table = self.user.table_for(self.amendement.lecture)
             if self.amendement not in user_table.user_table_history:
@@ -363,6 +368,9 @@ class ReponseAmendementModifiee(AmendementEvent):
         self.amendement.user_content.reponse_search = clean_all_for_search(
             self.data["new_value"]
         )
+        self.amendement.user_content.reponse_tsv = search_vector(
+            self.amendement.user_content.reponse_search
+        )
         if self.user:
             user_table = self.user.table_for(self.amendement.lecture)
             if self.amendement not in user_table.user_table_history:
@@ -399,6 +407,9 @@ class CommentsAmendementModifie(AmendementEvent):
         self.amendement.user_content.comments_search = clean_all_for_search(
             self.data["new_value"]
         )
+        self.amendement.user_content.comments_tsv = search_vector(
+            self.amendement.user_content.comments_search
+        )
         if self.user:
             user_table = self.user.table_for(self.amendement.lecture)
             if self.amendement not in user_table.user_table_history:
@@ -1,11 +1,15 @@
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from uuid import uuid4
 
 from pyramid.request import Request
 from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import RelationshipProperty, object_mapper, relationship
+from sqlalchemy.orm.interfaces import MANYTOONE
 from sqlalchemy_utils import JSONType, UUIDType
+from zope.sqlalchemy import mark_changed
 
 from ..base import Base, DBSession
 from ..users import User
@@ -69,7 +73,11 @@ class Event(Base):
     def create(cls, *args: Any, **kwargs: Any) -> "Event":
         event = cls(*args, **kwargs)
         event.apply()
-        DBSession.add(event)
+        batch = getattr(_current, "batch", None)
+        if batch is not None:
+            batch.add(event)
+        else:
+            DBSession.add(event)
         return event
 
     def set_amdt_link(self, request: Request) -> None:
@@ -80,6 +88,89 @@ class Event(Base):
         return True
 
 
+_current = threading.local()
+
+
+class EventBatch:
+    """
+    Events created within `bulk_events()`, to be inserted all at once
+
+    Their `apply()` side effects happen right away, but they are kept out of the
+    session (and out of the related collections), so that the unit of work does
+    not have to flush them one by one.
+    """
+
+    INSERT_SIZE = 1000
+
+    def __init__(self) -> None:
+        self.pending: List[Tuple[Event, Dict[RelationshipProperty, Any]]] = []
+
+    def add(self, event: Event) -> None:
+        # Set now to keep the ordering of events created in the same batch.
+        if event.pk is None:
+            event.pk = uuid4()
+        if event.created_at is None:
+            event.created_at = datetime.utcnow()
+
+        # Detach the event from its related objects, but remember them, since
+        # they may not have a primary key yet (e.g. new amendements).
+        related = {}
+        for prop in object_mapper(event).relationships:
+            if prop.direction is not MANYTOONE:
+                continue
+            obj = getattr(event, prop.key)
+            if obj is not None:
+                related[prop] = obj
+                setattr(event, prop.key, None)  # also cancels the backref append
+        if event in DBSession:
+            DBSession.expunge(event)
+
+        self.pending.append((event, related))
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        DBSession.flush()  # related objects created along the way need their pk
+        rows = [self._row(event, related) for event, related in self.pending]
+        table = Event.__table__
+        for start in range(0, len(rows), self.INSERT_SIZE):
+            DBSession.execute(
+                table.insert().values(rows[start : start + self.INSERT_SIZE])
+            )
+        mark_changed(DBSession())
+        self.pending = []
+
+    @staticmethod
+    def _row(event: Event, related: Dict[RelationshipProperty, Any]) -> dict:
+        mapper = object_mapper(event)
+        row = {
+            prop.columns[0].key: getattr(event, prop.key)
+            for prop in mapper.column_attrs
+        }
+        row["type"] = mapper.polymorphic_identity
+        for prop, obj in related.items():
+            for local, remote in prop.local_remote_pairs:
+                row[local.key] = getattr(obj, remote.key)
+        return row
+
+
+@contextmanager
+def bulk_events() -> Iterator[EventBatch]:
+    """
+    Collect the events created in this block, and insert them in bulk at the end
+
+    Meant for worker tasks that create lots of events (fetching amendements,
+    importing reponses...), not for requests where events are looked up again.
+    """
+    previous = getattr(_current, "batch", None)
+    batch = _current.batch = EventBatch()
+    try:
+        yield batch
+        batch.flush()
+    finally:
+        _current.batch = previous
+
+
 class LastEventMixin:
 
     created_at: datetime
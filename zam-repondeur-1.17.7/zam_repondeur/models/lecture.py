@@ -14,6 +14,7 @@ from sqlalchemy import (
     Text,
     UniqueConstraint,
     desc,
+    event,
     func,
     select,
 )
@@ -424,11 +425,10 @@ class Lecture(Base, LastEventMixin):
         return self.texte.session_str
 
     def find_article(self, subdiv: SubDiv) -> Optional[Article]:
-        article: Article
-        for article in self.articles:
-            if article.matches(subdiv):
-                return article
-        return None
+        article: Optional[Article] = self._index(
+            "articles", lambda article: article.subdiv
+        ).get(subdiv)
+        return article
 
     def find_or_create_article(self, subdiv: SubDiv) -> Tuple[Article, bool]:
         article = self.find_article(subdiv)
@@ -445,11 +445,29 @@ class Lecture(Base, LastEventMixin):
         return article, created
 
     def find_amendement(self, num: int) -> Optional[Amendement]:
-        amendement: Amendement
-        for amendement in self.amendements:
-            if amendement.num == num:
-                return amendement
-        return None
+        amendement: Optional[Amendement] = self._index(
+            "amendements", lambda amendement: amendement.num
+        ).get(num)
+        return amendement
+
+    def _index(self, collection: str, key: Callable) -> Dict[Any, Any]:
+        """
+        Index of the `articles` or `amendements` of the lecture by `key`
+
+        It is built on first use, then kept up to date by the collection event
+        listeners below. Items appended in the meantime are only indexed on the next
+        lookup, as their key is not always set yet when they are appended (e.g. by
+        the `lecture=` argument of the constructor).
+        """
+        indexes = self.__dict__.setdefault("_indexes", {})
+        pending = self.__dict__.setdefault("_indexes_pending", {}).pop(collection, [])
+        index: Optional[Dict[Any, Any]] = indexes.get(collection)
+        if index is None:
+            index = indexes[collection] = {}
+            pending = getattr(self, collection)
+        for item in pending:
+            index.setdefault(key(item), item)  # the first one wins, as in a scan
+        return index
 
     def find_or_create_amendement(
         self, num: int, article: Article
@@ -523,6 +541,45 @@ HYPHEN_SPLIT = (
 )
 
 
+def _keep_index_up_to_date(collection: str) -> None:
+    """
+    Listen to the changes of the collection, to update its index (if any)
+
+    NB: we cannot rely on the key of the event initiator, as it is the one of the
+    backref (`lecture`) when an item is attached with `Amendement(lecture=...)`.
+    """
+    attribute = getattr(Lecture, collection)
+
+    @event.listens_for(attribute, "append")
+    def index_appended_item(lecture: Lecture, item: Any, initiator: Any) -> None:
+        if collection in lecture.__dict__.get("_indexes", {}):
+            pending = lecture.__dict__.setdefault("_indexes_pending", {})
+            pending.setdefault(collection, []).append(item)
+
+    @event.listens_for(attribute, "remove")
+    def drop_index(lecture: Lecture, item: Any, initiator: Any) -> None:
+        lecture.__dict__.get("_indexes", {}).pop(collection, None)
+        lecture.__dict__.get("_indexes_pending", {}).pop(collection, None)
+
+
+_keep_index_up_to_date("amendements")
+_keep_index_up_to_date("articles")
+
+
+@event.listens_for(Lecture, "expire")
+def _drop_indexes_on_expire(lecture: Lecture, attrs: Optional[List[str]]) -> None:
+    # The collections will be reloaded from the database
+    lecture.__dict__.pop("_indexes", None)
+    lecture.__dict__.pop("_indexes_pending", None)
+
+
+@event.listens_for(Lecture, "refresh")
+def _drop_indexes_on_refresh(
+    lecture: Lecture, context: Any, attrs: Optional[List[str]]
+) -> None:
+    _drop_indexes_on_expire(lecture, attrs)
+
+
 class MissionSenat(Base):
     __tablename__ = "missions_senat"
     __table_args__ = (
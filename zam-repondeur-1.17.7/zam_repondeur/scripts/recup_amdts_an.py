@@ -77,7 +77,7 @@ lecture de l'AN",
                     errored,
                     triAmendements,
                 ) = AN._collect_amendements_other(
-                    lecture, discussion_nums, prefix, max_404
+                    lecture, discussion_nums, prefix, max_404, adaptive=False
                 )
                 for action in actions:
                     try:
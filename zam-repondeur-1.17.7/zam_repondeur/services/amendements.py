@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Iterable, Optional, Set
 
 from pyramid.config import Configurator
 
@@ -14,6 +14,11 @@ def includeme(config: Configurator) -> None:
     repository.initialize(
         redis_url=config.registry.settings["zam.amendements.redis_url"]
     )
+    repository.missing_nums_duration = int(
+        config.registry.settings.get(
+            "zam.amendements.missing_nums_duration", repository.missing_nums_duration
+        )
+    )
 
 
 class AmendementsRepository(Repository):
@@ -21,6 +26,10 @@ class AmendementsRepository(Repository):
     Store and access global amendements in Redis
     """
 
+    # How long (in seconds) we remember that an amendement number does not exist
+    # (keep it short: a gap may be filled by an amendement published late)
+    missing_nums_duration = 3600
+
     @needs_init
     def clear_data(self) -> None:
         self.connection.flushdb()
@@ -43,5 +52,25 @@ class AmendementsRepository(Repository):
     def stop_editing(self, pk: int) -> None:
         self.connection.delete(str(pk))
 
+    @staticmethod
+    def _key_for_missing_nums(lecture_pk: int) -> str:
+        return f"missing_nums.{lecture_pk}"
+
+    @needs_init
+    def get_missing_nums(self, lecture_pk: int) -> Set[int]:
+        key = self._key_for_missing_nums(lecture_pk)
+        return {int(num) for num in self.connection.smembers(key)}
+
+    @needs_init
+    def add_missing_nums(self, lecture_pk: int, nums: Iterable[int]) -> None:
+        nums = list(nums)
+        if not nums or self.missing_nums_duration <= 0:
+            return
+        key = self._key_for_missing_nums(lecture_pk)
+        pipe = self.connection.pipeline()
+        pipe.sadd(key, *nums)
+        pipe.expire(key, self.missing_nums_duration)
+        pipe.execute()
+
 
 repository = AmendementsRepository()
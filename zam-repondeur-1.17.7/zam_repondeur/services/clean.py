@@ -1,9 +1,20 @@
+import hashlib
+import logging
 import re
 import threading
 import unicodedata
+from collections import OrderedDict
+from functools import wraps
 from html import unescape
+from typing import Callable, Optional, Tuple
 
 from bleach.sanitizer import Cleaner
+from pyramid.config import Configurator
+from redis.exceptions import RedisError
+
+from zam_repondeur.services import Repository
+
+logger = logging.getLogger(__name__)
 
 ALLOWED_TAGS = [
     "div",
@@ -77,6 +88,114 @@ ALLOWED_PARSER_ATTRIBUTES = {
 _THREAD_LOCALS = threading.local()
 
 
+def includeme(config: Configurator) -> None:
+    """
+    Called automatically via config.include("zam_repondeur.services.clean")
+    """
+    settings = config.registry.settings
+    clean_cache.max_size = int(
+        settings.get("zam.clean_cache.max_size", clean_cache.max_size)
+    )
+    clean_cache.duration = int(
+        settings.get("zam.clean_cache.duration", clean_cache.duration)
+    )
+    redis_url = settings.get("zam.clean_cache.redis_url")
+    if redis_url:
+        clean_cache.initialize(redis_url=redis_url)
+
+
+class CleanCache(Repository):
+    """
+    Memoize the output of the HTML cleaners, keyed by a digest of their input
+
+    Most fetched texts are the same from one refresh to the next, and sanitizing
+    them is costly. Recent results are kept in process (least recently used ones
+    are dropped beyond `max_size` characters), and optionally in Redis so that they
+    are shared by workers and survive restarts.
+    """
+
+    max_size = 64 * 1024 * 1024
+    duration = 7 * 24 * 3600
+    redis_min_length = 256  # not worth a round-trip below that
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.initialized = False  # Redis is optional
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, bytes], str]" = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def _key_for_redis(name: str, digest: bytes) -> str:
+        return f"clean.{name}.{digest.hex()}"
+
+    def get_or_clean(self, name: str, html: str, clean: Callable[[str], str]) -> str:
+        digest = hashlib.sha256(html.encode("utf-8", "surrogatepass")).digest()
+        key = (name, digest)
+        with self._lock:
+            cleaned = self._entries.get(key)
+            if cleaned is not None:
+                self._entries.move_to_end(key)
+                return cleaned
+
+        use_redis = self.initialized and len(html) >= self.redis_min_length
+        if use_redis:
+            cleaned = self._get_from_redis(name, digest)
+        if cleaned is None:
+            cleaned = clean(html)
+            if use_redis:
+                self._set_in_redis(name, digest, cleaned)
+
+        self._remember(key, cleaned)
+        return cleaned
+
+    def _remember(self, key: Tuple[str, bytes], cleaned: str) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = cleaned
+            self._size += len(cleaned)
+            while self._size > self.max_size and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _get_from_redis(self, name: str, digest: bytes) -> Optional[str]:
+        try:
+            raw = self.connection.get(self._key_for_redis(name, digest))
+        except RedisError:
+            logger.exception("Could not read from the clean cache")
+            return None
+        if raw is None:
+            return None
+        cleaned: str = raw.decode("utf-8", "surrogatepass")
+        return cleaned
+
+    def _set_in_redis(self, name: str, digest: bytes, cleaned: str) -> None:
+        try:
+            self.connection.set(
+                self._key_for_redis(name, digest),
+                cleaned.encode("utf-8", "surrogatepass"),
+                ex=self.duration,
+            )
+        except RedisError:
+            logger.exception("Could not write to the clean cache")
+
+
+clean_cache = CleanCache()
+
+
+def _memoized(func: Callable[[str], str]) -> Callable[[str], str]:
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(html: str) -> str:
+        return clean_cache.get_or_clean(name, html, func)
+
+    return wrapper
+
+
+@_memoized
 def clean_html(html: str) -> str:
     text = unescape(html)  # decode HTML entities
 
@@ -113,6 +232,7 @@ def clean_all_html(html: str) -> str:
     return sanitized.strip()
 
 
+@_memoized
 def clean_all_for_search(html: str) -> str:
     # We do an unescape here due to cleaner behavior
     text = unescape(clean_all_html(html))  # decode HTML entities
@@ -122,6 +242,7 @@ def clean_all_for_search(html: str) -> str:
     return text
 
 
+@_memoized
 def clean_html_except_tables(html: str) -> str:
     text = unescape(html)  # decode HTML entities
 
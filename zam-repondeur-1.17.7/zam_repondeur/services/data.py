@@ -1,24 +1,57 @@
 import json
+import logging
 import pickle  # nosec
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
 from io import BytesIO
-from typing import Any, Dict, List, Optional
+from itertools import chain
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
+from more_itertools import chunked
 from pyramid.config import Configurator
 from redis_lock import Lock, reset_all
 
 from zam_repondeur.initialize import needs_init
 from zam_repondeur.services import Repository
+from zam_repondeur.services.fetch.an.common import ParsedMember, download_remote_zip
 from zam_repondeur.services.fetch.an.dossiers.dossiers_legislatifs import (
-    get_dossiers_legislatifs_and_textes,
+    get_url_dossiers,
+    iter_dossiers_legislatifs_and_textes_members,
+)
+from zam_repondeur.services.fetch.an.dossiers.models import (
+    DossierRef,
+    LectureRef,
+    TexteRef,
+)
+from zam_repondeur.services.fetch.an.organes_acteurs import (
+    ORGANE,
+    URL_ORGANES_ACTEURS,
+    iter_organes_acteurs_members,
 )
-from zam_repondeur.services.fetch.an.dossiers.models import DossierRef, TexteRef
-from zam_repondeur.services.fetch.an.organes_acteurs import get_organes_acteurs
 from zam_repondeur.services.fetch.senat.scraping import get_dossier_refs_senat
 from zam_repondeur.services.fetch.senat.senateurs import (
     Senateur,
     fetch_and_parse_senateurs,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def includeme(config: Configurator) -> None:
     """
@@ -32,6 +65,21 @@ def init_repository(settings: Dict[str, str]) -> None:
     repository.legislatures = [
         int(legi) for legi in settings["zam.legislatures"].split(",")
     ]
+    repository.batch_size = int(
+        settings.get("zam.data.batch_size", repository.batch_size)
+    )
+    repository.digests_duration = int(
+        settings.get("zam.data.digests_duration", repository.digests_duration)
+    )
+    repository.cache = LRUCache(
+        maxsize=int(settings.get("zam.data.cache_size", DEFAULT_CACHE_SIZE))
+    )
+    repository.version_cache_duration = int(
+        settings.get(
+            "zam.data.version_cache_duration", repository.version_cache_duration
+        )
+    )
+    repository.read_versions.clear()
 
 
 class BackwardsCompatibleUnpickler(pickle.Unpickler):
@@ -41,112 +89,624 @@ class BackwardsCompatibleUnpickler(pickle.Unpickler):
         return super().find_class(module, name)
 
 
+DEFAULT_CACHE_SIZE = 10_000
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache of the most recently used values
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._values[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._values.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._values),
+            }
+
+
+class OpenDataChanges(NamedTuple):
+    """
+    Uids of the AN dossiers and textes parsed again during a data load
+
+    None means that everything was parsed again (full load).
+    """
+
+    dossiers: Optional[Set[str]]
+    textes: Optional[Set[str]]
+
+
+# Datasets are (re)loaded and published as a whole
+ORGANES_ACTEURS = "an.opendata.organes_acteurs"
+DOSSIERS_TEXTES = "an.opendata.dossiers_textes"
+SENAT_DOSSIERS = "senat.scraping.dossiers"
+SENATEURS = "senateurs"
+
+
 class DataRepository(Repository):
     """
     Store and access global data in Redis
 
-    We use a lock so that periodic updates by a worker thread do not interfere
-    with regular read accesses (e.g. when fetching amendements).
+    Each dataset is loaded into a fresh versioned key namespace, and then published
+    by switching a pointer key to the new version. Readers only need plain GETs, and
+    never see a half-loaded dataset. Keys from the previous version are kept for a
+    grace period, so that reads that started before the switch still succeed.
+
+    We use a lock so that concurrent loads (e.g. periodic updates by a worker thread
+    and the `zam_load_data` script) do not interfere with each other.
+
+    Decoded values are also kept in a per-process LRU cache, keyed by dataset version,
+    so publishing a new version makes stale entries unreachable. Cached objects are
+    shared between callers and must be treated as read-only. The version pointers
+    used for reads are cached too, for a few seconds: readers in other processes may
+    keep using the previous version that long, which is why its keys are kept for a
+    grace period.
+
+    AN open data is loaded incrementally: we record a digest of each archive and of
+    each archive member. A dataset is skipped when none of its archives changed, and
+    values from unchanged members are copied from the previous version instead of
+    being parsed again. A full load is still done once every `digests_duration`.
     """
 
     legislatures: List[int] = []
+    previous_version_ttl = 10 * 60  # 10 minutes
+    senat_scraping_ttl = 2 * 3600  # 2 hours
+    batch_size = 1000  # keys per MSET / MGET / SCAN round trip
+    digests_duration = 24 * 3600  # 24 hours
+    version_cache_duration = 5  # seconds, much less than previous_version_ttl
+    cache = LRUCache()
+    read_versions: Dict[str, Tuple[float, Optional[str]]] = {}
 
     @needs_init
     def reset_locks(self) -> None:
         reset_all(self.connection)
 
     @needs_init
-    def load_data(self) -> None:
+    def load_data(self) -> OpenDataChanges:
         self._load_opendata_organes_acteurs()
-        self._load_opendata_dossiers_textes()
+        changes = self._load_opendata_dossiers_textes()
         self._load_scraping_senat_dossiers()
         self._load_senateurs_groupes()
+        return changes
 
     def _load_opendata_organes_acteurs(self) -> None:
-        organes, acteurs = get_organes_acteurs()
-        with Lock(self.connection, "data"):
-            for uid, organe in organes.items():
-                self._set_json_data(self._key_for_opendata_organe(uid), organe)
+        full = self._full_load_due(ORGANES_ACTEURS)
+        archives = self._download_archives(
+            ORGANES_ACTEURS, [URL_ORGANES_ACTEURS], full=full
+        )
+        if archives is None:
+            return
+        previous_records = {} if full else self._get_member_records(ORGANES_ACTEURS)
+        previous = {
+            filename: record["digest"] for filename, record in previous_records.items()
+        }
+        records: Dict[str, dict] = {}
+        with ExitStack() as stack, self._new_version(ORGANES_ACTEURS) as version:
+            for archive, _ in archives.values():
+                stack.enter_context(archive)
+                members = iter_organes_acteurs_members(archive, previous=previous)
+                self._set_many(
+                    version,
+                    self._members_items(
+                        ORGANES_ACTEURS,
+                        members,
+                        previous_records,
+                        records,
+                        self._serialize_organes_acteurs,
+                    ),
+                )
+        self._set_digests(ORGANES_ACTEURS, archives, records, full=full)
+
+    def _serialize_organes_acteurs(
+        self, items: List[Tuple[str, str, dict]]
+    ) -> Tuple[List[Tuple[str, Union[str, bytes]]], dict]:
+        serialized: List[Tuple[str, Union[str, bytes]]] = []
+        for kind, uid, data in items:
+            if kind == ORGANE:
+                key = self._key_for_opendata_organe(uid)
+            else:
+                key = self._key_for_opendata_acteur(uid)
+            serialized.append((key, json.dumps(data)))
+        return serialized, {}
+
+    def _load_opendata_dossiers_textes(self) -> OpenDataChanges:
+        dossiers: Set[str] = set()
+        textes: Set[str] = set()
+        urls = {
+            legislature: get_url_dossiers(legislature)
+            for legislature in self.legislatures
+        }
+        full = self._full_load_due(DOSSIERS_TEXTES)
+        archives = self._download_archives(
+            DOSSIERS_TEXTES, list(urls.values()), full=full
+        )
+        if archives is None:
+            return OpenDataChanges(dossiers=dossiers, textes=textes)
+        previous_records = {} if full else self._get_member_records(DOSSIERS_TEXTES)
+        previous = {
+            filename: record["digest"] for filename, record in previous_records.items()
+        }
+        previous_textes = {
+            filename: [texte_uid for texte_uid, _, _ in record["lectures"]]
+            for filename, record in previous_records.items()
+        }
+        records: Dict[str, dict] = {}
+
+        def serialize(
+            refs: List[Union[DossierRef, TexteRef]]
+        ) -> Tuple[List[Tuple[str, Union[str, bytes]]], dict]:
+            return self._serialize_dossiers_textes(refs, dossiers, textes)
+
+        def get_texte(uid: str) -> Optional[TexteRef]:
+            return self.get_opendata_texte(uid)  # from the previous version
+
+        with ExitStack() as stack, self._new_version(DOSSIERS_TEXTES) as version:
+            for legislature, url in urls.items():
+                archive, _ = archives[url]
+                stack.enter_context(archive)
+                members = iter_dossiers_legislatifs_and_textes_members(
+                    legislature,
+                    archive,
+                    previous=previous,
+                    previous_textes=previous_textes,
+                    get_texte=get_texte,
+                )
+                self._set_many(
+                    version,
+                    self._members_items(
+                        DOSSIERS_TEXTES, members, previous_records, records, serialize
+                    ),
+                )
+            self._set_many(version, self._opendata_lecture_by_texte_items(records))
+        self._set_digests(DOSSIERS_TEXTES, archives, records, full=full)
+        logger.info(
+            "Parsed %d dossiers and %d textes from AN open data",
+            len(dossiers),
+            len(textes),
+        )
+        if full:
+            return OpenDataChanges(dossiers=None, textes=None)
+        return OpenDataChanges(dossiers=dossiers, textes=textes)
+
+    def _serialize_dossiers_textes(
+        self,
+        refs: List[Union[DossierRef, TexteRef]],
+        dossiers: Set[str],
+        textes: Set[str],
+    ) -> Tuple[List[Tuple[str, Union[str, bytes]]], dict]:
+        serialized: List[Tuple[str, Union[str, bytes]]] = []
+        lectures: List[Tuple[str, str, str]] = []
+        for ref in refs:
+            if isinstance(ref, TexteRef):
+                textes.add(ref.uid)
+                key = self._key_for_opendata_texte(ref.uid)
+                serialized.append((key, pickle.dumps(ref)))
+                continue
+            dossiers.add(ref.uid)
+            serialized.extend(self._opendata_dossier_ref_items(ref))
+            lectures.extend(
+                (lecture_ref.texte.uid, ref.uid, lecture_ref.key)
+                for lecture_ref in ref.lectures
+            )
+        return serialized, {"lectures": lectures}
+
+    def _opendata_lecture_by_texte_items(
+        self, records: Dict[str, dict]
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Index lectures by texte, keeping the first lecture found for each texte
+        """
+        index: Dict[str, Tuple[str, str]] = {}
+        for record in records.values():
+            for texte_uid, dossier_uid, lecture_key in record.get("lectures", ()):
+                index.setdefault(texte_uid, (dossier_uid, lecture_key))
+        for texte_uid, value in index.items():
+            yield self._key_for_opendata_lecture_by_texte(texte_uid), json.dumps(value)
+
+    def _download_archives(
+        self, dataset: str, urls: List[str], full: bool = False
+    ) -> Optional[Dict[str, Tuple[IO[bytes], str]]]:
+        """
+        Download archives, or return None if none changed since the last load
+        (unless a `full` load is requested)
+
+        Also return None if any of them is missing, so that we keep the current
+        version of the dataset rather than publish one without its contents.
+        """
+        archives: Dict[str, Tuple[IO[bytes], str]] = {}
+        for url in urls:
+            downloaded = download_remote_zip(url)
+            if downloaded is None:
+                logger.error("Missing archive %s, not updating %s", url, dataset)
+                for archive, _ in archives.values():
+                    archive.close()
+                return None
+            archives[url] = downloaded
+        previous_digests = {
+            key.decode(): value.decode()
+            for key, value in self.connection.hgetall(
+                self._key_for_archive_digests(dataset)
+            ).items()
+        }
+        if (
+            not full
+            and previous_digests
+            == {url: digest for url, (_, digest) in archives.items()}
+            and self._current_version(dataset) is not None
+            and self.connection.exists(self._key_for_member_records(dataset))
+        ):
+            logger.info("No change in %s archives, skipping", dataset)
+            for archive, _ in archives.values():
+                archive.close()
+            return None
+        return archives
+
+    def _get_member_records(self, dataset: str) -> Dict[str, dict]:
+        """
+        What we know about each archive member of the current version of the dataset
+        """
+        if self._current_version(dataset) is None:
+            return {}
+        return {
+            filename.decode(): json.loads(record)
+            for filename, record in self.connection.hgetall(
+                self._key_for_member_records(dataset)
+            ).items()
+        }
+
+    def _members_items(
+        self,
+        dataset: str,
+        members: Iterable[ParsedMember],
+        previous_records: Dict[str, dict],
+        records: Dict[str, dict],
+        serialize: Callable[[List[Any]], Tuple[List[Tuple[str, Any]], dict]],
+    ) -> Iterator[Tuple[str, Union[str, bytes]]]:
+        """
+        Serialize parsed members, and copy values of unchanged ones
+
+        Records of all members (digest, keys, and any extra information returned
+        by `serialize`) are collected into `records`.
+        """
+        previous_version = self._current_version(dataset)
+        to_copy: List[str] = []
+        for member in members:
+            if member.items is None:  # unchanged
+                record = previous_records[member.filename]
+                to_copy.extend(record["keys"])
+                if len(to_copy) >= self.batch_size:
+                    yield from self._copy_values(previous_version, to_copy)
+                    to_copy = []
+            else:
+                items, record = serialize(member.items)
+                record["keys"] = [key for key, _ in items]
+                record["digest"] = member.digest
+                yield from items
+            records[member.filename] = record
+        yield from self._copy_values(previous_version, to_copy)
+
+    def _copy_values(
+        self, version: Optional[str], keys: List[str]
+    ) -> Iterator[Tuple[str, bytes]]:
+        if version is None or not keys:
+            return
+        values = self.connection.mget([self._versioned(key, version) for key in keys])
+        for key, value in zip(keys, values):
+            if value is not None:
+                yield key, value
+
+    def _set_digests(
+        self,
+        dataset: str,
+        archives: Dict[str, Tuple[IO[bytes], str]],
+        records: Dict[str, dict],
+        full: bool = False,
+    ) -> None:
+        archives_key = self._key_for_archive_digests(dataset)
+        records_key = self._key_for_member_records(dataset)
+        pipe = self.connection.pipeline()
+        pipe.delete(archives_key, records_key)
+        if archives:
+            pipe.hset(
+                archives_key,
+                mapping={url: digest for url, (_, digest) in archives.items()},
+            )
+        for chunk in chunked(records.items(), self.batch_size):
+            pipe.hset(
+                records_key,
+                mapping={filename: json.dumps(record) for filename, record in chunk},
+            )
+        if full:
+            pipe.set(self._key_for_full_load(dataset), time.time())
+        pipe.execute()
+
+    def _full_load_due(self, dataset: str) -> bool:
+        """
+        Is it time to parse every member again, regardless of digests?
+        """
+        last_full_load = self.connection.get(self._key_for_full_load(dataset))
+        if last_full_load is None:
+            return True
+        return time.time() - float(last_full_load) >= self.digests_duration
 
-            for uid, acteur in acteurs.items():
-                self._set_json_data(self._key_for_opendata_acteur(uid), acteur)
+    @staticmethod
+    def _key_for_full_load(dataset: str) -> str:
+        return f"data.full_load.{dataset}"
 
-    def _load_opendata_dossiers_textes(self) -> None:
-        dossiers, textes = get_dossiers_legislatifs_and_textes(*self.legislatures)
-        with Lock(self.connection, "data"):
-            for dossier_ref in dossiers.values():
-                self.set_opendata_dossier_ref(dossier_ref)
+    @staticmethod
+    def _key_for_archive_digests(dataset: str) -> str:
+        return f"data.archives.{dataset}"
 
-            for texte_ref in textes.values():
-                self.set_opendata_texte_ref(texte_ref)
+    @staticmethod
+    def _key_for_member_records(dataset: str) -> str:
+        return f"data.members.{dataset}"
+
+    def _opendata_dossier_ref_items(
+        self, dossier_ref: DossierRef
+    ) -> Iterator[Tuple[str, bytes]]:
+        value = pickle.dumps(dossier_ref)  # same value for all three keys
+        yield self._key_for_opendata_dossier(dossier_ref.uid), value
+        an_url = dossier_ref.normalized_an_url
+        if an_url:
+            yield self._key_for_opendata_dossier_by_an_url(an_url), value
+        senat_url = dossier_ref.normalized_senat_url
+        if senat_url:
+            yield self._key_for_opendata_dossier_by_senat_url(senat_url), value
 
     def _load_scraping_senat_dossiers(self) -> None:
         dossier_refs = get_dossier_refs_senat()
-        with Lock(self.connection, "data"):
-            self._clear_scraping_senat_dossiers()
-            for dossier_ref in dossier_refs.values():
-                self.set_senat_scraping_dossier_ref(dossier_ref)
-
-    def _clear_scraping_senat_dossiers(self) -> None:
-        for pattern in [
-            self._key_for_senat_scraping_dossier("*"),
-            self._key_for_senat_scraping_dossier_by_an_url("*"),
-        ]:
-            keys = self.connection.keys(pattern)
-            if keys:
-                self.connection.delete(*keys)
+        with self._new_version(SENAT_DOSSIERS) as version:
+            self._set_many(
+                version,
+                chain.from_iterable(
+                    self._senat_scraping_dossier_ref_items(dossier_ref)
+                    for dossier_ref in dossier_refs.values()
+                ),
+                ttl=self.senat_scraping_ttl,
+            )
+
+    def _senat_scraping_dossier_ref_items(
+        self, dossier_ref: DossierRef
+    ) -> Iterator[Tuple[str, bytes]]:
+        value = pickle.dumps(dossier_ref)
+        if dossier_ref.senat_dossier_id:
+            uid = dossier_ref.senat_dossier_id
+            yield self._key_for_senat_scraping_dossier(uid), value
+        an_url = dossier_ref.normalized_an_url
+        if an_url:
+            yield self._key_for_senat_scraping_dossier_by_an_url(an_url), value
 
     def set_senat_scraping_dossier_ref(
-        self, dossier_ref: DossierRef, ttl: int = 2 * 3600
+        self,
+        dossier_ref: DossierRef,
+        ttl: int = 2 * 3600,
+        version: Optional[str] = None,
     ) -> None:
-        self.set_senat_scraping_dossier_ref_ref_by_id(dossier_ref, ttl=ttl)
-        self.set_senat_scraping_dossier_ref_ref_by_an_url(dossier_ref, ttl=ttl)
+        self.set_senat_scraping_dossier_ref_ref_by_id(
+            dossier_ref, ttl=ttl, version=version
+        )
+        self.set_senat_scraping_dossier_ref_ref_by_an_url(
+            dossier_ref, ttl=ttl, version=version
+        )
 
     def _load_senateurs_groupes(self) -> None:
         senateurs_by_matricule = fetch_and_parse_senateurs()
+        with self._new_version(SENATEURS) as version:
+            self._set_many(
+                version,
+                (
+                    (self._key_for_senateur(matricule), pickle.dumps(senateur))
+                    for matricule, senateur in senateurs_by_matricule.items()
+                ),
+            )
+
+    def _set_many(
+        self,
+        version: str,
+        items: Iterable[Tuple[str, Union[str, bytes]]],
+        ttl: Optional[int] = None,
+    ) -> None:
+        """
+        Write a new dataset version in chunks, one round trip per chunk
+        """
+        for chunk in chunked(items, self.batch_size):
+            pipe = self.connection.pipeline(transaction=False)
+            if ttl is None:
+                pipe.mset(
+                    {self._versioned(key, version): value for key, value in chunk}
+                )
+            else:  # MSET does not support expiration
+                for key, value in chunk:
+                    pipe.set(self._versioned(key, version), value, ex=ttl)
+            pipe.execute()
+
+    @contextmanager
+    def _new_version(self, dataset: str) -> Iterator[str]:
+        """
+        Load a dataset into a new key namespace, and publish it on success
+        """
         with Lock(self.connection, "data"):
-            for matricule, senateur in senateurs_by_matricule.items():
-                self._set_pickled_data(self._key_for_senateur(matricule), senateur)
+            version = str(self.connection.incr("data.last_version"))
+            try:
+                yield version
+            except BaseException:
+                self._expire_keys(self._versioned("*", version), ttl=0)
+                raise
+            previous_version = self._current_version(dataset)
+            self.connection.set(self._key_for_current_version(dataset), version)
+            self.cache.clear()
+            self.read_versions.pop(dataset, None)
+            if previous_version is not None:
+                patterns = [self._versioned("*", previous_version)]
+            else:  # data loaded before datasets were versioned
+                patterns = self._unversioned_patterns(dataset)
+            for pattern in patterns:
+                self._expire_keys(pattern, ttl=self.previous_version_ttl)
+
+    def _expire_keys(self, pattern: str, ttl: int) -> None:
+        pipe = self.connection.pipeline()
+        for key in self.connection.scan_iter(match=pattern, count=self.batch_size):
+            if ttl > 0:
+                pipe.expire(key, ttl)
+            else:
+                pipe.delete(key)
+        pipe.execute()
 
-    def set_opendata_dossier_ref(self, dossier_ref: DossierRef) -> None:
-        self.set_opendata_dossier_ref_by_uid(dossier_ref)
-        self.set_opendata_dossier_ref_by_an_url(dossier_ref)
-        self.set_opendata_dossier_ref_by_senat_url(dossier_ref)
+    @needs_init
+    def _current_version(self, dataset: str) -> Optional[str]:
+        version: Optional[bytes] = self.connection.get(
+            self._key_for_current_version(dataset)
+        )
+        if version is None:
+            return None
+        return version.decode()
+
+    def _read_version(self, dataset: str) -> Optional[str]:
+        """
+        Like `_current_version`, but without a round trip to Redis for each lookup
+        """
+        now = time.monotonic()
+        expires_at, version = self.read_versions.get(dataset, (0.0, None))
+        if now >= expires_at:
+            version = self._current_version(dataset)
+            self.read_versions[dataset] = (now + self.version_cache_duration, version)
+        return version
+
+    def _dataset_key(
+        self, dataset: str, key: str, version: Optional[str] = None
+    ) -> str:
+        if version is None:
+            version = self._current_version(dataset)
+        if version is None:
+            return key
+        return self._versioned(key, version)
+
+    @staticmethod
+    def _versioned(key: str, version: str) -> str:
+        return f"data.v{version}.{key}"
 
-    def set_opendata_dossier_ref_by_uid(self, dossier_ref: DossierRef) -> None:
+    @staticmethod
+    def _key_for_current_version(dataset: str) -> str:
+        return f"data.current.{dataset}"
+
+    def _unversioned_patterns(self, dataset: str) -> List[str]:
+        return {
+            ORGANES_ACTEURS: [
+                self._key_for_opendata_organe("*"),
+                self._key_for_opendata_acteur("*"),
+            ],
+            DOSSIERS_TEXTES: [
+                self._key_for_opendata_dossier("*"),
+                self._key_for_opendata_dossier_by_an_url("*"),
+                self._key_for_opendata_dossier_by_senat_url("*"),
+                self._key_for_opendata_texte("*"),
+            ],
+            SENAT_DOSSIERS: [
+                self._key_for_senat_scraping_dossier("*"),
+                self._key_for_senat_scraping_dossier_by_an_url("*"),
+            ],
+            SENATEURS: [self._key_for_senateur("*")],
+        }[dataset]
+
+    def set_opendata_dossier_ref(
+        self, dossier_ref: DossierRef, version: Optional[str] = None
+    ) -> None:
+        if version is None:
+            version = self._current_version(DOSSIERS_TEXTES)
+        self.set_opendata_dossier_ref_by_uid(dossier_ref, version=version)
+        self.set_opendata_dossier_ref_by_an_url(dossier_ref, version=version)
+        self.set_opendata_dossier_ref_by_senat_url(dossier_ref, version=version)
+
+    def set_opendata_dossier_ref_by_uid(
+        self, dossier_ref: DossierRef, version: Optional[str] = None
+    ) -> None:
         key = self._key_for_opendata_dossier(dossier_ref.uid)
-        self._set_pickled_data(key, dossier_ref)
+        self._set_pickled_data(
+            self._dataset_key(DOSSIERS_TEXTES, key, version), dossier_ref
+        )
 
-    def set_opendata_dossier_ref_by_an_url(self, dossier_ref: DossierRef) -> None:
+    def set_opendata_dossier_ref_by_an_url(
+        self, dossier_ref: DossierRef, version: Optional[str] = None
+    ) -> None:
         an_url = dossier_ref.normalized_an_url
         if an_url:
             key = self._key_for_opendata_dossier_by_an_url(an_url)
-            self._set_pickled_data(key, dossier_ref)
+            self._set_pickled_data(
+                self._dataset_key(DOSSIERS_TEXTES, key, version), dossier_ref
+            )
 
-    def set_opendata_dossier_ref_by_senat_url(self, dossier_ref: DossierRef) -> None:
+    def set_opendata_dossier_ref_by_senat_url(
+        self, dossier_ref: DossierRef, version: Optional[str] = None
+    ) -> None:
         senat_url = dossier_ref.normalized_senat_url
         if senat_url:
             key = self._key_for_opendata_dossier_by_senat_url(senat_url)
-            self._set_pickled_data(key, dossier_ref)
+            self._set_pickled_data(
+                self._dataset_key(DOSSIERS_TEXTES, key, version), dossier_ref
+            )
 
-    def set_opendata_texte_ref(self, texte_ref: TexteRef) -> None:
+    def set_opendata_texte_ref(
+        self, texte_ref: TexteRef, version: Optional[str] = None
+    ) -> None:
         key = self._key_for_opendata_texte(texte_ref.uid)
-        self._set_pickled_data(key, texte_ref)
+        self._set_pickled_data(
+            self._dataset_key(DOSSIERS_TEXTES, key, version), texte_ref
+        )
 
     def set_senat_scraping_dossier_ref_ref_by_id(
-        self, dossier_ref: DossierRef, ttl: int
+        self, dossier_ref: DossierRef, ttl: int, version: Optional[str] = None
     ) -> None:
         if dossier_ref.senat_dossier_id:
             key = self._key_for_senat_scraping_dossier(dossier_ref.senat_dossier_id)
-            self._set_pickled_data(key, dossier_ref, ttl)
+            self._set_pickled_data(
+                self._dataset_key(SENAT_DOSSIERS, key, version), dossier_ref, ttl
+            )
 
     def set_senat_scraping_dossier_ref_ref_by_an_url(
-        self, dossier_ref: DossierRef, ttl: int
+        self, dossier_ref: DossierRef, ttl: int, version: Optional[str] = None
     ) -> None:
         an_url = dossier_ref.normalized_an_url
         if an_url:
             key = self._key_for_senat_scraping_dossier_by_an_url(an_url)
-            self._set_pickled_data(key, dossier_ref, ttl)
+            self._set_pickled_data(
+                self._dataset_key(SENAT_DOSSIERS, key, version), dossier_ref, ttl
+            )
 
     @staticmethod
     def _key_for_opendata_dossier(uid: str) -> str:
@@ -164,6 +724,10 @@ class DataRepository(Repository):
     def _key_for_opendata_texte(uid: str) -> str:
         return f"an.opendata.textes.{uid}"
 
+    @staticmethod
+    def _key_for_opendata_lecture_by_texte(texte_uid: str) -> str:
+        return f"an.opendata.lectures_by_texte.{texte_uid}"
+
     @staticmethod
     def _key_for_opendata_organe(uid: str) -> str:
         return f"an.opendata.organes.{uid}"
@@ -187,25 +751,25 @@ class DataRepository(Repository):
     @needs_init
     def get_opendata_organe(self, uid: str) -> dict:
         key = self._key_for_opendata_organe(uid)
-        organe: dict = self._get_json_data(key)
+        organe: dict = self._get_json_data(ORGANES_ACTEURS, key)
         return organe
 
     @needs_init
     def get_opendata_acteur(self, uid: str) -> dict:
         key = self._key_for_opendata_acteur(uid)
-        acteur: dict = self._get_json_data(key)
+        acteur: dict = self._get_json_data(ORGANES_ACTEURS, key)
         return acteur
 
     @needs_init
     def get_opendata_dossier_ref(self, uid: str) -> DossierRef:
         key = self._key_for_opendata_dossier(uid)
-        dossier_ref: DossierRef = self._get_pickled_data(key)
+        dossier_ref: DossierRef = self._get_pickled_data(DOSSIERS_TEXTES, key)
         return dossier_ref
 
     @needs_init
     def get_opendata_dossier_ref_by_an_url(self, an_url: str) -> Optional[DossierRef]:
         key = self._key_for_opendata_dossier_by_an_url(an_url)
-        dossier_ref: DossierRef = self._get_pickled_data(key)
+        dossier_ref: DossierRef = self._get_pickled_data(DOSSIERS_TEXTES, key)
         return dossier_ref
 
     @needs_init
@@ -213,34 +777,74 @@ class DataRepository(Repository):
         self, senat_url: str
     ) -> Optional[DossierRef]:
         key = self._key_for_opendata_dossier(senat_url)
-        dossier_ref: DossierRef = self._get_pickled_data(key)
+        dossier_ref: DossierRef = self._get_pickled_data(DOSSIERS_TEXTES, key)
         return dossier_ref
 
     @needs_init
     def list_opendata_dossiers(self) -> List[str]:
-        keys = self.connection.keys(self._key_for_opendata_dossier("*"))
-        return [key.decode("utf-8").split(".")[-1] for key in keys]
+        pattern = self._key_for_opendata_dossier("*")
+        return [
+            key.decode("utf-8").split(".")[-1]
+            for key in self._scan_keys(self._dataset_key(DOSSIERS_TEXTES, pattern))
+        ]
 
     @needs_init
     def list_opendata_textes(self) -> List[str]:
-        keys = self.connection.keys(self._key_for_opendata_texte("*"))
-        return [key.decode("utf-8").split(".")[-1] for key in keys]
+        pattern = self._key_for_opendata_texte("*")
+        return [
+            key.decode("utf-8").split(".")[-1]
+            for key in self._scan_keys(self._dataset_key(DOSSIERS_TEXTES, pattern))
+        ]
 
     @needs_init
     def list_senat_scraping_dossiers(self) -> List[str]:
-        keys = self.connection.keys(self._key_for_senat_scraping_dossier("*"))
-        return [key.decode("utf-8").split(".")[-1] for key in keys]
+        pattern = self._key_for_senat_scraping_dossier("*")
+        return [
+            key.decode("utf-8").split(".")[-1]
+            for key in self._scan_keys(self._dataset_key(SENAT_DOSSIERS, pattern))
+        ]
+
+    @needs_init
+    def get_all_opendata_dossier_refs(self) -> Dict[str, DossierRef]:
+        version = self._read_version(DOSSIERS_TEXTES)
+        pattern = self._key_for_opendata_dossier("*")
+        keys = self._scan_keys(self._dataset_key(DOSSIERS_TEXTES, pattern, version))
+        return self._get_many_pickled_data(keys)
+
+    @needs_init
+    def get_all_senat_scraping_dossier_refs(self) -> Dict[str, DossierRef]:
+        version = self._read_version(SENAT_DOSSIERS)
+        pattern = self._key_for_senat_scraping_dossier("*")
+        keys = self._scan_keys(self._dataset_key(SENAT_DOSSIERS, pattern, version))
+        return self._get_many_pickled_data(keys)
+
+    @needs_init
+    def get_opendata_lecture_by_texte(
+        self, texte_uid: str
+    ) -> Optional[Tuple[DossierRef, LectureRef]]:
+        key = self._key_for_opendata_lecture_by_texte(texte_uid)
+        index = self._get_json_data(DOSSIERS_TEXTES, key)
+        if index is None:
+            return None
+        dossier_uid, lecture_key = index
+        dossier_ref = self.get_opendata_dossier_ref(dossier_uid)
+        if dossier_ref is None:
+            return None
+        for lecture_ref in dossier_ref.lectures:
+            if lecture_ref.key == lecture_key:
+                return dossier_ref, lecture_ref
+        return None
 
     @needs_init
     def get_opendata_texte(self, uid: str) -> TexteRef:
         key = self._key_for_opendata_texte(uid)
-        texte_ref: TexteRef = self._get_pickled_data(key)
+        texte_ref: TexteRef = self._get_pickled_data(DOSSIERS_TEXTES, key)
         return texte_ref
 
     @needs_init
     def get_senat_scraping_dossier_ref(self, uid: str) -> DossierRef:
         key = self._key_for_senat_scraping_dossier(uid)
-        dossier_ref: DossierRef = self._get_pickled_data(key)
+        dossier_ref: DossierRef = self._get_pickled_data(SENAT_DOSSIERS, key)
         return dossier_ref
 
     @needs_init
@@ -248,15 +852,27 @@ class DataRepository(Repository):
         self, an_url: str
     ) -> Optional[DossierRef]:
         key = self._key_for_senat_scraping_dossier_by_an_url(an_url)
-        dossier_ref: DossierRef = self._get_pickled_data(key)
+        dossier_ref: DossierRef = self._get_pickled_data(SENAT_DOSSIERS, key)
         return dossier_ref
 
     @needs_init
     def get_senateur(self, matricule: str) -> Senateur:
         key = self._key_for_senateur(matricule)
-        senateur: Senateur = self._get_pickled_data(key)
+        senateur: Senateur = self._get_pickled_data(SENATEURS, key)
         return senateur
 
+    @needs_init
+    def get_senateurs(self, matricules: Iterable[str]) -> Dict[str, Senateur]:
+        """
+        Look up several senateurs at once, indexed by matricule (unknown ones are
+        left out)
+        """
+        keys = {
+            self._key_for_senateur(matricule): matricule for matricule in matricules
+        }
+        values = self._get_many_data(SENATEURS, keys, self._unpickle)
+        return {keys[key]: senateur for key, senateur in values.items() if senateur}
+
     @needs_init
     def _set_pickled_data(
         self, key: str, value: Any, ttl: Optional[int] = None
@@ -264,29 +880,84 @@ class DataRepository(Repository):
         self.connection.set(key, pickle.dumps(value), ex=ttl)
 
     @needs_init
-    def _get_pickled_data(self, key: str) -> Any:
-        raw_bytes = self._get_raw_data(key)
-        if raw_bytes is None:
-            return None
+    def _get_pickled_data(self, dataset: str, key: str) -> Any:
+        return self._get_data(dataset, key, self._unpickle)
+
+    @staticmethod
+    def _unpickle(raw_bytes: bytes) -> Any:
         unpickler = BackwardsCompatibleUnpickler(BytesIO(raw_bytes))
         return unpickler.load()
 
+    def _scan_keys(self, pattern: str) -> List[bytes]:
+        return list(self.connection.scan_iter(match=pattern, count=self.batch_size))
+
+    def _get_many_pickled_data(self, keys: List[bytes]) -> Dict[str, Any]:
+        """
+        Fetch and unpickle values by chunks of keys, indexed by their last part
+        """
+        values: Dict[str, Any] = {}
+        for chunk in chunked(keys, self.batch_size):
+            for key, raw_bytes in zip(chunk, self.connection.mget(chunk)):
+                if raw_bytes is not None:  # expired since the scan
+                    values[key.decode("utf-8").split(".")[-1]] = self._unpickle(
+                        raw_bytes
+                    )
+        return values
+
     @needs_init
-    def _set_json_data(self, key: str, value: Any) -> None:
-        self.connection.set(key, json.dumps(value))
+    def _get_json_data(self, dataset: str, key: str) -> Any:
+        return self._get_data(dataset, key, json.loads)
 
     @needs_init
-    def _get_json_data(self, key: str) -> Any:
-        raw_bytes = self._get_raw_data(key)
+    def _get_data(
+        self, dataset: str, key: str, decode: Callable[[bytes], Any]
+    ) -> Any:
+        version = self._read_version(dataset)
+        if version is None:  # data loaded before datasets were versioned
+            return self._decode(self.connection.get(key), decode)
+        value = self.cache.get((version, key), _MISSING)
+        if value is _MISSING:
+            raw_bytes = self.connection.get(self._versioned(key, version))
+            value = self._decode(raw_bytes, decode)
+            self.cache.set((version, key), value)
+        return value
+
+    def _get_many_data(
+        self, dataset: str, keys: Iterable[str], decode: Callable[[bytes], Any]
+    ) -> Dict[str, Any]:
+        """
+        Like `_get_data` for several keys, with one MGET per chunk of cache misses
+        """
+        version = self._read_version(dataset)
+        values: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in keys:
+            value = _MISSING
+            if version is not None:
+                value = self.cache.get((version, key), _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                values[key] = value
+        for chunk in chunked(missing, self.batch_size):
+            raw_values = self.connection.mget(
+                [
+                    key if version is None else self._versioned(key, version)
+                    for key in chunk
+                ]
+            )
+            for key, raw_bytes in zip(chunk, raw_values):
+                value = self._decode(raw_bytes, decode)
+                if version is not None:
+                    self.cache.set((version, key), value)
+                values[key] = value
+        return values
+
+    @staticmethod
+    def _decode(raw_bytes: Optional[bytes], decode: Callable[[bytes], Any]) -> Any:
         if raw_bytes is None:
             return None
-        return json.loads(raw_bytes)
-
-    @needs_init
-    def _get_raw_data(self, key: str) -> Optional[bytes]:
-        with Lock(self.connection, "data"):
-            response: Optional[bytes] = self.connection.get(key)
-            return response
+        return decode(raw_bytes)
 
 
 repository = DataRepository()
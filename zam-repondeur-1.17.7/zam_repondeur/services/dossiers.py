@@ -1,5 +1,10 @@
+import hashlib
+import os
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any, Dict, Optional, Union
 
 from pyramid.config import Configurator
 from pytz import timezone
@@ -21,30 +26,35 @@ def includeme(config: Configurator) -> None:
     dossier_export_repository.export_duration = int(
         config.registry.settings["zam.users.export_dossier_duration"]
     )
+    dossier_export_repository.exports_dir = config.registry.settings.get(
+        "zam.exports_dir",
+        os.path.join(config.registry.settings["zam.uploads_backup_dir"], "exports"),
+    )
 
 
 def get_dossiers_legislatifs_open_data_from_cache() -> DossierRefsByUID:
-    dossiers: DossierRefsByUID = {
-        uid: repository.get_opendata_dossier_ref(uid)
-        for uid in repository.list_opendata_dossiers()
-    }
+    dossiers: DossierRefsByUID = repository.get_all_opendata_dossier_refs()
     return dossiers
 
 
 def get_dossiers_legislatifs_scraping_senat_from_cache() -> DossierRefsByUID:
-    dossiers: DossierRefsByUID = {
-        uid: repository.get_senat_scraping_dossier_ref(uid)
-        for uid in repository.list_senat_scraping_dossiers()
-    }
+    dossiers: DossierRefsByUID = repository.get_all_senat_scraping_dossier_refs()
     return dossiers
 
 
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
 class DossierExportRepository(Repository):
     """
-    Store and access dossier export result in Redis
+    Store and access dossier export results
+
+    Archives are stored on disk, named after a digest of their content, and Redis
+    only keeps their metadata, which expires along with the export.
     """
 
     export_duration = 0
+    exports_dir = ""
 
     @needs_init
     def clear_data(self) -> None:
@@ -54,27 +64,73 @@ class DossierExportRepository(Repository):
     def _export_dossier_key(dossier: Dossier) -> str:
         return f"export_dossier-{dossier.pk}"
 
+    def new_export_file(self) -> Any:
+        """
+        A temporary file in the artifact store, to be passed to `set_export_file`
+        """
+        Path(self.exports_dir).mkdir(parents=True, exist_ok=True)
+        return NamedTemporaryFile(dir=self.exports_dir, suffix=".tmp", delete=False)
+
     @needs_init
     def set_export_content(self, dossier: Dossier, export_content: bytes) -> None:
+        with self.new_export_file() as file_:
+            file_.write(export_content)
+        self.set_export_file(dossier, file_.name)
+
+    @needs_init
+    def set_export_file(self, dossier: Dossier, path: Union[str, Path]) -> None:
+        """
+        Move the archive to the artifact store, and record its metadata
+        """
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as file_:
+            for chunk in iter(lambda: file_.read(CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        artifact_path = self._artifact_path(digest)
+        os.replace(path, artifact_path)
+        os.utime(artifact_path)  # expiration of artifacts is based on mtime
+
         key = self._export_dossier_key(dossier)
+        previous_digest = self.connection.hget(key, "digest")
         created_at = self.now()
         expires_at = self.to_timestamp(
             created_at + timedelta(seconds=self.export_duration)
         )
         pipe = self.connection.pipeline()
         pipe.multi()  # start transaction
+        pipe.delete(key)
         pipe.hset(
             key,
             mapping={
                 "slug": dossier.slug,
                 "created_at": self.to_timestamp(created_at),
                 "expires_at": expires_at,
-                "export_content": export_content,
+                "digest": digest,
+                "size": artifact_path.stat().st_size,
             },
         )
         pipe.expireat(key, expires_at)
         pipe.execute()  # execute transaction atomically
 
+        if previous_digest is not None and previous_digest.decode() != digest:
+            self._artifact_path(previous_digest.decode()).unlink(missing_ok=True)
+        self._remove_expired_artifacts()
+
+    def _artifact_path(self, digest: str) -> Path:
+        return Path(self.exports_dir) / f"{digest}.zip"
+
+    def _remove_expired_artifacts(self) -> None:
+        if self.export_duration <= 0:
+            return
+        deadline = time.time() - self.export_duration
+        for path in Path(self.exports_dir).glob("*.zip"):
+            try:
+                if path.stat().st_mtime < deadline:
+                    path.unlink()
+            except FileNotFoundError:  # removed by a concurrent export
+                pass
+
     def has_export_content(self, dossier: Dossier) -> Optional[datetime]:
         key = self._export_dossier_key(dossier)
         dossier_export = self.connection.hgetall(key)
@@ -95,10 +151,16 @@ class DossierExportRepository(Repository):
         created_at = self.from_timestamp(float(dossier_export[b"created_at"]))
         my_tz = timezone("Europe/Paris")
 
+        if b"digest" not in dossier_export:  # stored before the artifact store
+            return None
+        export_path = self._artifact_path(dossier_export[b"digest"].decode())
+        if not export_path.exists():
+            return None
+
         return {
             "created_at": created_at.astimezone(my_tz),
             "expires_at": expires_at.astimezone(my_tz),
-            "export_content": dossier_export[b"export_content"],
+            "export_path": export_path,
         }
 
 
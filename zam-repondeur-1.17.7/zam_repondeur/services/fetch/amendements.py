@@ -1,15 +1,12 @@
 import logging
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, NamedTuple, Optional
-
-from zam_repondeur.models import (
-    Amendement,
-    Article,
-    Chambre,
-    Lecture,
-    get_one_or_create,
-    get_one_or_none,
-)
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from zam_repondeur.models import Amendement, Article, Chambre, DBSession, Lecture
 from zam_repondeur.models.amendement import UNBATCHING_SORTS
 from zam_repondeur.models.division import SubDiv
 from zam_repondeur.models.events.amendement import (
@@ -147,6 +144,13 @@ class Action(ABC):
     def apply(self, lecture: Lecture) -> FetchResult:
         pass
 
+    @property
+    def article_subdiv(self) -> Optional[SubDiv]:
+        """
+        The article the action needs, if any (see `prepare_actions`)
+        """
+        return None
+
 
 class CreateOrUpdateAmendement(Action):
     def __init__(
@@ -181,26 +185,68 @@ class CreateOrUpdateAmendement(Action):
         self.expose = expose
         self.sort = sort
 
+    @property
+    def article_subdiv(self) -> Optional[SubDiv]:
+        return self.subdiv
+
     def _get_article(self, lecture: Lecture) -> Article:
         article: Article
         created: bool
-        article, created = get_one_or_create(
-            Article,
-            lecture=lecture,
-            type=self.subdiv.type_,
-            num=self.subdiv.num,
-            mult=self.subdiv.mult,
-            pos=self.subdiv.pos,
-        )
+        article, created = lecture.find_or_create_article(self.subdiv)
         return article
 
     def _get_parent(self, lecture: Lecture, article: Article) -> Optional[Amendement]:
         parent_num, parent_rectif = Amendement.parse_num(self.parent_num_raw)
         if not parent_num:
             return None
-        parent: Optional[Amendement]
-        parent, _ = get_one_or_none(Amendement, lecture=lecture, num=parent_num,)
-        return parent
+        return lecture.find_amendement(parent_num)
+
+
+def prepare_actions(lecture: Lecture, actions: Iterable[Action]) -> None:
+    """
+    Resolve in bulk what the actions refer to, so that applying them does not query
+    the database for each amendement
+
+    The existing amendements and articles are loaded in one query each (then looked
+    up through the lecture indexes), and the missing articles are all created now.
+    """
+    load_amendements(lecture)
+    subdivs: Set[SubDiv] = set()
+    for action in actions:
+        subdiv = action.article_subdiv
+        if subdiv is not None:
+            subdivs.add(subdiv)
+    missing = [subdiv for subdiv in subdivs if lecture.find_article(subdiv) is None]
+    for subdiv in sorted(missing):
+        Article.create(
+            lecture=lecture,
+            type=subdiv.type_,
+            num=subdiv.num,
+            mult=subdiv.mult,
+            pos=subdiv.pos,
+        )
+    if missing:
+        logger.info("%d articles créés", len(missing))
+
+
+def load_amendements(lecture: Lecture) -> None:
+    """
+    Load the amendements of the lecture with what fetching updates
+    """
+    if "amendements" not in inspect(lecture).unloaded:
+        return
+    amendements = (
+        DBSession.query(Amendement)
+        .filter(Amendement.lecture_pk == lecture.pk)
+        .options(
+            joinedload("article"),
+            joinedload("location"),
+            joinedload("user_content"),
+        )
+        .order_by(Amendement.position, Amendement.num)
+        .all()
+    )
+    set_committed_value(lecture, "amendements", amendements)
 
 
 class CreateAmendement(CreateOrUpdateAmendement):
@@ -1,13 +1,16 @@
 import logging
 import re
 from collections import OrderedDict
+from concurrent.futures import Future
 from http import HTTPStatus
-from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
 from urllib.parse import urljoin
 
 import xmltodict
+from cachecontrol import CacheControl
 from more_itertools import unique_everseen
 from pyramid.threadlocal import get_current_registry
+from requests import Session
 from requests.exceptions import ConnectionError
 
 from zam_repondeur.decorator import reify
@@ -23,10 +26,21 @@ from zam_repondeur.services.fetch.amendements import (
     FetchResult,
     RemoteSource,
     UpdateAmendement,
+    prepare_actions,
 )
 from zam_repondeur.services.fetch.division import parse_subdiv
 from zam_repondeur.services.fetch.exceptions import NotFound
-from zam_repondeur.services.fetch.http import get_http_session
+from zam_repondeur.services.fetch.http import (
+    content_digest,
+    fingerprints_repository,
+    get_http_session,
+)
+from zam_repondeur.services.fetch.parallel import (
+    cancel_pending,
+    get_max_workers,
+    get_rate_limiter,
+    map_ordered,
+)
 from zam_repondeur.tasks.huey import init_huey
 from zam_repondeur.templating import render_template
 
@@ -138,114 +152,238 @@ lecture %r, URL %s a échoué",
 
         total = len(derouleur.discussion_items)
 
-        for position, item in enumerate(derouleur.discussion_items, start=1):
-            numero_prefixe = item["@numero"]
-            id_discussion_commune = (
-                int(item["@discussionCommune"]) if item["@discussionCommune"] else None
-            )
-            id_identique = (
-                int(item["@discussionIdentique"])
-                if item["@discussionIdentique"]
-                else None
-            )
-            try:
-                amendement, action, triAmendement = self._collect_amendement(
-                    lecture=lecture,
-                    numero_prefixe=numero_prefixe,
-                    id_discussion_commune=id_discussion_commune,
-                    id_identique=id_identique,
+        retrieved = self._retrieve_amendements(
+            lecture, [item["@numero"] for item in derouleur.discussion_items]
+        )
+
+        with cancel_pending(retrieved):
+            for position, (item, future) in enumerate(
+                zip(derouleur.discussion_items, retrieved), start=1
+            ):
+                numero_prefixe = item["@numero"]
+                id_discussion_commune = (
+                    int(item["@discussionCommune"])
+                    if item["@discussionCommune"]
+                    else None
                 )
-                if action is not None:
-                    actions.append(action)
-                else:
-                    if amendement is None:
-                        raise ValueError("Invalid amendement return value")
-                    unchanged.append(amendement.num)
-            except AlertOnData as exception:
-                prefix, num = ANDerouleurData.parse_num_in_liste(numero_prefixe)
-                init_huey(get_current_registry().settings)
-                from zam_repondeur.tasks.asynchrone import alert_data_task
-
-                logger.exception(
-                    "La récupération de l'amendement {num} pour la lecture \
-lecture %r, URL %s a échoué",
-                    lecture,
-                    exception.url,
+                id_identique = (
+                    int(item["@discussionIdentique"])
+                    if item["@discussionIdentique"]
+                    else None
                 )
-                context = {
-                    "url": exception.url,
-                    "titre": f"{lecture.dossier.titre} : {lecture}",
-                    "message": exception.message,
-                }
-                alert_data_task(context, exception.error, lecture_pk=lecture.pk)
-                errored.append(str(num))
-                continue
-            triAmendements.append(triAmendement)
-            self._set_fetch_progress(lecture, position, total)
+                try:
+                    amendement, action, triAmendement = self._inspect_retrieved(
+                        lecture=lecture,
+                        retrieved=future.result(),
+                        id_discussion_commune=id_discussion_commune,
+                        id_identique=id_identique,
+                    )
+                    if action is not None:
+                        actions.append(action)
+                    else:
+                        if amendement is None:
+                            raise ValueError("Invalid amendement return value")
+                        unchanged.append(amendement.num)
+                except AlertOnData as exception:
+                    prefix, num = ANDerouleurData.parse_num_in_liste(numero_prefixe)
+                    init_huey(get_current_registry().settings)
+                    from zam_repondeur.tasks.asynchrone import alert_data_task
+
+                    logger.exception(
+                        "La récupération de l'amendement {num} pour la lecture \
+lecture %r, URL %s a échoué",
+                        lecture,
+                        exception.url,
+                    )
+                    context = {
+                        "url": exception.url,
+                        "titre": f"{lecture.dossier.titre} : {lecture}",
+                        "message": exception.message,
+                    }
+                    alert_data_task(context, exception.error, lecture_pk=lecture.pk)
+                    errored.append(str(num))
+                    continue
+                triAmendements.append(triAmendement)
+                self._set_fetch_progress(lecture, position, total)
         return actions, unchanged, errored, triAmendements
 
     def _collect_amendements_other(
-        self, lecture: Lecture, discussion_nums: Set[int], prefix: str, max_404: int,
+        self,
+        lecture: Lecture,
+        discussion_nums: Set[int],
+        prefix: str,
+        max_404: int,
+        adaptive: bool = True,
     ) -> Tuple[List[Action], List[int], List[str], List[Tuple[str, int]]]:
-        actions: List[Action] = []
-        unchanged: List[int] = []
-        errored: List[str] = []
-        triAmendements: List[Tuple[str, int]] = []
+        collected: Tuple[
+            List[Action], List[int], List[str], List[Tuple[str, int]]
+        ] = ([], [], [], [])
 
         max_num_in_liste = max(discussion_nums, default=0)
         max_num_in_lecture = max((amdt.num for amdt in lecture.amendements), default=0)
         max_num_seen = max(max_num_in_liste, max_num_in_lecture)
 
-        numero = 0
         logger.info("Début de l'exploration des amendements")
 
-        while numero < (max_num_seen + max_404):
-            logger.info("max_num : %d, max_404 : %d", max_num_seen, max_404)
-            numero += 1
-            numero_prefixe = f"{prefix}{numero}"
-            if numero in discussion_nums:
-                logger.info("L'amendement %r est en discussion", numero_prefixe)
-                continue
-            try:
-                amendement, action, triAmendement = self._collect_amendement(
-                    lecture=lecture,
-                    numero_prefixe=numero_prefixe,
-                    id_discussion_commune=None,
-                    id_identique=None,
-                )
-                if action is not None:
-                    actions.append(action)
-                else:
-                    if amendement is None:
-                        raise ValueError("Invalid amendement return value")
-                    unchanged.append(amendement.num)
-            except AlertOnData as exception:
-                init_huey(get_current_registry().settings)
-                from zam_repondeur.tasks.asynchrone import alert_data_task
-
-                logger.exception(
-                    f"La récupération de l'amendement {numero} pour la \
-lecture %r, URL %s a échoué",
-                    lecture,
-                    exception.url,
-                )
-                context = {
-                    "url": exception.url,
-                    "titre": f"{lecture.dossier.titre} : {lecture}",
-                    "message": exception.message,
-                }
-                if exception.error != ("http", 404):
-                    alert_data_task(context, exception.error, lecture_pk=lecture.pk)
-                    errored.append(str(numero))
-                continue
-            if numero > max_num_seen:
-                max_num_seen = numero
-            triAmendements.append(triAmendement)
+        if adaptive:
+            max_num_seen = self._explore_adaptive(
+                lecture, discussion_nums, prefix, max_404, max_num_seen, collected
+            )
+        else:
+            max_num_seen = self._explore_linear(
+                lecture, discussion_nums, prefix, max_404, max_num_seen, collected
+            )
+
         logger.info(
             f"Fin de l'exploration des amendements : aucun autre amendement trouvé \
 jusqu'au numéro {max_num_seen + max_404}"
         )
-        return actions, unchanged, errored, triAmendements
+        return collected
+
+    def _explore_linear(
+        self,
+        lecture: Lecture,
+        discussion_nums: Set[int],
+        prefix: str,
+        max_404: int,
+        max_num_seen: int,
+        collected: Tuple[List[Action], List[int], List[str], List[Tuple[str, int]]],
+        numero: int = 0,
+    ) -> int:
+        """
+        Essaie tous les numéros après `numero` jusqu'à `max_404` échecs consécutifs.
+        """
+
+        # Numbers are explored by windows up to the current upper bound, so that
+        # they can be downloaded concurrently. Finding an amendement pushes the
+        # bound further, and the next window picks up from there, exactly as the
+        # sequential exploration would.
+        while numero < (max_num_seen + max_404):
+            logger.info("max_num : %d, max_404 : %d", max_num_seen, max_404)
+            window = range(numero + 1, max_num_seen + max_404 + 1)
+            for discussed in (n for n in window if n in discussion_nums):
+                logger.info("L'amendement %r est en discussion", f"{prefix}{discussed}")
+            candidates = [n for n in window if n not in discussion_nums]
+            retrieved = self._retrieve_amendements(
+                lecture, [f"{prefix}{n}" for n in candidates]
+            )
+            numero = window[-1]
+            found, _ = self._process_amendements_other(
+                lecture, list(zip(candidates, retrieved)), collected
+            )
+            max_num_seen = max(found, default=max_num_seen)
+        return max_num_seen
+
+    def _explore_adaptive(
+        self,
+        lecture: Lecture,
+        discussion_nums: Set[int],
+        prefix: str,
+        max_404: int,
+        max_num_seen: int,
+        collected: Tuple[List[Action], List[int], List[str], List[Tuple[str, int]]],
+    ) -> int:
+        """
+        Explore les numéros connus, sauf ceux déjà connus comme absents, puis la
+        fin comme l'exploration linéaire.
+
+        Les numéros absents lors d'une précédente exploration de la lecture ne
+        sont pas redemandés tant que l'information n'a pas expiré. Les autres
+        numéros jusqu'au plus grand connu sont tous redemandés, car leur contenu
+        a pu changer.
+        """
+        from zam_repondeur.services.amendements import (
+            repository as amendements_repository,
+        )
+
+        known_nums = {amdt.num for amdt in lecture.amendements}
+        known_missing = amendements_repository.get_missing_nums(lecture.pk)
+        skipped = known_missing - known_nums
+        candidates = [
+            n
+            for n in range(1, max_num_seen + 1)
+            if n not in discussion_nums and n not in skipped
+        ]
+        logger.info(
+            "%d numéros à explorer, %d déjà connus comme absents",
+            len(candidates),
+            len(skipped),
+        )
+        retrieved = self._retrieve_amendements(
+            lecture, [f"{prefix}{n}" for n in candidates]
+        )
+        found, missing = self._process_amendements_other(
+            lecture, list(zip(candidates, retrieved)), collected
+        )
+        # A number past the last existing amendement may be published any time
+        last_num = max(found | known_nums, default=0)
+        amendements_repository.add_missing_nums(
+            lecture.pk, {n for n in missing - known_nums if n < last_num}
+        )
+        max_num_seen = max(max(found, default=0), max_num_seen)
+        return self._explore_linear(
+            lecture,
+            discussion_nums,
+            prefix,
+            max_404,
+            max_num_seen,
+            collected,
+            numero=max_num_seen,
+        )
+
+    def _process_amendements_other(
+        self,
+        lecture: Lecture,
+        retrieved: List[Tuple[int, "Future[RetrievedAmendement]"]],
+        collected: Tuple[List[Action], List[int], List[str], List[Tuple[str, int]]],
+    ) -> Tuple[Set[int], Set[int]]:
+        """
+        Inspecte les amendements récupérés, dans l'ordre des numéros.
+
+        Renvoie les numéros trouvés et ceux qui n'existent pas (404).
+        """
+        actions, unchanged, errored, triAmendements = collected
+        found: Set[int] = set()
+        missing: Set[int] = set()
+        with cancel_pending([future for _, future in retrieved]):
+            for candidate, future in retrieved:
+                try:
+                    amendement, action, triAmendement = self._inspect_retrieved(
+                        lecture=lecture,
+                        retrieved=future.result(),
+                        id_discussion_commune=None,
+                        id_identique=None,
+                    )
+                    if action is not None:
+                        actions.append(action)
+                    else:
+                        if amendement is None:
+                            raise ValueError("Invalid amendement return value")
+                        unchanged.append(amendement.num)
+                except AlertOnData as exception:
+                    init_huey(get_current_registry().settings)
+                    from zam_repondeur.tasks.asynchrone import alert_data_task
+
+                    logger.exception(
+                        f"La récupération de l'amendement {candidate} pour la \
+lecture %r, URL %s a échoué",
+                        lecture,
+                        exception.url,
+                    )
+                    context = {
+                        "url": exception.url,
+                        "titre": f"{lecture.dossier.titre} : {lecture}",
+                        "message": exception.message,
+                    }
+                    if exception.error != ("http", 404):
+                        alert_data_task(context, exception.error, lecture_pk=lecture.pk)
+                        errored.append(str(candidate))
+                    else:
+                        missing.add(candidate)
+                    continue
+                found.add(candidate)
+                triAmendements.append(triAmendement)
+        return found, missing
 
     def _collect_amendement(
         self,
@@ -260,6 +398,51 @@ jusqu'au numéro {max_num_seen + max_404}"
         """
         logger.info("Récupération de l'amendement %r", numero_prefixe)
         amend_data = _retrieve_amendement(lecture, numero_prefixe)
+        return self._inspect_amendement_data(
+            lecture, amend_data, position, id_discussion_commune, id_identique
+        )
+
+    def _retrieve_amendements(
+        self, lecture: Lecture, numeros_prefixe: List[str]
+    ) -> List["Future[RetrievedAmendement]"]:
+        """
+        Récupère plusieurs amendements en parallèle, dans l'ordre demandé.
+        """
+        registry = get_current_registry()
+        http_session = get_http_session(registry)
+        rate_limiter = get_rate_limiter(registry)
+        # Worker threads must not touch the database session.
+        label = str(lecture)
+        urls = [_build_amendement_url(lecture, numero) for numero in numeros_prefixe]
+
+        def retrieve(numero_and_url: Tuple[str, str]) -> RetrievedAmendement:
+            numero_prefixe, url = numero_and_url
+            logger.info("Récupération de l'amendement %r", numero_prefixe)
+            rate_limiter.wait(url)
+            content = _download_content(url, label, http_session=http_session)
+            digest = content_digest(content)
+            fingerprint = fingerprints_repository.get_fingerprint(url)
+            amend_data = None
+            if fingerprint is None or fingerprint["digest"] != digest:
+                amend_data = ANAmendementData(
+                    _parse_content(
+                        url, label, content, force_list=_FORCE_LIST_KEYS_AMENDEMENT
+                    )
+                )
+            return RetrievedAmendement(url, digest, fingerprint, content, amend_data)
+
+        return map_ordered(
+            retrieve, zip(numeros_prefixe, urls), max_workers=get_max_workers(registry)
+        )
+
+    def _inspect_amendement_data(
+        self,
+        lecture: Lecture,
+        amend_data: "ANAmendementData",
+        position: Optional[int] = None,
+        id_discussion_commune: Optional[int] = None,
+        id_identique: Optional[int] = None,
+    ) -> Tuple[Optional["Amendement"], Optional[Action], Tuple[str, int]]:
         amendement, action = self.inspect_amendement(
             lecture, amend_data, position, id_discussion_commune, id_identique
         )
@@ -269,6 +452,52 @@ jusqu'au numéro {max_num_seen + max_404}"
             (amend_data.get_triAmendement(), amend_data.get_num()),
         )
 
+    def _inspect_retrieved(
+        self,
+        lecture: Lecture,
+        retrieved: "RetrievedAmendement",
+        id_discussion_commune: Optional[int] = None,
+        id_identique: Optional[int] = None,
+    ) -> Tuple[Optional["Amendement"], Optional[Action], Tuple[str, int]]:
+        """
+        Inspecte un amendement récupéré, sans l'analyser s'il n'a pas changé.
+        """
+        if retrieved.fingerprint is not None and retrieved.unchanged:
+            num = int(retrieved.fingerprint["num"])
+            amendement = lecture.find_amendement(num)
+            if (
+                amendement is not None
+                and amendement.id_discussion_commune == id_discussion_commune
+                and amendement.id_identique == id_identique
+            ):
+                return amendement, None, (retrieved.fingerprint["triAmendement"], num)
+
+        amend_data = retrieved.amend_data
+        if amend_data is None:
+            amend_data = ANAmendementData(
+                _parse_content(
+                    retrieved.url,
+                    lecture,
+                    retrieved.content,
+                    force_list=_FORCE_LIST_KEYS_AMENDEMENT,
+                )
+            )
+        amendement, action, triAmendement = self._inspect_amendement_data(
+            lecture,
+            amend_data,
+            id_discussion_commune=id_discussion_commune,
+            id_identique=id_identique,
+        )
+        if action is None:
+            # The database now reflects this content: next time we can skip it.
+            fingerprints_repository.set_fingerprint(
+                retrieved.url,
+                retrieved.digest,
+                num=triAmendement[1],
+                triAmendement=triAmendement[0],
+            )
+        return amendement, action, triAmendement
+
     def inspect_amendement(
         self,
         lecture: Lecture,
@@ -368,6 +597,7 @@ jusqu'au numéro {max_num_seen + max_404}"
         lecture.set_fetch_progress(position, total)
 
     def apply_changes(self, lecture: Lecture, changes: CollectedChanges) -> FetchResult:
+        prepare_actions(lecture, changes.actions)
 
         unchanged_amendements = [
             amdt
@@ -436,10 +666,23 @@ _ORGANE_PREFIX = {
 
 
 def _retrieve_content(
-    url: str, lecture: Lecture, force_list: Optional[Tuple[str]] = None
+    url: str,
+    lecture: Union[Lecture, str],
+    force_list: Optional[Tuple[str]] = None,
+    http_session: Optional[Union[Session, CacheControl]] = None,
 ) -> Dict[str, OrderedDict]:
+    content = _download_content(url, lecture, http_session=http_session)
+    return _parse_content(url, lecture, content, force_list=force_list)
+
+
+def _download_content(
+    url: str,
+    lecture: Union[Lecture, str],
+    http_session: Optional[Union[Session, CacheControl]] = None,
+) -> bytes:
     logger.info("Récupération de %r", url)
-    http_session = get_http_session()
+    if http_session is None:
+        http_session = get_http_session()
     try:
         resp = http_session.get(url)
     except ConnectionError:
@@ -481,9 +724,19 @@ def _retrieve_content(
             resp.status_code,
             url=url,
         )
+    content: bytes = resp.content
+    return content
+
+
+def _parse_content(
+    url: str,
+    lecture: Union[Lecture, str],
+    content: bytes,
+    force_list: Optional[Tuple[str]] = None,
+) -> Dict[str, OrderedDict]:
     # We should be able to parse the content, and we want to know if it fail
     try:
-        result: OrderedDict = xmltodict.parse(resp.content, force_list=force_list)
+        result: OrderedDict = xmltodict.parse(content, force_list=force_list)
     except Exception:
         logger.error(
             f"Erreur lors de la récupération d'un contenu AN pour {lecture}, \
@@ -659,6 +912,24 @@ class TableauCredits(NamedTuple):
     solde: str
 
 
+class RetrievedAmendement(NamedTuple):
+    """
+    Raw content of an AN amendement, parsed only if it changed since last time
+    """
+
+    url: str
+    digest: str
+    fingerprint: Optional[Dict[str, str]]
+    content: bytes
+    amend_data: Optional["ANAmendementData"]
+
+    @property
+    def unchanged(self) -> bool:
+        return (
+            self.fingerprint is not None and self.fingerprint["digest"] == self.digest
+        )
+
+
 class ANAmendementData:
     """
     Data extaction for Assemblée Nationale amendement
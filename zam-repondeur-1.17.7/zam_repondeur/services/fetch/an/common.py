@@ -1,43 +1,74 @@
+import hashlib
 import logging
 from http import HTTPStatus
-from io import BytesIO, TextIOWrapper
-from typing import IO, Generator, Tuple
-from zipfile import ZipFile
+from tempfile import SpooledTemporaryFile
+from typing import IO, Any, List, NamedTuple, Optional, Tuple
+from zipfile import ZipInfo
 
 from zam_repondeur.services.fetch.http import get_http_session
 
 logger = logging.getLogger(__name__)
 
 
-def extract_from_remote_zip(url: str) -> Generator[Tuple[str, IO[str]], None, None]:
+# Archives are downloaded to a temporary file, only small ones are kept in memory
+SPOOL_MAX_SIZE = 16 * 1024 * 1024  # 16 MB
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+class ParsedMember(NamedTuple):
+    """
+    Items parsed from an archive member (None if skipped because unchanged)
+    """
+
+    filename: str
+    digest: str
+    items: Optional[List[Any]]
+
+
+def download_remote_zip(url: str) -> Optional[Tuple[IO[bytes], str]]:
+    """
+    Download a zip archive to a (spooled) temporary file, along with its digest
+
+    Returns None if the archive was not found.
+    """
     http_session = get_http_session()
-    response = http_session.get(url)
-
-    if response.status_code == HTTPStatus.NOT_FOUND:
-        logger.warning(
-            f"Not found status code:{response.status_code} while fetching {url}"
-        )
-        return
-
-    if response.status_code not in (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED):
-        message = f"Unexpected status code {response.status_code} while fetching {url}"
-        logger.error(message)
-        raise RuntimeError(message)
-
-    content_type = response.headers["content-type"]
-    if content_type != "application/zip":
-        message = (
-            f"Unexpected content type {content_type} while fetching {url} "
-            "(expected application/zip)"
-        )
-        logger.error(message)
-        raise RuntimeError(message)
-
-    yield from extract_from_zip(BytesIO(response.content))
-
-
-def extract_from_zip(content: BytesIO) -> Generator[Tuple[str, IO[str]], None, None]:
-    with ZipFile(content) as zip_file:
-        for filename in zip_file.namelist():
-            with zip_file.open(filename) as file_:
-                yield (filename, TextIOWrapper(file_, encoding="utf-8"))
+    response = http_session.get(url, stream=True)
+
+    with response:
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            logger.warning(
+                f"Not found status code:{response.status_code} while fetching {url}"
+            )
+            return None
+
+        if response.status_code not in (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED):
+            message = (
+                f"Unexpected status code {response.status_code} while fetching {url}"
+            )
+            logger.error(message)
+            raise RuntimeError(message)
+
+        content_type = response.headers["content-type"]
+        if content_type != "application/zip":
+            message = (
+                f"Unexpected content type {content_type} while fetching {url} "
+                "(expected application/zip)"
+            )
+            logger.error(message)
+            raise RuntimeError(message)
+
+        archive: IO[bytes] = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        sha256 = hashlib.sha256()
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            archive.write(chunk)
+            sha256.update(chunk)
+        archive.seek(0)
+        return archive, sha256.hexdigest()
+
+
+def member_digest(info: ZipInfo) -> str:
+    """
+    Cheap digest of an archive member, from its CRC and size in the zip directory
+    """
+    return f"{info.CRC:08x}-{info.file_size}"
+
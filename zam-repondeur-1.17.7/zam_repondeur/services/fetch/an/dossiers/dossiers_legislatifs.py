@@ -1,60 +1,122 @@
 import logging
 import re
 from datetime import datetime
+from io import TextIOWrapper
 from json import load
-from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from typing import (
+    IO,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+from zipfile import ZipFile, ZipInfo
 
 from zam_repondeur.models.chambre import Chambre
 from zam_repondeur.slugs import slugify
 from zam_repondeur.utils import conversion_arabe_romain
 
 from ...dates import parse_date
-from ..common import extract_from_remote_zip
+from ..common import ParsedMember, member_digest
 from .models import DossierRef, DossierRefsByUID, LectureRef, Phase, TexteRef, TypeTexte
 
 logger = logging.getLogger(__name__)
 
 
-def get_dossiers_legislatifs_and_textes(
-    *legislatures: int,
-) -> Tuple[DossierRefsByUID, Dict[str, TexteRef]]:
-    all_dossiers: DossierRefsByUID = {}
-    all_textes: Dict[str, TexteRef] = {}
-    for legislature in legislatures:
-        dossiers, textes = _get_dossiers_legislatifs_and_textes(legislature)
-        all_dossiers.update(dossiers)
-        all_textes.update(textes)
-    return all_dossiers, all_textes
+class TextesWithFallback(Dict[str, TexteRef]):
+    """
+    Textes parsed so far, falling back to `get_texte` for the others
+    """
+
+    def __init__(self, get_texte: Optional[Callable[[str], Optional[TexteRef]]]):
+        super().__init__()
+        self.get_texte = get_texte
+
+    def __missing__(self, uid: str) -> TexteRef:
+        texte_ref = self.get_texte(uid) if self.get_texte is not None else None
+        if texte_ref is None:
+            raise KeyError(uid)
+        self[uid] = texte_ref
+        return texte_ref
 
 
-def _get_dossiers_legislatifs_and_textes(
+def iter_dossiers_legislatifs_and_textes_members(
     legislature: int,
-) -> Tuple[DossierRefsByUID, Dict[str, TexteRef]]:
-    # As of June 20th, 2019 the Assemblée Nationale website updated the way
-    # their opendata zip content is splitted, without changing old
-    # legislatures. Hence we have to keep two ways to parse their content
-    # forever. And ever.
-    if legislature <= 14:
-        data = list(fetch_dossiers_legislatifs_and_textes(legislature).values())[0]
-        textes = parse_textes(data["export"]["textesLegislatifs"]["document"])
-        dossiers = parse_dossiers(
-            data["export"]["dossiersLegislatifs"]["dossier"], textes
-        )
-    else:
-        data = fetch_dossiers_legislatifs_and_textes(legislature)
-        textes_data: List[Dict[str, Any]] = [
-            dict_["document"]
-            for filename, dict_ in data.items()
-            if filename.startswith("json/document")
-        ]
-        textes = parse_textes(textes_data)
-        dossiers_data: List[Dict[str, Any]] = [
-            dict_
-            for filename, dict_ in data.items()
-            if filename.startswith("json/dossierParlementaire")
-        ]
-        dossiers = parse_dossiers(dossiers_data, textes)
-    return dossiers, textes
+    archive: IO[bytes],
+    previous: Optional[Mapping[str, str]] = None,
+    previous_textes: Optional[Mapping[str, Collection[str]]] = None,
+    get_texte: Optional[Callable[[str], Optional[TexteRef]]] = None,
+) -> Iterator[ParsedMember]:
+    """
+    Parse textes members, then dossiers members, unless their digest is in `previous`
+
+    Archive members are parsed one at a time, so that memory usage does not depend
+    on the size of the archive (except for the textes of the legislature, which
+    are needed to build the lectures of its dossiers).
+
+    An unchanged dossier is parsed again if one of its `previous_textes` changed.
+    Textes from unchanged members are retrieved with `get_texte` when needed.
+    """
+    previous = previous or {}
+    previous_textes = previous_textes or {}
+    with ZipFile(archive) as zip_file:
+        # As of June 20th, 2019 the Assemblée Nationale website updated the way
+        # their opendata zip content is splitted, without changing old
+        # legislatures. Hence we have to keep two ways to parse their content
+        # forever. And ever.
+        if legislature <= 14:
+            info = zip_file.infolist()[0]
+            digest = member_digest(info)
+            if previous.get(info.filename) == digest:
+                yield ParsedMember(info.filename, digest, None)
+                return
+            data = _load_member(zip_file, info)
+            textes = parse_textes(data["export"]["textesLegislatifs"]["document"])
+            dossiers = parse_dossiers(
+                data["export"]["dossiersLegislatifs"]["dossier"], textes
+            )
+            items = [*textes.values(), *dossiers.values()]
+            yield ParsedMember(info.filename, digest, items)
+            return
+
+        all_textes = TextesWithFallback(get_texte)
+        changed_textes: Set[str] = set()
+        for info in zip_file.infolist():
+            if not info.filename.startswith("json/document"):
+                continue
+            digest = member_digest(info)
+            if previous.get(info.filename) == digest:
+                yield ParsedMember(info.filename, digest, None)
+                continue
+            textes = parse_textes([_load_member(zip_file, info)["document"]])
+            all_textes.update(textes)
+            changed_textes.update(textes)
+            yield ParsedMember(info.filename, digest, list(textes.values()))
+
+        for info in zip_file.infolist():
+            if not info.filename.startswith("json/dossierParlementaire"):
+                continue
+            digest = member_digest(info)
+            if previous.get(info.filename) == digest and changed_textes.isdisjoint(
+                previous_textes.get(info.filename, ())
+            ):
+                yield ParsedMember(info.filename, digest, None)
+                continue
+            dossiers = parse_dossiers([_load_member(zip_file, info)], all_textes)
+            yield ParsedMember(info.filename, digest, list(dossiers.values()))
+
+
+def _load_member(zip_file: ZipFile, info: ZipInfo) -> dict:
+    with zip_file.open(info) as file_:
+        data: dict = load(TextIOWrapper(file_, encoding="utf-8"))
+        return data
 
 
 def get_url_dossiers(legislature: int) -> str:
@@ -71,15 +133,7 @@ def get_url_dossiers(legislature: int) -> str:
             f"Dossiers_Legislatifs.json.zip"
         )
 
-def fetch_dossiers_legislatifs_and_textes(legislature: int) -> dict:
-    url = get_url_dossiers(legislature)
-    return {
-        filename: load(json_file)
-        for filename, json_file in extract_from_remote_zip(url)
-    }
-
-
-def parse_textes(textes: list) -> Dict[str, TexteRef]:
+def parse_textes(textes: Iterable[dict]) -> Dict[str, TexteRef]:
     today = datetime.utcnow()
     return {
         item["uid"]: TexteRef(
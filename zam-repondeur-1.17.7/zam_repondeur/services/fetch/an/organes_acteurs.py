@@ -1,42 +1,43 @@
+from io import TextIOWrapper
 from json import load
-from typing import Any, Dict, List, Tuple
-
-from .common import extract_from_remote_zip
-
-
-def get_organes_acteurs() -> Tuple[Dict[str, dict], Dict[str, dict]]:
-    data = fetch_organes_acteurs()
-    organes_data: List[Dict[str, Any]] = [
-        dict_["organe"]
-        for filename, dict_ in data.items()
-        if filename.startswith("json/organe")
-    ]
-    organes = extract_organes(organes_data)
-    acteurs_data: List[Dict[str, Any]] = [
-        dict_["acteur"]
-        for filename, dict_ in data.items()
-        if filename.startswith("json/acteur")
-    ]
-    acteurs = extract_acteurs(acteurs_data)
-    return organes, acteurs
-
-
-def fetch_organes_acteurs() -> Dict[str, Any]:
-    url = (
-        "http://data.assemblee-nationale.fr/static/openData/repository/16/amo/"
-        "tous_acteurs_mandats_organes_xi_legislature/"
-        "AMO30_tous_acteurs_tous_mandats_tous_organes_historique.json.zip"
-    )
-    return {
-        filename: load(json_file)
-        for filename, json_file in extract_from_remote_zip(url)
-        if filename.endswith(".json")
-    }
-
-
-def extract_organes(organes: List[dict]) -> Dict[str, dict]:
-    return {organe["uid"]: organe for organe in organes}
-
-
-def extract_acteurs(acteurs: List[dict]) -> Dict[str, dict]:
-    return {acteur["uid"]["#text"]: acteur for acteur in acteurs}
+from typing import IO, Iterator, Mapping, Optional
+from zipfile import ZipFile
+
+from .common import ParsedMember, member_digest
+
+URL_ORGANES_ACTEURS = (
+    "http://data.assemblee-nationale.fr/static/openData/repository/16/amo/"
+    "tous_acteurs_mandats_organes_xi_legislature/"
+    "AMO30_tous_acteurs_tous_mandats_tous_organes_historique.json.zip"
+)
+
+ORGANE = "organe"
+ACTEUR = "acteur"
+
+
+def iter_organes_acteurs_members(
+    archive: IO[bytes], previous: Optional[Mapping[str, str]] = None
+) -> Iterator[ParsedMember]:
+    """
+    Parse each member of the archive, unless its digest is in `previous`
+    """
+    previous = previous or {}
+    with ZipFile(archive) as zip_file:
+        for info in zip_file.infolist():
+            filename = info.filename
+            if not filename.endswith(".json"):
+                continue
+            if filename.startswith("json/organe"):
+                kind = ORGANE
+            elif filename.startswith("json/acteur"):
+                kind = ACTEUR
+            else:
+                continue
+            digest = member_digest(info)
+            if previous.get(filename) == digest:
+                yield ParsedMember(filename, digest, None)
+                continue
+            with zip_file.open(info) as file_:
+                data = load(TextIOWrapper(file_, encoding="utf-8"))[kind]
+            uid = data["uid"] if kind == ORGANE else data["uid"]["#text"]
+            yield ParsedMember(filename, digest, [(kind, uid, data)])
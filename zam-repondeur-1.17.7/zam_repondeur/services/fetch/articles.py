@@ -12,8 +12,8 @@ from zam_repondeur.models import (
     Lecture,
     Texte,
     TypeTexte,
-    get_one_or_create,
 )
+from zam_repondeur.models.division import SubDiv
 from zam_repondeur.models.events.article import (
     ContenuArticleModifie,
     TitreArticleModifie,
@@ -98,11 +98,13 @@ def update_lecture_articles(lecture: Lecture, all_article_data: List[dict]) -> b
             continue
         elif article_data["type"] == "annexe":
             articles = [
-                get_one_or_create(
-                    Article,
-                    lecture=lecture,
-                    type=article_data["type"],
-                    num=str(index),  # To avoid override in case of many annexes.
+                lecture.find_or_create_article(
+                    SubDiv(
+                        type_=article_data["type"],
+                        num=str(index),  # To avoid override in case of many annexes.
+                        mult="",
+                        pos="",
+                    )
                 )[0]
             ]
         else:
@@ -120,13 +122,8 @@ def update_lecture_articles(lecture: Lecture, all_article_data: List[dict]) -> b
 def find_or_create_articles(lecture: Lecture, article_data: dict) -> List[Article]:
     nums_mults = get_article_nums_mults(article_data)
     return [
-        get_one_or_create(
-            Article,
-            lecture=lecture,
-            type=article_data["type"],
-            num=num,
-            mult=mult,
-            pos="",
+        lecture.find_or_create_article(
+            SubDiv(type_=article_data["type"], num=num, mult=mult, pos="")
         )[0]
         for num, mult in nums_mults
     ]
@@ -0,0 +1,318 @@
+"""
+Shared storage backends for the HTTP response cache
+
+The default `FileCache` keeps one file per URL on each host. These backends let
+all workers share a single cache (a Redis database, or a single SQLite file on a
+shared volume), bounded in size with least-recently-used eviction. Bodies are
+stored compressed, and hit/miss counters are kept alongside the entries.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from cachecontrol.cache import BaseCache
+from cachecontrol.caches.file_cache import FileCache
+from redis import Redis  # type: ignore[attr-defined]
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024  # 1 GB (compressed)
+
+# Number of least recently used entries dropped at once when over the size limit
+EVICTION_BATCH = 100
+
+# Access times closer than this (in seconds) are not worth a write on each read
+ACCESS_TIME_RESOLUTION = 60
+
+# Number of hits and misses counted in memory before they are written
+COUNTERS_BATCH = 100
+
+
+def make_http_cache(settings: Dict[str, str]) -> BaseCache:
+    """
+    Build the cache backend selected by `zam.http_cache_backend`
+    """
+    backend = settings.get("zam.http_cache_backend", "file")
+    http_cache_dir = settings["zam.http_cache_dir"]
+    max_size = int(settings.get("zam.http_cache_max_size", DEFAULT_MAX_SIZE))
+    if backend == "file":
+        return LockedCache(FileCache(http_cache_dir))
+    if backend == "redis":
+        return RedisHTTPCache(
+            Redis.from_url(settings["zam.http_cache_redis_url"]), max_size=max_size
+        )
+    if backend == "sqlite":
+        path = settings.get(
+            "zam.http_cache_sqlite_path",
+            os.path.join(http_cache_dir, "http_cache.sqlite"),
+        )
+        return SQLiteHTTPCache(path, max_size=max_size)
+    raise ValueError(f"Unknown HTTP cache backend {backend!r}")
+
+
+class LockedCache(BaseCache):
+    """
+    Serialize the accesses to a cache that is not thread-safe
+
+    The `FileCache` only locks against other processes writing the same file, and
+    is used by the threads that download concurrently.
+    """
+
+    def __init__(self, cache: BaseCache) -> None:
+        self.cache = cache
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value: Optional[bytes] = self.cache.get(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self.cache.set(key, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self.cache.delete(key)
+
+
+class RedisHTTPCache(BaseCache):
+    """
+    HTTP cache shared by all workers through Redis
+
+    The size of each entry is swapped atomically with its value, and the total size
+    is then adjusted by the difference, so that concurrent writers never count the
+    same entry twice.
+    """
+
+    def __init__(
+        self, connection: Redis, max_size: int = DEFAULT_MAX_SIZE, prefix: str = "http"
+    ) -> None:
+        self.connection = connection
+        self.max_size = max_size
+        self.prefix = prefix
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}.{name}"
+
+    def _data_key(self, key: str) -> str:
+        return self._key(f"data.{key}")
+
+    def _size_key(self, key: str) -> str:
+        return self._key(f"size.{key}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.connection.get(self._data_key(key))
+        pipe = self.connection.pipeline()
+        if value is None:
+            pipe.incr(self._key("misses"))
+            pipe.execute()
+            return None
+        pipe.incr(self._key("hits"))
+        pipe.zadd(self._key("lru"), {key: time.time()})
+        pipe.execute()
+        return zlib.decompress(value)
+
+    def set(self, key: str, value: bytes) -> None:
+        compressed = zlib.compress(value)
+        pipe = self.connection.pipeline()  # MULTI / EXEC
+        pipe.getset(self._size_key(key), len(compressed))
+        pipe.set(self._data_key(key), compressed)
+        pipe.zadd(self._key("lru"), {key: time.time()})
+        old_size, _, _ = pipe.execute()
+        self.connection.incrby(self._key("size"), len(compressed) - int(old_size or 0))
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        self._delete_many([key])
+
+    def _delete_many(self, keys: List[str]) -> int:
+        """
+        Delete entries, and return the total size they actually had
+        """
+        pipe = self.connection.pipeline()  # MULTI / EXEC
+        for key in keys:
+            pipe.get(self._size_key(key))
+        pipe.delete(*(self._size_key(key) for key in keys))
+        pipe.delete(*(self._data_key(key) for key in keys))
+        pipe.zrem(self._key("lru"), *keys)
+        sizes = pipe.execute()[: len(keys)]
+        size = sum(int(size or 0) for size in sizes)
+        self.connection.decrby(self._key("size"), size)
+        return size
+
+    def _evict(self) -> None:
+        while int(self.connection.get(self._key("size")) or 0) > self.max_size:
+            oldest = self.connection.zrange(self._key("lru"), 0, EVICTION_BATCH - 1)
+            if not oldest:
+                self.connection.set(self._key("size"), 0)
+                return
+            self._delete_many([key.decode() for key in oldest])
+            logger.info("Éviction de %d entrées du cache HTTP", len(oldest))
+
+    def stats(self) -> Dict[str, int]:
+        hits, misses, size = self.connection.mget(
+            self._key("hits"), self._key("misses"), self._key("size")
+        )
+        return {
+            "hits": int(hits or 0),
+            "misses": int(misses or 0),
+            "size": int(size or 0),
+        }
+
+
+class SQLiteHTTPCache(BaseCache):
+    """
+    HTTP cache stored in a single SQLite file
+
+    Each thread gets its own connection, as required by the sqlite3 module.
+
+    Reads only write to the file when the access time of the entry is out of date
+    by more than `ACCESS_TIME_RESOLUTION`, and hits and misses are counted in
+    memory then written by batches. The total size is kept up to date in the
+    counters table, so that entries are only scanned when over the limit.
+    """
+
+    def __init__(self, path: str, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.path = path
+        self.max_size = max_size
+        self._local = threading.local()
+        self._counters = {"hits": 0, "misses": 0}
+        self._counters_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_entries__accessed ON entries (accessed)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                " name TEXT PRIMARY KEY, value INTEGER)"
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO counters VALUES (?, 0)", [("hits",), ("misses",)]
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO counters"
+                " SELECT 'size', COALESCE(SUM(size), 0) FROM entries"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local, "connection", None
+        )
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT value, accessed FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count(connection, "misses")
+                return None
+            value, accessed = row
+            now = time.time()
+            if now - accessed > ACCESS_TIME_RESOLUTION:
+                connection.execute(
+                    "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+                )
+            self._count(connection, "hits")
+        return zlib.decompress(value)
+
+    def _count(self, connection: sqlite3.Connection, name: str) -> None:
+        with self._counters_lock:
+            self._counters[name] += 1
+            if sum(self._counters.values()) < COUNTERS_BATCH:
+                return
+        self._write_counters(connection)
+
+    def _write_counters(self, connection: sqlite3.Connection) -> None:
+        with self._counters_lock:
+            counters = list(self._counters.items())
+            self._counters = dict.fromkeys(self._counters, 0)
+        connection.executemany(
+            "UPDATE counters SET value = value + ? WHERE name = ?",
+            [(value, name) for name, value in counters if value],
+        )
+
+    def set(self, key: str, value: bytes) -> None:
+        compressed = zlib.compress(value)
+        with self._connection() as connection:
+            self._resize(connection, key, len(compressed))
+            connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, compressed, len(compressed), time.time()),
+            )
+            self._evict(connection)
+
+    def delete(self, key: str) -> None:
+        with self._connection() as connection:
+            self._resize(connection, key, 0)
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    @staticmethod
+    def _resize(connection: sqlite3.Connection, key: str, size: int) -> None:
+        """
+        Update the total size for the entry at `key` about to get this `size`
+        """
+        connection.execute(
+            "UPDATE counters SET value = value + ?"
+            " - COALESCE((SELECT size FROM entries WHERE key = ?), 0)"
+            " WHERE name = 'size'",
+            (size, key),
+        )
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        while self._size(connection) > self.max_size:
+            evicted = connection.execute(
+                "SELECT key, size FROM entries ORDER BY accessed LIMIT ?",
+                (EVICTION_BATCH,),
+            ).fetchall()
+            if not evicted:
+                return
+            connection.executemany(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted]
+            )
+            connection.execute(
+                "UPDATE counters SET value = value - ? WHERE name = 'size'",
+                (sum(size for _, size in evicted),),
+            )
+            logger.info("Éviction de %d entrées du cache HTTP", len(evicted))
+
+    @staticmethod
+    def _size(connection: sqlite3.Connection) -> int:
+        size: int = connection.execute(
+            "SELECT value FROM counters WHERE name = 'size'"
+        ).fetchone()[0]
+        return size
+
+    def stats(self) -> Dict[str, int]:
+        with self._connection() as connection:
+            self._write_counters(connection)
+            counters = dict(connection.execute("SELECT name, value FROM counters"))
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "size": counters.get("size", 0),
+        }
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
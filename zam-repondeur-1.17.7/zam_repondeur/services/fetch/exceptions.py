@@ -1,3 +1,5 @@
+from typing import Dict
+
 from requests import Response
 
 
@@ -5,6 +7,16 @@ class NotFound(Exception):
     pass
 
 
+class Unchanged(Exception):
+    """
+    The remote content is the same as the last time it was integrated
+    """
+
+    def __init__(self, url: str, fingerprint: Dict[str, str]) -> None:
+        self.url = url
+        self.fingerprint = fingerprint
+
+
 class FetchError(Exception):
     def __init__(self, url: str, response: Response) -> None:
         self.url = url
@@ -1,7 +1,9 @@
-from typing import Any, Optional, Union
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Union
 
+import transaction
 from cachecontrol import CacheControl, CacheController
-from cachecontrol.caches.file_cache import FileCache
 from cachecontrol.heuristics import ExpiresAfter
 from pyramid.config import Configurator
 from pyramid.registry import Registry
@@ -9,6 +11,10 @@ from pyramid.threadlocal import get_current_registry
 from requests import Session
 from zope.interface import Interface
 
+from zam_repondeur.initialize import needs_init
+from zam_repondeur.services import Repository
+from zam_repondeur.services.fetch.cache import make_http_cache
+
 
 class CustomCacheController(CacheController):
     def __init__(
@@ -28,23 +34,69 @@ class IHTTPSession(Interface):
     pass
 
 
+class ThreadLocalSession:
+    """
+    Give each thread its own HTTP session (they share the same cache)
+
+    A `requests.Session` is not meant to be shared between the threads that
+    download concurrently (see `services.fetch.parallel`).
+    """
+
+    def __init__(self, factory: Callable[[], Session]) -> None:
+        self._factory = factory
+        self._local = threading.local()
+
+    @property
+    def session(self) -> Session:
+        session: Optional[Session] = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._factory()
+        return session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.session, name)
+
+
+class IHTTPCache(Interface):
+    pass
+
+
 def includeme(config: Configurator) -> None:
     """
     Called automatically via config.include("zam_repondeur.services.fetch.http")
     """
-    session = Session()
-    http_cache_dir = config.registry.settings["zam.http_cache_dir"]
+    http_cache = make_http_cache(config.registry.settings)
     http_cache_duration = int(config.registry.settings["zam.http_cache_duration"])
-    session.headers["User-Agent"] = config.registry.settings[
-        "zam.http_cache_user_agent"
-    ]
-    cached_session = CacheControl(
-        session,
-        cache=FileCache(http_cache_dir),
-        heuristic=ExpiresAfter(minutes=http_cache_duration),
-        controller_class=CustomCacheController,
+    user_agent = config.registry.settings["zam.http_cache_user_agent"]
+
+    def make_cached_session() -> Session:
+        session = Session()
+        session.headers["User-Agent"] = user_agent
+        cached_session: Session = CacheControl(
+            session,
+            cache=http_cache,
+            heuristic=ExpiresAfter(minutes=http_cache_duration),
+            controller_class=CustomCacheController,
+        )
+        return cached_session
+
+    config.registry.registerUtility(
+        component=ThreadLocalSession(make_cached_session), provided=IHTTPSession
+    )
+    config.registry.registerUtility(component=http_cache, provided=IHTTPCache)
+
+    settings = config.registry.settings
+    fingerprints_repository.initialize(
+        redis_url=settings.get(
+            "zam.http_fingerprints.redis_url", settings["zam.amendements.redis_url"]
+        )
+    )
+    fingerprints_repository.fingerprint_duration = int(
+        settings.get(
+            "zam.http_fingerprints.duration",
+            fingerprints_repository.fingerprint_duration,
+        )
     )
-    config.registry.registerUtility(component=cached_session, provided=IHTTPSession)
 
 
 def get_http_session(
@@ -56,3 +108,69 @@ def get_http_session(
     if cached_session is None:
         return Session()  # fallback if cached session was not initialized
     return cached_session
+
+
+def get_http_cache_stats(
+    registry: Optional[Registry] = None,
+) -> Optional[Dict[str, int]]:
+    """
+    Hit/miss counters and size of the shared HTTP cache, if the backend keeps them
+    """
+    if registry is None:
+        registry = get_current_registry()
+    http_cache = registry.queryUtility(IHTTPCache)
+    if http_cache is None or not hasattr(http_cache, "stats"):
+        return None
+    stats: Dict[str, int] = http_cache.stats()
+    return stats
+
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class FingerprintsRepository(Repository):
+    """
+    Store and access a digest of the last integrated content of each URL
+
+    Conditional requests (ETag / Last-Modified) are handled by the cached session,
+    but an unchanged body would still be parsed and compared to the database.
+    Fetchers record a fingerprint once the content is known to be reflected in the
+    database, so that next time they can skip the whole processing.
+    """
+
+    fingerprint_duration = 24 * 3600
+
+    @staticmethod
+    def _key_for_url(url: str) -> str:
+        return f"fetch.fingerprint.{url}"
+
+    @needs_init
+    def get_fingerprint(self, url: str) -> Optional[Dict[str, str]]:
+        raw = self.connection.hgetall(self._key_for_url(url))
+        if not raw:  # does not exist, or expired in Redis
+            return None
+        return {key.decode(): value.decode() for key, value in raw.items()}
+
+    @needs_init
+    def set_fingerprint(self, url: str, digest: str, **extra: Any) -> None:
+        key = self._key_for_url(url)
+        pipe = self.connection.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={"digest": digest, **extra})
+        pipe.expire(key, self.fingerprint_duration)
+        pipe.execute()
+
+    def set_fingerprint_on_commit(self, url: str, digest: str, **extra: Any) -> None:
+        """
+        Record the fingerprint only if the current transaction succeeds
+        """
+
+        def hook(success: bool) -> None:
+            if success:
+                self.set_fingerprint(url, digest, **extra)
+
+        transaction.get().addAfterCommitHook(hook)
+
+
+fingerprints_repository = FingerprintsRepository()
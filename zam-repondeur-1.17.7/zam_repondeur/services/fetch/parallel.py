@@ -0,0 +1,117 @@
+"""
+Bounded-concurrency downloads of remote resources
+
+Fetching is spread over a small thread pool, and an optional per-host rate limit
+keeps us polite with the AN and Sénat web servers. Results are always yielded in
+the order of the inputs, so that callers can process them exactly as they would
+sequentially (same actions, same ordering, same error reporting).
+
+Only network access and parsing should happen in worker threads: anything that
+touches the database session must stay in the calling thread.
+
+Callers that may stop consuming the results early (e.g. on an exception) should do
+it within `cancel_pending(futures)`, so that queued downloads are not run for
+nothing.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+from urllib.parse import urlparse
+
+from pyramid.registry import Registry
+from pyramid.threadlocal import get_current_registry
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MIN_INTERVAL = 0.0  # seconds between two requests to the same host
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class HostRateLimiter:
+    """
+    Thread-safe limiter spacing out requests to the same host
+    """
+
+    def __init__(self, min_interval: float = DEFAULT_MIN_INTERVAL) -> None:
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def wait(self, url: str) -> None:
+        if self.min_interval <= 0:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_max_workers(registry: Optional[Registry] = None) -> int:
+    if registry is None:
+        registry = get_current_registry()
+    settings = registry.settings or {}
+    return max(1, int(settings.get("zam.fetch.max_workers", DEFAULT_MAX_WORKERS)))
+
+
+def get_rate_limiter(registry: Optional[Registry] = None) -> HostRateLimiter:
+    if registry is None:
+        registry = get_current_registry()
+    settings = registry.settings or {}
+    return HostRateLimiter(
+        float(settings.get("zam.fetch.min_interval", DEFAULT_MIN_INTERVAL))
+    )
+
+
+def map_ordered(
+    func: Callable[[T], R], items: Iterable[T], max_workers: Optional[int] = None
+) -> List["Future[R]"]:
+    """
+    Run `func` on each item in a thread pool, and return futures in input order
+
+    Calling `.result()` on each future in turn re-raises exceptions in the same
+    order as a plain sequential loop would.
+    """
+    items = list(items)
+    if max_workers is None:
+        max_workers = get_max_workers()
+    max_workers = min(max_workers, len(items))
+    futures: List["Future[R]"] = []
+    if max_workers <= 1:
+        for item in items:
+            future: "Future[R]" = Future()
+            try:
+                future.set_result(func(item))
+            except Exception as exc:
+                future.set_exception(exc)
+            futures.append(future)
+        return futures
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(func, item) for item in items]
+    executor.shutdown(wait=False)  # pending items still run, then threads exit
+    return futures
+
+
+@contextmanager
+def cancel_pending(futures: List["Future[R]"]) -> Iterator[List["Future[R]"]]:
+    """
+    Cancel the calls that have not started yet when leaving the block
+
+    Once all results have been consumed, there is nothing left to cancel.
+    """
+    try:
+        yield futures
+    finally:
+        for future in futures:
+            future.cancel()
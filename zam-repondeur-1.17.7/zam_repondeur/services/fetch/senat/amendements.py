@@ -1,27 +1,37 @@
 import csv
+import io
 import logging
 import re
 import sys
+from datetime import date
 from http import HTTPStatus
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from urllib.parse import urlparse
 
 from zam_repondeur.exceptions.alert import AlertOnData
-from zam_repondeur.models import Amendement, Chambre, Lecture
+from zam_repondeur.models import Amendement, Chambre, DBSession, Lecture
+from zam_repondeur.models.division import SubDiv
 from zam_repondeur.models.events.lecture import OrdreDiscussionModified
 from zam_repondeur.services.clean import clean_html
 from zam_repondeur.services.data import repository
 from zam_repondeur.services.fetch.amendements import (
     MAX_404,
+    Action,
     CollectedChanges,
     FetchResult,
     RemoteSource,
+    Source,
+    load_amendements,
+    prepare_actions,
 )
 from zam_repondeur.services.fetch.dates import parse_date
 from zam_repondeur.services.fetch.division import parse_subdiv
-from zam_repondeur.services.fetch.exceptions import NotFound
-from zam_repondeur.services.fetch.http import get_http_session
-from zam_repondeur.utils import Timer
+from zam_repondeur.services.fetch.exceptions import NotFound, Unchanged
+from zam_repondeur.services.fetch.http import (
+    content_digest,
+    fingerprints_repository,
+    get_http_session,
+)
 
 from .derouleur import DiscussionDetails, fetch_and_parse_discussion_details
 
@@ -48,173 +58,278 @@ except OverflowError:
     csv.field_size_limit(4096 * 1024)
 
 
-class Senat(RemoteSource):
-    position_initial: Dict[int, Any] = {}
+class SenatRow(NamedTuple):
+    """
+    Les colonnes utiles d'une ligne du fichier TSV
+    (dans l'ordre de `AMDT_CSV_REQUIRED_HEADERS`)
+    """
 
-    def prepare(self, lecture: Lecture) -> None:
-        if self.prefetching_enabled:
-            logger.info("Préchargement des amendements de %r", lecture)
-            with Timer() as timer:
-                self._fetch(lecture, dry_run=True)
-            logger.info("Temps de préchargement : %.1fs", timer.elapsed())
+    subdivision: str
+    numero: str
+    dispositif: str
+    objet: str
+    sort: str
+    alinea: str
+    auteur: str
+    fiche_senateur: str
+    date_depot: str
 
-    def collect_changes(
-        self, lecture: Lecture, max_404: int = MAX_404
-    ) -> CollectedChanges:
-        # TODO: split into separate collect_changes/apply_changes like AN
-        return CollectedChanges.create()
-
-    def apply_changes(self, lecture: Lecture, changes: CollectedChanges) -> FetchResult:
-        # TODO: split into separate collect_changes/apply_changes like AN
-        return self._fetch(lecture)
 
-    def _fetch(self, lecture: Lecture, dry_run: bool = False) -> FetchResult:
-        created = 0
-        amendements: List[Amendement] = []
+class SenatAmendementData(NamedTuple):
+    """
+    Les données d'un amendement extraites du fichier TSV
+    """
 
-        # Remember previous positions and reset them
-        old_positions = {}
-        for amendement in lecture.amendements:
-            old_positions[amendement.num] = amendement.position
-            amendement.position = None
+    num: int
+    rectif: int
+    subdiv: SubDiv
+    corps: str
+    expose: str
+    sort: str
+    alinea: str
+    auteur: str
+    matricule: Optional[str]
+    date_depot: Optional[date]
 
-        if dry_run:
-            self.position_initial = old_positions
 
-        try:
-            amendements_created = self._fetch_and_parse_all(
-                lecture=lecture, dry_run=dry_run
-            )
-        except NotFound:
-            return FetchResult(amendements, created, [])
+class CreateOrUpdateSenatAmendement(Action):
+    """
+    Met à jour un amendement (ou le crée) à partir du TSV et du dérouleur
 
-        for amendement, created_ in amendements_created:
-            created += int(created_)
-            amendements.append(amendement)
+    Sans données TSV (fichier inchangé), seules les informations du dérouleur
+    et le groupe parlementaire sont mis à jour.
+    """
 
-        processed_amendements = list(
-            self._process_amendements(amendements=amendements, lecture=lecture)
+    def __init__(
+        self,
+        num: int,
+        data: Optional[SenatAmendementData],
+        discussion_details: Optional[DiscussionDetails],
+        groupe: str,
+    ):
+        self.num = num
+        self.data = data
+        self.discussion_details = discussion_details
+        self.groupe = groupe
+
+    def __repr__(self) -> str:
+        return f"<CreateOrUpdateSenatAmendement(num={self.num})>"
+
+    @property
+    def article_subdiv(self) -> Optional[SubDiv]:
+        return self.data.subdiv if self.data is not None else None
+
+    @property
+    def parent_num(self) -> Optional[int]:
+        if self.discussion_details is None:
+            return None
+        return self.discussion_details.parent_num
+
+    def apply(self, lecture: Lecture) -> FetchResult:
+        created = False
+        if self.data is None:
+            amendement = lecture.find_amendement(self.num)
+            if amendement is None:
+                return FetchResult.create()
+        else:
+            amendement, created = self._update_from_data(lecture, self.data)
+        self._update_discussion_details(lecture, amendement)
+        Source.update_attributes(amendement, groupe=self.groupe)
+        return FetchResult.create(amendements=[amendement], created=int(created))
+
+    @staticmethod
+    def _update_from_data(
+        lecture: Lecture, data: SenatAmendementData
+    ) -> Tuple[Amendement, bool]:
+        article, _ = lecture.find_or_create_article(data.subdiv)
+        amendement, created = lecture.find_or_create_amendement(data.num, article)
+
+        Source.update_rectif(amendement, data.rectif)
+        Source.update_corps(amendement, data.corps)
+        Source.update_expose(amendement, data.expose)
+        Source.update_sort(amendement, data.sort)
+        Source.update_attributes(
+            amendement,
+            article=article,
+            alinea=data.alinea,
+            auteur=data.auteur,
+            matricule=data.matricule,
+            date_depot=data.date_depot,
         )
-        lecture.reset_fetch_progress()
+        return amendement, created
 
-        # Log amendements no longer discussed
-        position_changed: int = 0
-        for amdt in lecture.amendements:
-            if amdt.position is None and old_positions.get(amdt.num) is not None:
-                logger.info("Amendement %s retiré de la discussion", amdt.num)
-            amdt_initial = self.position_initial.get(amdt.num)
-            if amdt_initial is not None and amdt.position != amdt_initial:
-                position_changed += 1
+    def _update_discussion_details(
+        self, lecture: Lecture, amendement: Amendement
+    ) -> None:
+        details = self.discussion_details
+        if details is None:
+            return
+        parent: Optional[Amendement]
+        if details.parent_num is not None:
+            parent = lecture.find_amendement(details.parent_num) or Amendement.get(
+                lecture=lecture, num=details.parent_num
+            )
+        else:
+            parent = None
 
-        if not dry_run and position_changed:
-            OrdreDiscussionModified.create(lecture=lecture)
+        mission_ref = details.mission_ref
+        Source.update_attributes(
+            amendement,
+            position=details.position,
+            id_discussion_commune=details.id_discussion_commune,
+            id_identique=details.id_identique,
+            parent=parent,
+            mission_titre=mission_ref.titre if mission_ref else None,
+            mission_titre_court=mission_ref.titre_court if mission_ref else None,
+        )
 
-        return FetchResult(processed_amendements, created, [])
-
-    def _fetch_and_parse_all(
-        self, lecture: Lecture, dry_run: bool = False
-    ) -> List[Tuple[Amendement, bool]]:
-        amendements = []
-        for row in _fetch_all(lecture, dry_run):
-            if lecture.partie == parse_partie(row["Numéro"]):
-                try:
-                    amendements.append(self.parse_from_csv(row, lecture))
-                except ValueError as error:
-                    logger.exception(error)
-                    continue
-        return amendements
 
-    def parse_from_csv(self, row: dict, lecture: Lecture) -> Tuple[Amendement, bool]:
-        subdiv = parse_subdiv(row["Subdivision"], texte=lecture.texte)
-        article, _ = lecture.find_or_create_article(subdiv)
+class RecordFingerprint(Action):
+    """
+    Mémorise l'empreinte du fichier TSV, une fois les changements intégrés
+    """
+
+    def __init__(self, url: str, digest: str, nums: List[int]):
+        self.url = url
+        self.digest = digest
+        self.nums = nums
 
-        num, rectif = Amendement.parse_num(row["Numéro"])
-        amendement, created = lecture.find_or_create_amendement(num, article)
+    def __repr__(self) -> str:
+        return f"<RecordFingerprint(url={self.url!r})>"
 
-        self.update_rectif(amendement, rectif)
-        self.update_corps(amendement, clean_html(row["Dispositif"]))
-        self.update_expose(amendement, clean_html(row["Objet"]))
-        self.update_sort(amendement, row["Sort"])
-        self.update_attributes(
-            amendement,
-            article=article,
-            alinea=row["Alinéa"].strip(),
-            auteur=row["Auteur"],
-            matricule=extract_matricule(row["Fiche Sénateur"]),
-            date_depot=parse_date(row["Date de dépôt"]),
+    def apply(self, lecture: Lecture) -> FetchResult:
+        fingerprints_repository.set_fingerprint_on_commit(
+            _fingerprint_key(self.url, lecture),
+            self.digest,
+            nums=",".join(str(num) for num in self.nums),
         )
+        return FetchResult.create()
 
-        return amendement, created
 
-    def _process_amendements(
-        self, amendements: Iterable[Amendement], lecture: Lecture
-    ) -> Iterable[Amendement]:
+class Senat(RemoteSource):
+    def collect_changes(
+        self, lecture: Lecture, max_404: int = MAX_404
+    ) -> CollectedChanges:
+        load_amendements(lecture)
+
+        actions: List[Action] = []
+        items: List[Tuple[int, Optional[str], Optional[SenatAmendementData]]]
+        try:
+            url, digest, rows = _fetch_all(lecture)
+        except NotFound:
+            return CollectedChanges.create(derouleur_fetch_success=False)
+        except Unchanged as unchanged:
+            logger.info("Amendements inchangés depuis la dernière récupération")
+            nums = {int(num) for num in unchanged.fingerprint["nums"].split(",") if num}
+            items = [
+                (amdt.num, amdt.matricule, None)
+                for amdt in lecture.amendements
+                if amdt.num in nums
+            ]
+        else:
+            parsed = self._parse_rows(rows, lecture)
+            items = [(data.num, data.matricule, data) for data in parsed]
+            if digest:
+                actions.append(
+                    RecordFingerprint(url, digest, [data.num for data in parsed])
+                )
 
         # Les amendements discutés en séance, par ordre de passage
         logger.info(
             "Récupération des amendements soumis à la discussion sur %r", lecture
         )
-
         discussion_details = fetch_and_parse_discussion_details(lecture=lecture)
         if len(discussion_details) == 0:
             logger.info("Aucun amendement soumis à la discussion pour l'instant!")
-        self._enrich_discussion_details(amendements, discussion_details, lecture)
-        self._enrich_groupe_parlementaire(amendements)
-
-        return _sort(amendements)
-
-    def _enrich_discussion_details(
-        self,
-        amendements: Iterable[Amendement],
-        discussion_details: Iterable[DiscussionDetails],
-        lecture: Lecture,
-    ) -> None:
-        """
-        Enrichir les amendements avec les informations du dérouleur
-
-        - discussion commune ?
-        - amendement identique ?
-        """
         discussion_details_by_num = {
             details.num: details for details in discussion_details
         }
-        for amendement in amendements:
-            self._enrich_one(amendement, discussion_details_by_num.get(amendement.num))
 
-    def _enrich_one(
-        self, amendement: Amendement, discussion_details: Optional[DiscussionDetails]
-    ) -> None:
-        if discussion_details is None:
-            return
-        parent: Optional[Amendement]
-        if discussion_details.parent_num is not None:
-            parent = Amendement.get(
-                lecture=amendement.lecture, num=discussion_details.parent_num
+        groupes = self._get_groupes(matricule for _, matricule, _ in items)
+        amendements_actions = [
+            CreateOrUpdateSenatAmendement(
+                num=num,
+                data=data,
+                discussion_details=discussion_details_by_num.get(num),
+                groupe=groupes.get(matricule or "", ""),
             )
-        else:
-            parent = None
+            for num, matricule, data in items
+        ]
+        # Sous-amendements en dernier, pour que leur parent existe déjà
+        amendements_actions.sort(key=lambda action: action.parent_num is not None)
 
-        mission_ref = discussion_details.mission_ref
-        self.update_attributes(
-            amendement,
-            position=discussion_details.position,
-            id_discussion_commune=discussion_details.id_discussion_commune,
-            id_identique=discussion_details.id_identique,
-            parent=parent,
-            mission_titre=mission_ref.titre if mission_ref else None,
-            mission_titre_court=mission_ref.titre_court if mission_ref else None,
+        return CollectedChanges.create(actions=[*amendements_actions, *actions])
+
+    def apply_changes(self, lecture: Lecture, changes: CollectedChanges) -> FetchResult:
+        if not changes.derouleur_fetch_success:
+            return FetchResult.create()
+
+        prepare_actions(lecture, changes.actions)
+
+        # Remember previous positions and reset them first, so that we never have
+        # two with the same position (unique constraint)
+        old_positions = {}
+        for amendement in lecture.amendements:
+            old_positions[amendement.num] = amendement.position
+            amendement.position = None
+        DBSession.flush()
+
+        result = FetchResult.create()
+        for action in changes.actions:
+            result += action.apply(lecture)
+
+        lecture.reset_fetch_progress()
+
+        # Log amendements no longer discussed
+        position_changed: int = 0
+        for amdt in lecture.amendements:
+            old_position = old_positions.get(amdt.num)
+            if amdt.position is None and old_position is not None:
+                logger.info("Amendement %s retiré de la discussion", amdt.num)
+            if old_position is not None and amdt.position != old_position:
+                position_changed += 1
+
+        if position_changed:
+            OrdreDiscussionModified.create(lecture=lecture)
+
+        return result._replace(amendements=_sort(result.amendements))
+
+    def _parse_rows(
+        self, rows: Iterable[SenatRow], lecture: Lecture
+    ) -> List[SenatAmendementData]:
+        parsed = []
+        for row in rows:
+            try:
+                parsed.append(self.parse_from_csv(row, lecture))
+            except ValueError as error:
+                logger.exception(error)
+                continue
+        return parsed
+
+    def parse_from_csv(self, row: SenatRow, lecture: Lecture) -> SenatAmendementData:
+        num, rectif = Amendement.parse_num(row.numero)
+        return SenatAmendementData(
+            num=num,
+            rectif=rectif,
+            subdiv=parse_subdiv(row.subdivision, texte=lecture.texte),
+            corps=clean_html(row.dispositif),
+            expose=clean_html(row.objet),
+            sort=row.sort,
+            alinea=row.alinea.strip(),
+            auteur=row.auteur,
+            matricule=extract_matricule(row.fiche_senateur),
+            date_depot=parse_date(row.date_depot),
         )
 
-    def _enrich_groupe_parlementaire(self, amendements: Iterable[Amendement]) -> None:
+    @staticmethod
+    def _get_groupes(matricules: Iterable[Optional[str]]) -> Dict[str, str]:
         """
-        Enrichir les amendements avec le groupe parlementaire de l'auteur
+        Les groupes parlementaires des auteurs, par matricule
         """
-        for amendement in amendements:
-            amendement.groupe = ""
-            if amendement.matricule is not None:
-                senateur = repository.get_senateur(amendement.matricule)
-                if senateur:
-                    amendement.groupe = senateur.groupe
+        senateurs = repository.get_senateurs(
+            {matricule for matricule in matricules if matricule is not None}
+        )
+        return {matricule: senateur.groupe for matricule, senateur in senateurs.items()}
 
 
 def parse_partie(numero: str) -> Optional[int]:
@@ -225,9 +340,15 @@ def parse_partie(numero: str) -> Optional[int]:
     return None
 
 
-def _fetch_all(lecture: Lecture, dry_run: bool = False) -> List[Dict[str, str]]:
+def _fetch_all(lecture: Lecture) -> Tuple[str, str, Iterator[SenatRow]]:
     """
-    Récupère tous les amendements, dans l'ordre de dépôt
+    Récupère les amendements de la lecture, dans l'ordre de dépôt
+
+    Renvoie aussi l'URL et l'empreinte du fichier, et lève `Unchanged` s'il est
+    identique à la dernière version intégrée.
+
+    Le fichier est lu ligne à ligne, et seules les lignes de la partie concernée
+    (pour un PLF) sont découpées en colonnes.
     """
 
     http_session = get_http_session()
@@ -238,23 +359,21 @@ def _fetch_all(lecture: Lecture, dry_run: bool = False) -> List[Dict[str, str]]:
             f"Impossible de récupérer les amendements de la lecture \
 {lecture} à l'url {url}"
         )
-        dry_run = True
+        return url, "", iter([])
 
-    if dry_run:
-        return []
+    digest = content_digest(resp.content)
+    fingerprint = fingerprints_repository.get_fingerprint(
+        _fingerprint_key(url, lecture)
+    )
+    if fingerprint is not None and fingerprint["digest"] == digest:
+        raise Unchanged(url, fingerprint)
 
+    lines = io.TextIOWrapper(io.BytesIO(resp.content), encoding="cp1252")
     try:
-        text = resp.content.decode("cp1252")
-    except Exception:
-        raise AlertOnData(
-            f"Impossible de récupérer le contenu du fichier {url} pour la \
-lecture {lecture}",
-            "data",
-            1,
-            url=url,
-        )
-    lines = text.splitlines()
-    headers = [header.strip() for header in lines[1].split("\t")]
+        next(lines, "")
+        headers = [header.strip() for header in next(lines, "").split("\t")]
+    except UnicodeDecodeError:
+        raise _unreadable_content(lecture, url)
     missing_headers = [
         required_header
         for required_header in AMDT_CSV_REQUIRED_HEADERS
@@ -273,21 +392,57 @@ lecture {lecture}",
             2,
             url=url,
         )
-    try:
-        # On remplace la ligne des headers par une ligne `propre`
-        lines[1] = "\t".join(headers)
-        filtered_lines = [_filter_line(line, len(headers)) for line in lines[1:]]
-    except Exception:
-        logger.error(f"Lecture du TSV pour {lecture}, {url} : Fichier mal formé")
-        raise AlertOnData(
-            f"Lecture du TSV pour {lecture}, {url} : Fichier mal formé",
-            "data",
-            2,
-            url=url,
-        )
-    reader = csv.DictReader(filtered_lines, delimiter="\t")
-    items = list(reader)
-    return items
+
+    return url, digest, _iter_rows(lines, headers, lecture, url)
+
+
+def _fingerprint_key(url: str, lecture: Lecture) -> str:
+    """
+    Les lectures des deux parties d'un PLF partagent le même fichier, mais pas les
+    mêmes amendements : on garde donc une empreinte par lecture
+    """
+    return f"{url}#lecture-{lecture.pk}"
+
+
+def _iter_rows(
+    lines: Iterable[str], headers: List[str], lecture: Lecture, url: str
+) -> Iterator[SenatRow]:
+    partie = lecture.partie
+    numero_index = headers.index("Numéro")
+    indices = [headers.index(header) for header in AMDT_CSV_REQUIRED_HEADERS]
+
+    def repaired_lines() -> Iterator[str]:
+        try:
+            for line in lines:
+                line = line.rstrip("\r\n")
+                if not line:
+                    continue
+                chunks = _split_line(line, len(headers))
+                if parse_partie(chunks[numero_index].lstrip('"')) == partie:
+                    yield "\t".join(chunks)
+        except UnicodeDecodeError:
+            raise _unreadable_content(lecture, url)
+        except ValueError:
+            logger.error(f"Lecture du TSV pour {lecture}, {url} : Fichier mal formé")
+            raise AlertOnData(
+                f"Lecture du TSV pour {lecture}, {url} : Fichier mal formé",
+                "data",
+                2,
+                url=url,
+            )
+
+    for fields in csv.reader(repaired_lines(), delimiter="\t"):
+        yield SenatRow(*(fields[index] for index in indices))
+
+
+def _unreadable_content(lecture: Lecture, url: str) -> AlertOnData:
+    return AlertOnData(
+        f"Impossible de récupérer le contenu du fichier {url} pour la \
+lecture {lecture}",
+        "data",
+        1,
+        url=url,
+    )
 
 
 def _build_amendements_url(lecture: Lecture) -> str:
@@ -303,26 +458,26 @@ def _build_amendements_url(lecture: Lecture) -> str:
     return BASE_URL + path + filename
 
 
-def _filter_line(line: str, header_size: int) -> str:
+def _split_line(line: str, header_size: int) -> List[str]:
     """
     Fix buggy TSVs with unescaped tabs inside the HTML
     """
-    chunks = line.split("\t")
-    merged_chunks = list(_merge_badly_split_chunks(chunks))
-    if len(merged_chunks) != header_size:
+    chunks = list(_merge_badly_split_chunks(line.split("\t")))
+    if len(chunks) != header_size:
         raise ValueError(f"Could not parse malformed TSV line: {line!r}")
-    filtered_line = "\t".join(merged_chunks)
-    return filtered_line
+    return chunks
 
 
 def _merge_badly_split_chunks(chunks: Iterable[str]) -> Iterable[str]:
     chunks = iter(chunks)
     for chunk in chunks:
-        while chunk.startswith("<body>") and not chunk.rstrip().endswith("</body>"):
-            try:
-                chunk += " " + next(chunks)
-            except StopIteration:
-                break
+        if chunk.startswith("<body>") and not chunk.rstrip().endswith("</body>"):
+            parts = [chunk]
+            for next_chunk in chunks:
+                parts.append(next_chunk)
+                if next_chunk.rstrip().endswith("</body>"):
+                    break
+            chunk = " ".join(parts)
         yield chunk
 
 
@@ -1,10 +1,30 @@
 import logging
 from http import HTTPStatus
-from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from cachecontrol import CacheControl
+from pyramid.threadlocal import get_current_registry
+from requests import Session
 
 from zam_repondeur.exceptions.alert import AlertOnData
 from zam_repondeur.models import Amendement, Lecture
 from zam_repondeur.services.fetch.http import get_http_session
+from zam_repondeur.services.fetch.parallel import (
+    cancel_pending,
+    get_max_workers,
+    get_rate_limiter,
+    map_ordered,
+)
 
 from ..missions import MissionRef
 
@@ -33,42 +53,63 @@ def _fetch_discussion_details(lecture: Lecture) -> Iterator[Tuple[Any, MissionRe
     Récupère les amendements à discuter, dans l'ordre de passage
 
     NB : les amendements jugés irrecevables ne sont pas inclus.
+
+    Les URLs (une par mission pour un PLF) sont récupérées en parallèle, mais
+    traitées dans l'ordre, afin de conserver les positions.
     """
-    http_session = get_http_session()
-    for url, mission_ref in derouleur_urls_and_mission_refs(lecture):
-        resp = http_session.get(url)
-        if resp.status_code in (
-            HTTPStatus.NOT_FOUND,
-            HTTPStatus.GATEWAY_TIMEOUT,
-        ):  # 404, 504
-            logger.warning(f"Could not fetch {url}")
-            continue
-        if resp.text == "":
-            logger.warning(f"Empty response for {url}")
-            continue
-        if resp.status_code != HTTPStatus.OK:
-            logger.warning(
-                f"Impossible de récuprérer les données de l'url \
+    registry = get_current_registry()
+    http_session = get_http_session(registry)
+    rate_limiter = get_rate_limiter(registry)
+    urls_and_mission_refs = list(derouleur_urls_and_mission_refs(lecture))
+
+    def fetch(url_and_mission_ref: Tuple[str, MissionRef]) -> Optional[Any]:
+        url, _ = url_and_mission_ref
+        rate_limiter.wait(url)
+        return _fetch_derouleur_data(url, http_session)
+
+    futures = map_ordered(
+        fetch, urls_and_mission_refs, max_workers=get_max_workers(registry)
+    )
+    with cancel_pending(futures):
+        for (_, mission_ref), future in zip(urls_and_mission_refs, futures):
+            json_data = future.result()
+            if json_data is None:
+                continue
+            yield json_data, mission_ref
+
+
+def _fetch_derouleur_data(
+    url: str, http_session: Union[Session, CacheControl]
+) -> Optional[Any]:
+    resp = http_session.get(url)
+    if resp.status_code in (
+        HTTPStatus.NOT_FOUND,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    ):  # 404, 504
+        logger.warning(f"Could not fetch {url}")
+        return None
+    if resp.text == "":
+        logger.warning(f"Empty response for {url}")
+        return None
+    if resp.status_code != HTTPStatus.OK:
+        logger.warning(
+            f"Impossible de récuprérer les données de l'url \
 {url} du SENAT"
-            )
-            raise AlertOnData(
-                f"Impossible de récupérer les données de l'url \
+        )
+        raise AlertOnData(
+            f"Impossible de récupérer les données de l'url \
 {url} du SENAT code http:{resp.status_code}",
-                "http",
-                resp.status_code,
-                url=url,
-            )
-        if resp.text == "":
-            logger.warning(f"Empty response for {url}")
-            continue
-        try:
-            json_data = resp.json()
-        except Exception as exception:
-            logger.error(f"Impossible de récupérer les données de {url}, {exception}")
-            raise AlertOnData(
-                f"Erreur lors de la lecture du json SENAT: {url}", "data", 1, url=url,
-            ) from exception
-        yield json_data, mission_ref
+            "http",
+            resp.status_code,
+            url=url,
+        )
+    try:
+        return resp.json()
+    except Exception as exception:
+        logger.error(f"Impossible de récupérer les données de {url}, {exception}")
+        raise AlertOnData(
+            f"Erreur lors de la lecture du json SENAT: {url}", "data", 1, url=url,
+        ) from exception
 
 
 def _parse_derouleur_data(
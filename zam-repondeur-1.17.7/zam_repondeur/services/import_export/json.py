@@ -6,6 +6,7 @@ import ujson as json
 
 from zam_repondeur.models import Amendement, Article, DBSession, Lecture, Team, User
 from zam_repondeur.models.amendement import DOSSIER_DE_BANC
+from zam_repondeur.models.events.base import bulk_events
 from zam_repondeur.models.events.import_export import (
     ImportDossierZipEnd,
     ResultatsImportJSON,
@@ -57,24 +58,34 @@ def import_json_async(
     backup = json.loads(json_content)
     batch_to_create: Set[Tuple[int, ...]] = set()
 
-    for item in backup.get("amendements", []):
-        import_amendement(
-            None, lecture, amendements, item, counter, previous_reponse, team, user=user
-        )
-        if item.get("computed_batch", []):
-            try:
-                batch_to_create.add(tuple(int(num) for num in item["computed_batch"]))
-            except ValueError:
-                continue
-
-    for batch in batch_to_create:
-        amdts_batch: List[Amendement] = []
-        for num in batch:
-            amdt = lecture.find_amendement(num)
-            if amdt is not None:
-                amdts_batch.append(amdt)
-        unbatch_amendements(None, amdts_batch, user=user)
-        create_batches(None, amdts_batch, user=user)
+    with bulk_events():
+        for item in backup.get("amendements", []):
+            import_amendement(
+                None,
+                lecture,
+                amendements,
+                item,
+                counter,
+                previous_reponse,
+                team,
+                user=user,
+            )
+            if item.get("computed_batch", []):
+                try:
+                    batch_to_create.add(
+                        tuple(int(num) for num in item["computed_batch"])
+                    )
+                except ValueError:
+                    continue
+
+        for batch in batch_to_create:
+            amdts_batch: List[Amendement] = []
+            for num in batch:
+                amdt = lecture.find_amendement(num)
+                if amdt is not None:
+                    amdts_batch.append(amdt)
+            unbatch_amendements(None, amdts_batch, user=user)
+            create_batches(None, amdts_batch, user=user)
 
     for item in backup.get("articles", []):
         try:
@@ -2,26 +2,16 @@ import logging
 import re
 from datetime import date
 from functools import partial
-from typing import IO, Dict, List, Optional, Tuple, cast
+from typing import IO, Dict, List, Optional, Tuple
 
 from defusedxml.ElementTree import parse
 from defusedxml.lxml import RestrictedElement
 from lxml.etree import XMLSyntaxError  # nosec
 
-from zam_repondeur.models import (
-    Amendement,
-    Article,
-    Chambre,
-    DBSession,
-    Lecture,
-    get_one_or_create,
-)
+from zam_repondeur.models import Amendement, Chambre, Lecture
 from zam_repondeur.models.division import SubDiv
 from zam_repondeur.services.clean import clean_html
 from zam_repondeur.services.data import repository
-from zam_repondeur.services.dossiers import (
-    get_dossiers_legislatifs_open_data_from_cache,
-)
 from zam_repondeur.services.fetch.an.division import parse_avant_apres
 from zam_repondeur.services.fetch.an.dossiers.models import (
     DossierRef,
@@ -133,25 +123,16 @@ def _make_amendement(
         organe=extract("identifiant", "saisine", "organeExamen"),
     )
 
-    article, created = get_one_or_create(
-        Article,
-        lecture=lecture,
-        type=subdiv.type_,
-        num=subdiv.num,
-        mult=subdiv.mult,
-        pos=subdiv.pos,
-    )
+    article, created = lecture.find_or_create_article(subdiv)
     parent = get_parent(extract("amendementParent"), uid_map, lecture)
-    amendement, created = get_one_or_create(
-        Amendement,
-        create_kwargs={"article": article, "parent": parent},
-        lecture=lecture,
-        num=to_int(extract("identifiant", "numero")),
-    )
-    if not created:
-        amendement.article = article
-        amendement.parent = parent
-    amendement.alinea = to_int(extract("pointeurFragmentTexte", "alinea", "numero"))
+    num = to_int(extract("identifiant", "numero"))
+    if num is None:
+        raise ValueError("Missing numero")
+    amendement, created = lecture.find_or_create_amendement(num=num, article=article)
+    amendement.article = article
+    amendement.parent = parent
+    alinea = to_int(extract("pointeurFragmentTexte", "alinea", "numero"))
+    amendement.alinea = str(alinea) if alinea is not None else None
     amendement.auteur = auteur_name
     amendement.matricule = matricule
     amendement.groupe = groupe_name
@@ -161,7 +142,7 @@ def _make_amendement(
     )
     amendement.corps = clean_html(extract("corps", "dispositif") or "")
     amendement.expose = clean_html(extract("corps", "exposeSommaire") or "")
-    return cast(Amendement, amendement)
+    return amendement
 
 
 def check_same_lecture(
@@ -237,12 +218,10 @@ def to_date(text: Optional[str]) -> Optional[date]:
 
 
 def _find_dossier_lecture(texte_ref: TexteRef) -> Tuple[DossierRef, LectureRef]:
-    # FIXME: this is not efficient
-    for dossier_ref in get_dossiers_legislatifs_open_data_from_cache().values():
-        for lecture_ref in dossier_ref.lectures:
-            if lecture_ref.texte == texte_ref:
-                return dossier_ref, lecture_ref
-    raise ValueError(f"Unknown texte {texte_ref}")
+    found = repository.get_opendata_lecture_by_texte(texte_ref.uid)
+    if found is None:
+        raise ValueError(f"Unknown texte {texte_ref}")
+    return found
 
 
 def extract_partie(node: RestrictedElement) -> Optional[int]:
@@ -285,11 +264,7 @@ def get_parent(
         return uid_map[uid]
     except KeyError:
         num = get_number_from_uid(uid)
-        parent: Optional[Amendement] = (
-            DBSession.query(Amendement)
-            .filter(Amendement.lecture == lecture, Amendement.num == num)
-            .first()
-        )
+        parent = lecture.find_amendement(num)
         if parent is None:
             raise ValueError(f"Unknown parent amendement {num}") from None
         return parent
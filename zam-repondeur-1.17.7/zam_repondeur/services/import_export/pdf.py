@@ -1,4 +1,5 @@
 import multiprocessing
+import os
 import subprocess
 import sys
 from contextlib import contextmanager
@@ -14,6 +15,7 @@ from weasyprint import CSS, HTML
 from weasyprint.fonts import FontConfiguration
 
 from zam_repondeur.models import Amendement
+from zam_repondeur.services.import_export.pdf_cache import get_pdf_fragment_cache
 from zam_repondeur.templating import render_template
 
 STATIC_PATH = Path(__file__).parent.parent.parent / "static"
@@ -23,6 +25,9 @@ GENERATION_MODE_INLINE = "inline"  # inline, no fork
 GENERATION_MODE_MP = "MP"  # fork and use multiprocess
 GENERATION_MODE_CMDLINE = "CMDLINE"  # fork a command line
 
+# Parts rendered by a pool worker before it is replaced, to contain memory growth
+DEFAULT_PARTS_PER_WORKER = 50
+
 
 class WritePdfSplitMode(IntEnum):
     """
@@ -54,11 +59,14 @@ class WritePdfGEnerationMode(IntEnum):
             span by multiprocess.Process
         - WritePdfGEnerationMode.CMDLINE: generate the PDF(s) in a different process
             running a different script
+        - WritePdfGEnerationMode.POOL: generate the PDF parts in parallel in a pool
+            of processes, each one replaced after a number of parts
     """
 
     INLINE = 1  # inline, no fork
     MP = 2  # fork and use multiprocess
     CMDLINE = 3  # fork a command line
+    POOL = 4  # fork a pool of processes
 
 
 @contextmanager
@@ -116,7 +124,7 @@ def write_pdf_part(
     content = generate_html_for_pdf(registry, template_name, context)
     if generation_mode == WritePdfGEnerationMode.INLINE:
         generate_pdf(content, filename)
-    elif generation_mode == WritePdfGEnerationMode.MP:
+    elif generation_mode in (WritePdfGEnerationMode.MP, WritePdfGEnerationMode.POOL):
         generate_pdf_mp(content, filename)
     elif generation_mode == WritePdfGEnerationMode.CMDLINE:
         generate_pdf_cmdline(content, filename)
@@ -161,7 +169,11 @@ def write_pdf_multiple_pdf_at_once(
         then concat all of them ensuring that each part start on an odd page.
 
     Generate all template HTML file in this process and may generate the PDF all at once
-        in the current process or in another (spawn at most one child process)
+        in the current process or in another (spawn at most one child process),
+        or in parallel in a pool of processes
+
+    If the fragment cache is enabled, responses that were already rendered with the
+        same HTML and CSS are reused instead of being rendered again
     :param context: a dict containing the value usable by the templates,
         must contains at least a *lecture* keys with a ``Lecture``object and
         a *articles* keys with a list of *Article* objects
@@ -171,6 +183,7 @@ def write_pdf_multiple_pdf_at_once(
         see ``WritePdfGEnerationMode``
     """
     html_files: list[Union[str, Path]] = []
+    response_files: set[Union[str, Path]] = set()
 
     # generate the pdf in parts
     def get_filename() -> str:
@@ -213,24 +226,42 @@ def write_pdf_multiple_pdf_at_once(
         ) in article.grouped_displayable_top_level_amendements():
             response_context = context.copy()
             response_context.update({"reponse": response, "amendements": amendements})
-            html_files.append(
-                generate_html_for_pdf(
-                    registry,
-                    "print/all_response.html",
-                    response_context,
-                    get_filename(),
-                    do_minify,
-                )
+            response_file = generate_html_for_pdf(
+                registry,
+                "print/all_response.html",
+                response_context,
+                get_filename(),
+                do_minify,
             )
+            html_files.append(response_file)
+            response_files.add(response_file)
     pdf_files = []
     for html_file in html_files:
         pdf_files.append(Path(html_file).with_suffix(".pdf"))
-    if generation_mode == WritePdfGEnerationMode.INLINE:
-        generate_pdfs(zip(html_files, pdf_files), filename)
-    elif generation_mode == WritePdfGEnerationMode.MP:
-        generate_pdfs_mp(zip(html_files, pdf_files), filename)
-    elif generation_mode == WritePdfGEnerationMode.CMDLINE:
-        generate_pdfs_cmdline(zip(html_files, pdf_files), filename)
+
+    to_render = list(zip(html_files, pdf_files))
+    merge_filename = filename
+    fragment_cache = get_pdf_fragment_cache(registry, PDF_CSS)
+    cache_keys: dict[Path, str] = {}
+    if fragment_cache is not None:
+        to_render = []
+        for html_file, pdf_file in zip(html_files, pdf_files):
+            if html_file in response_files:
+                key = fragment_cache.key(Path(html_file).read_text("utf-8"))
+                if fragment_cache.get(key, pdf_file):
+                    continue
+                cache_keys[pdf_file] = key
+            to_render.append((html_file, pdf_file))
+        merge_filename = ""  # merged below along with cached fragments
+
+    if to_render:
+        _generate_pdfs(to_render, merge_filename, registry, generation_mode)
+
+    if fragment_cache is not None:
+        for pdf_file, key in cache_keys.items():
+            fragment_cache.set(key, pdf_file)
+        fragment_cache.evict()
+        merge_pdfs(filename, pdf_files)
 
     for html_file in html_files:
         Path(html_file).unlink(missing_ok=True)
@@ -238,6 +269,30 @@ def write_pdf_multiple_pdf_at_once(
         Path(pdf_file).unlink(missing_ok=True)
 
 
+def _generate_pdfs(
+    input_outputs: Sequence[tuple[Union[str, Path], Union[str, Path]]],
+    filename: str,
+    registry: Registry,
+    generation_mode: int,
+) -> None:
+    if generation_mode == WritePdfGEnerationMode.INLINE:
+        generate_pdfs(input_outputs, filename)
+    elif generation_mode == WritePdfGEnerationMode.MP:
+        generate_pdfs_mp(input_outputs, filename)
+    elif generation_mode == WritePdfGEnerationMode.CMDLINE:
+        generate_pdfs_cmdline(input_outputs, filename)
+    elif generation_mode == WritePdfGEnerationMode.POOL:
+        settings = registry.settings or {}
+        generate_pdfs_pool(
+            input_outputs,
+            filename,
+            processes=int(settings.get("zam.write_pdf.pool_size", 0)) or None,
+            parts_per_worker=int(
+                settings.get("zam.write_pdf.parts_per_worker", DEFAULT_PARTS_PER_WORKER)
+            ),
+        )
+
+
 def merge_pdfs(
     filename: Union[str, Path], pdf_files: Sequence[Union[str, Path]]
 ) -> None:
@@ -389,6 +444,59 @@ def generate_pdfs_mp(
     p.join()
 
 
+def generate_pdfs_pool(
+    input_outputs: Iterable[tuple[Union[str, Path], Union[str, Path]]],
+    filename: str,
+    processes: Optional[int] = None,
+    parts_per_worker: int = DEFAULT_PARTS_PER_WORKER,
+) -> None:
+    """
+    Convert html files to pdf in parallel and concat all pdf into a unique pdf file.
+
+    Each part is rendered by a pool of processes, and each worker process is replaced
+    after `parts_per_worker` parts to contain weasyprint memory growth. Parts are
+    merged in the current process, in their original order.
+    :param input_outputs: Array of tuple (html input file, pdf output file)
+    :param filename: The PDF filename to create as the concatenation of all
+        converted html files
+    :param processes: The number of worker processes, defaults to the number of CPUs
+    :param parts_per_worker: The number of parts rendered by a worker process
+        before it is replaced
+    """
+    input_outputs = list(input_outputs)
+    processes = min(processes or os.cpu_count() or 1, len(input_outputs)) or 1
+    with multiprocessing.Pool(
+        processes=processes,
+        initializer=_init_pool_worker,
+        maxtasksperchild=parts_per_worker,
+    ) as pool:
+        pdf_files = pool.map(_generate_pdf_part, input_outputs, chunksize=1)
+    if filename:
+        # and merge everything
+        merge_pdfs(filename, pdf_files)
+
+
+_pool_worker_config: dict = {}
+
+
+def _init_pool_worker() -> None:
+    font_config = FontConfiguration()
+    _pool_worker_config["font_config"] = font_config
+    _pool_worker_config["css"] = CSS(PDF_CSS, font_config=font_config)
+
+
+def _generate_pdf_part(
+    input_output: tuple[Union[str, Path], Union[str, Path]]
+) -> Union[str, Path]:
+    input_filename, output_filename = input_output
+    HTML(string=Path(input_filename).read_text("utf-8"), encoding="utf-8").write_pdf(
+        output_filename,
+        stylesheets=[_pool_worker_config["css"]],
+        font_config=_pool_worker_config["font_config"],
+    )
+    return output_filename
+
+
 def generate_pdfs_cmdline(
     input_outputs: Iterable[tuple[Union[str, Path], Union[str, Path]]], filename: str
 ) -> None:
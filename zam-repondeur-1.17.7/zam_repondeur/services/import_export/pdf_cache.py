@@ -0,0 +1,121 @@
+"""
+Content-addressed disk cache of rendered PDF fragments
+
+A fragment is identified by a digest of its (minified) HTML, of the print
+stylesheet (which embeds the fonts) and of the renderer version, so any change
+to one of them yields a new entry. Least recently used entries are evicted when
+the cache grows over its maximum size.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import time
+from importlib.metadata import version
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Optional, Union
+
+from pyramid.registry import Registry
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024  # 512 MB
+
+# Bump to invalidate all entries when rendering changes in a way the key misses
+CACHE_VERSION = "1"
+
+# Scanning the whole directory is not worth doing after each export
+EVICTION_INTERVAL = 10 * 60  # 10 minutes
+
+
+class PdfFragmentCache:
+    def __init__(
+        self, directory: Union[str, Path], css: str, max_size: int = DEFAULT_MAX_SIZE
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.assets_digest = _assets_digest(css)
+        self.max_size = max_size
+
+    def key(self, html: str) -> str:
+        sha256 = hashlib.sha256(self.assets_digest)
+        sha256.update(html.encode("utf-8"))
+        return sha256.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def get(self, key: str, destination: Union[str, Path]) -> bool:
+        """
+        Copy the cached PDF to `destination`, if there is one
+        """
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:
+            return False
+        os.utime(path)  # mark as recently used
+        return True
+
+    def set(self, key: str, source: Union[str, Path]) -> None:
+        with NamedTemporaryFile(dir=self.directory, delete=False) as tmp:
+            with open(source, "rb") as file_:
+                shutil.copyfileobj(file_, tmp)
+        os.replace(tmp.name, self._path(key))  # atomic for concurrent exports
+
+    def evict(self) -> None:
+        """
+        Evict least recently used entries, at most once every `EVICTION_INTERVAL`
+
+        The time of the last eviction is shared by all workers using the directory.
+        """
+        marker = self.directory / ".evicted"
+        try:
+            if time.time() - marker.stat().st_mtime < EVICTION_INTERVAL:
+                return
+        except FileNotFoundError:
+            pass
+        marker.touch()
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        if total_size <= self.max_size:
+            return
+        entries.sort()
+        evicted = 0
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            Path(path).unlink(missing_ok=True)
+            total_size -= size
+            evicted += 1
+        logger.info("Evicted %d PDF fragments from cache", evicted)
+
+
+def _assets_digest(css: str) -> bytes:
+    sha256 = hashlib.sha256(CACHE_VERSION.encode("utf-8"))
+    sha256.update(version("weasyprint").encode("utf-8"))
+    sha256.update(Path(css).read_bytes())
+    return sha256.digest()
+
+
+def get_pdf_fragment_cache(
+    registry: Registry, css: str
+) -> Optional[PdfFragmentCache]:
+    """
+    The fragment cache, if enabled by the `zam.write_pdf.fragment_cache_dir` setting
+    """
+    settings = registry.settings or {}
+    directory = settings.get("zam.write_pdf.fragment_cache_dir")
+    if not directory:
+        return None
+    max_size = int(
+        settings.get("zam.write_pdf.fragment_cache_max_size", DEFAULT_MAX_SIZE)
+    )
+    return PdfFragmentCache(directory, css=css, max_size=max_size)
@@ -1,35 +1,116 @@
 from collections import Counter
-from typing import Iterable, List
+from typing import Iterable, Iterator, List
 
 from openpyxl import Workbook
-from openpyxl.styles import Color, Font, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Color, Font, NamedStyle, PatternFill
 from openpyxl.worksheet.worksheet import Worksheet
+from sqlalchemy import Integer, bindparam, func
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import joinedload, load_only
 
-from zam_repondeur.models import Amendement, Team, User
+from zam_repondeur.models import Amendement, DBSession, Lecture, Team, User
 
 from .spreadsheet import FIELDS, HEADERS, export_amendement_for_spreadsheet
 
 DARK_BLUE = Color(rgb="00182848")
 WHITE = Color(rgb="00FFFFFF")
 
+# Rows are fetched from a server-side cursor by batches of this size
+YIELD_PER = 500
+
+
+def _header_style() -> NamedStyle:
+    return NamedStyle(
+        name="header",
+        font=Font(color=WHITE, sz=8),
+        fill=PatternFill(patternType="solid", fgColor=DARK_BLUE),
+    )
+
+
+def _data_style() -> NamedStyle:
+    return NamedStyle(name="data", font=Font(sz=8))
+
 
 def export_xlsx(filename: str, amendements: List[Amendement]) -> Counter:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Amendements"
+    return _write_xlsx(filename, sorted(amendements))
+
+
+def export_lecture_xlsx(filename: str, lecture: Lecture) -> Counter:
+    """
+    Export all amendements of a lecture, streamed from the database
+    """
+    return _write_xlsx(filename, _iter_sorted_amendements(lecture))
+
+
+def _write_xlsx(filename: str, amendements: Iterable[Amendement]) -> Counter:
+    # Rows are written to disk as they come, so memory use does not depend
+    # on the number of amendements
+    wb = Workbook(write_only=True)
+    wb.add_named_style(_header_style())
+    wb.add_named_style(_data_style())
+    ws = wb.create_sheet("Amendements")
 
     _write_xslsx_header_row(ws)
-    counter = _export_xlsx_data_rows(ws, sorted(amendements))
+    counter = _export_xlsx_data_rows(ws, amendements)
     wb.save(filename)
     return counter
 
 
+def _iter_sorted_amendements(lecture: Lecture) -> Iterator[Amendement]:
+    order = _sorted_amendements_pks(lecture)
+    query = (
+        DBSession.query(Amendement)
+        .filter(Amendement.lecture_pk == lecture.pk)
+        .options(
+            joinedload("user_content"),
+            joinedload("location").options(
+                joinedload("user_table").joinedload("user").load_only("email", "name"),
+                joinedload("shared_table").load_only("titre"),
+                joinedload("batch"),
+            ),
+            joinedload("article").joinedload("user_content"),
+            joinedload("parent").load_only("num", "rectif"),
+        )
+        .order_by(
+            func.array_position(
+                bindparam("order", order, type_=ARRAY(Integer)), Amendement.pk
+            )
+        )
+        .yield_per(YIELD_PER)
+    )
+    yield from query
+
+
+def _sorted_amendements_pks(lecture: Lecture) -> List[int]:
+    """
+    The sort order depends on the articles and on the sort of each amendement,
+    so it is computed from a lightweight query with only those columns
+    """
+    amendements = (
+        DBSession.query(Amendement)
+        .filter(Amendement.lecture_pk == lecture.pk)
+        .options(
+            load_only(
+                Amendement.pk,
+                Amendement.num,
+                Amendement.position,
+                Amendement.sort,
+                Amendement.article_pk,
+            ),
+            joinedload(Amendement.article),
+        )
+    )
+    return [amendement.pk for amendement in sorted(amendements)]
+
+
 def _write_xslsx_header_row(ws: Worksheet) -> None:
-    for column, value in enumerate(HEADERS, 1):
-        cell = ws.cell(row=1, column=column)
-        cell.value = value
-        cell.fill = PatternFill(patternType="solid", fgColor=DARK_BLUE)
-        cell.font = Font(color=WHITE, sz=8)
+    row = []
+    for value in HEADERS:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = "header"
+        row.append(cell)
+    ws.append(row)
 
 
 def _export_xlsx_data_rows(ws: Worksheet, amendements: Iterable[Amendement]) -> Counter:
@@ -38,12 +119,14 @@ def _export_xlsx_data_rows(ws: Worksheet, amendements: Iterable[Amendement]) ->
         amend_dict = {
             FIELDS[k]: v for k, v in export_amendement_for_spreadsheet(amend).items()
         }
-        for column, value in enumerate(HEADERS, 1):
-            cell = ws.cell(row=counter["amendements"] + 2, column=column)
-            cell.value = amend_dict[value]
-            cell.font = Font(sz=8)
+        row = []
+        for value in HEADERS:
+            cell = WriteOnlyCell(ws, value=amend_dict[value])
+            cell.style = "data"
             if cell.data_type == "f":
                 cell.data_type = "s"  # Prevent errors with lines started with "="
+            row.append(cell)
+        ws.append(row)
         counter["amendements"] += 1
     return counter
 
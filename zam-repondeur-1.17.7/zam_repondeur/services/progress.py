@@ -1,5 +1,5 @@
 from datetime import timedelta
-from typing import Dict, Optional
+from typing import Dict, Optional, Set
 
 from pyramid.config import Configurator
 
@@ -12,15 +12,18 @@ def includeme(config: Configurator) -> None:
     Called automatically via config.include("zam_repondeur.services.progress")
     """
     repository.initialize(redis_url=config.registry.settings["zam.progress.redis_url"])
-    repository.max_duration = int(config.registry.settings["zam.progress.max_duration"])
+    settings = config.registry.settings
+    repository.max_duration = int(settings["zam.progress.max_duration"])
+    repository.export_max_duration = int(settings["zam.progress.export_max_duration"])
 
 
 class ProgressRepository(Repository):
     """
-    Store and access progress of Lecture retrieval/update
+    Store and access progress of Lecture retrieval/update and of Dossier exports
     """
 
     max_duration = 0
+    export_max_duration = 0
 
     @needs_init
     def clear_data(self) -> None:
@@ -53,5 +56,106 @@ class ProgressRepository(Repository):
         }
         return progress
 
+    @staticmethod
+    def _key_for_export_progress(dossier_pk: int) -> str:
+        return f"export.progress.{dossier_pk}"
+
+    @staticmethod
+    def _key_for_exported_lectures(dossier_pk: int, export_id: str) -> str:
+        return f"export.progress.{dossier_pk}.{export_id}.lectures"
+
+    @staticmethod
+    def _key_for_failed_lectures(dossier_pk: int, export_id: str) -> str:
+        return f"export.progress.{dossier_pk}.{export_id}.failed"
+
+    def _expires_at(self) -> int:
+        # Pushed back each time a lecture is exported: a large export may take
+        # longer than a lecture refresh, as long as it keeps making progress.
+        return self.to_timestamp(
+            self.now() + timedelta(seconds=self.export_max_duration * 60)
+        )
+
+    @needs_init
+    def start_export_progress(
+        self, dossier_pk: int, export_id: str, total: int
+    ) -> None:
+        key = self._key_for_export_progress(dossier_pk)
+        pipe = self.connection.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={"current": 0, "total": total, "export_id": export_id})
+        pipe.expireat(key, self._expires_at())
+        pipe.execute()
+
+    @needs_init
+    def set_lecture_exported(
+        self, dossier_pk: int, export_id: str, lecture_pk: int, total: int
+    ) -> bool:
+        """
+        Record that a lecture of the export is ready
+
+        Returns True for the one call that completes the export, so that it is
+        assembled exactly once, even when a part is retried.
+        """
+        lectures_key = self._key_for_exported_lectures(dossier_pk, export_id)
+        expires_at = self._expires_at()
+        pipe = self.connection.pipeline()
+        pipe.sadd(lectures_key, lecture_pk)
+        pipe.scard(lectures_key)
+        pipe.expireat(lectures_key, expires_at)
+        pipe.expireat(self._key_for_failed_lectures(dossier_pk, export_id), expires_at)
+        added, current, _, _ = pipe.execute()
+        if self._is_current_export(dossier_pk, export_id):
+            progress_key = self._key_for_export_progress(dossier_pk)
+            pipe = self.connection.pipeline()
+            pipe.hset(progress_key, "current", current)
+            pipe.expireat(progress_key, expires_at)
+            pipe.execute()
+        return bool(added) and current == total
+
+    @needs_init
+    def set_lecture_failed(
+        self, dossier_pk: int, export_id: str, lecture_pk: int
+    ) -> None:
+        """
+        Record that a lecture could not be exported, even after retries
+
+        It must still be counted with `set_lecture_exported` for the export to
+        be assembled (without it).
+        """
+        failed_key = self._key_for_failed_lectures(dossier_pk, export_id)
+        pipe = self.connection.pipeline()
+        pipe.sadd(failed_key, lecture_pk)
+        pipe.expireat(failed_key, self._expires_at())
+        pipe.execute()
+
+    @needs_init
+    def get_failed_lectures(self, dossier_pk: int, export_id: str) -> Set[int]:
+        failed_key = self._key_for_failed_lectures(dossier_pk, export_id)
+        return {int(pk) for pk in self.connection.smembers(failed_key)}
+
+    @needs_init
+    def reset_export_progress(self, dossier_pk: int, export_id: str) -> None:
+        self.connection.delete(
+            self._key_for_exported_lectures(dossier_pk, export_id),
+            self._key_for_failed_lectures(dossier_pk, export_id),
+        )
+        if self._is_current_export(dossier_pk, export_id):
+            self.connection.delete(self._key_for_export_progress(dossier_pk))
+
+    def _is_current_export(self, dossier_pk: int, export_id: str) -> bool:
+        # A newer export of the same dossier may have been started since
+        current_export_id = self.connection.hget(
+            self._key_for_export_progress(dossier_pk), "export_id"
+        )
+        return current_export_id is not None and current_export_id.decode() == export_id
+
+    @needs_init
+    def get_export_progress(self, dossier_pk: int) -> Dict[str, int]:
+        key = self._key_for_export_progress(dossier_pk)
+        return {
+            name: int(self.connection.hget(key, name) or 0)
+            for name in ("current", "total")
+        }
+
 
 repository = ProgressRepository()
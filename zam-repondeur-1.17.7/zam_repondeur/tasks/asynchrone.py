@@ -9,8 +9,10 @@ from os.path import basename
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
 from zipfile import ZIP_DEFLATED, ZipFile
 
+from huey.api import Task
 from pyramid.threadlocal import get_current_registry
 from pyramid_mailer import get_mailer
 from sqlalchemy.orm import joinedload
@@ -33,6 +35,7 @@ from zam_repondeur.models.events.import_export import (
     ImportDossierZipLectureNotFound,
 )
 from zam_repondeur.services.data import repository
+from zam_repondeur.services.progress import repository as progress_repository
 from zam_repondeur.services.import_export.json import export_json, import_json_async
 from zam_repondeur.services.import_export.pdf import (
     write_pdf,
@@ -52,18 +55,15 @@ RETRY_DELAY = 5 * 60  # 5 minutes
 
 @huey.task(retries=3, retry_delay=RETRY_DELAY)
 def export_dossier(dossier_pk: int, user_pk: int) -> None:
-    from zam_repondeur.services.dossiers import dossier_export_repository
+    """
+    Split the export of a dossier into one task per lecture
 
+    Lectures are exported concurrently by the available workers, and the last one
+    to finish triggers the assembly of the archive (see `assemble_dossier_export`).
+    """
     with huey.lock_task(f"dossier-{dossier_pk}"):
         dossier = (
-            DBSession.query(Dossier)
-            .options(
-                joinedload(Dossier.lectures)
-                .joinedload(Lecture.articles)
-                .joinedload(Article.amendements)
-            )
-            .filter(Dossier.pk == dossier_pk)
-            .one_or_none()
+            DBSession.query(Dossier).filter(Dossier.pk == dossier_pk).one_or_none()
         )
         if not dossier:
             logger.error(f"Dossier: {dossier_pk} introuvable")
@@ -72,23 +72,67 @@ def export_dossier(dossier_pk: int, user_pk: int) -> None:
         if not user:
             logger.error(f"User: {user_pk} introuvable")
             return
-        registry = get_current_registry()
-        upload_path = registry.settings["zam.uploads_backup_dir"]
-        folder_path = f"{upload_path}/{dossier.slug}"
+        export_id = uuid4().hex
+        folder_path = _export_folder_path(dossier.slug, export_id)
         Path(folder_path).mkdir(parents=True, exist_ok=True)
         usuers_wb = get_user_list_workbook(dossier.team, f"{dossier.slug}")
         usuers_wb.save(f"{folder_path}/Equipe-{dossier.slug}.xlsx")
-        split_mode = int(
-            registry.settings.get(
-                "zam.write_pdf.split_mode", WritePdfSplitMode.MULTIPLE_PDF_AT_ONCE,
-            )
+        lectures_pks = [lecture.pk for lecture in dossier.lectures]
+        total = len(lectures_pks)
+        progress_repository.start_export_progress(dossier_pk, export_id, total)
+
+    logger.info(f"Export du dossier {dossier_pk} en {total} lecture(s)")
+    if not lectures_pks:
+        assemble_dossier_export(dossier_pk, user_pk, export_id)
+    for lecture_pk in lectures_pks:
+        export_dossier_lecture(dossier_pk, user_pk, export_id, lecture_pk, total)
+
+
+@huey.task(retries=3, retry_delay=RETRY_DELAY, context=True)
+def export_dossier_lecture(
+    dossier_pk: int,
+    user_pk: int,
+    export_id: str,
+    lecture_pk: int,
+    total: int,
+    task: Optional[Task] = None,
+) -> None:
+    try:
+        _export_dossier_lecture(export_id, lecture_pk)
+    except Exception:
+        if task is not None and task.retries > 0:
+            raise  # will be retried
+        # Do not hold the whole export back: it will be assembled without it
+        logger.exception(f"Export de la lecture {lecture_pk} abandonné")
+        progress_repository.set_lecture_failed(dossier_pk, export_id, lecture_pk)
+
+    if progress_repository.set_lecture_exported(
+        dossier_pk, export_id, lecture_pk, total
+    ):
+        assemble_dossier_export(dossier_pk, user_pk, export_id)
+
+
+def _export_dossier_lecture(export_id: str, lecture_pk: int) -> None:
+    with huey.lock_task(f"lecture-{lecture_pk}"):
+        lecture = (
+            DBSession.query(Lecture)
+            .options(joinedload(Lecture.articles).joinedload(Article.amendements))
+            .filter(Lecture.pk == lecture_pk)
+            .one_or_none()
         )
-        generation_mode = int(
-            registry.settings.get(
-                "zam.write_pdf.generation_mode", WritePdfGEnerationMode.CMDLINE
+        if lecture:
+            registry = get_current_registry()
+            folder_path = _export_folder_path(lecture.dossier.slug, export_id)
+            split_mode = int(
+                registry.settings.get(
+                    "zam.write_pdf.split_mode", WritePdfSplitMode.MULTIPLE_PDF_AT_ONCE,
+                )
+            )
+            generation_mode = int(
+                registry.settings.get(
+                    "zam.write_pdf.generation_mode", WritePdfGEnerationMode.CMDLINE
+                )
             )
-        )
-        for lecture in dossier.lectures:
             logger.info(
                 f"Export lecture {lecture.zip_key} split_mode={split_mode}"
                 f" generation_mode={generation_mode}"
@@ -105,38 +149,70 @@ def export_dossier(dossier_pk: int, user_pk: int) -> None:
                 split_mode=split_mode,
                 generation_mode=generation_mode,
             )
+        else:
+            # Deleted in the meantime, it will be left out of the archive
+            logger.error(f"Lecture {lecture_pk} introuvable")
 
-        # create a ZipFile compressed object
-        # https://docs.python.org/fr/3/library/zipfile.html#zipfile.ZIP_DEFLATED
-        with ZipFile(f"{folder_path}.zip", "w", compression=ZIP_DEFLATED) as zipObj:
-            logger.info(f"Export Création du zip")
-            zipObj.write(
-                f"{folder_path}/Equipe-{dossier.slug}.xlsx",
-                basename(f"{dossier.slug}/Equipe-{dossier.slug}.xlsx"),
-            )
-            for lecture in dossier.lectures:
-                logger.info(f"Ajout de la lecture {lecture.zip_key} dans l'archive")
-                for extension in ["xlsx", "pdf", "json"]:
-                    zipObj.write(
-                        f"{folder_path}/{lecture.zip_key}.{extension}",
-                        f"{dossier.slug}/{lecture.zip_key}.{extension}",
-                    )
 
-        # Upload content to redis
-        logger.info(f"Ajout de l'archive {dossier.slug}.zip dans redis")
-        export_zip = open(f"{folder_path}.zip", "rb")
-        dossier_export_repository.set_export_content(dossier, export_zip.read())
-        export_zip.close()
+@huey.task(retries=3, retry_delay=RETRY_DELAY)
+def assemble_dossier_export(dossier_pk: int, user_pk: int, export_id: str) -> None:
+    from zam_repondeur.services.dossiers import dossier_export_repository
 
+    with huey.lock_task(f"dossier-{dossier_pk}"):
+        dossier = (
+            DBSession.query(Dossier).filter(Dossier.pk == dossier_pk).one_or_none()
+        )
+        if not dossier:
+            logger.error(f"Dossier: {dossier_pk} introuvable")
+            return
+        user = DBSession.query(User).filter(User.pk == user_pk).one_or_none()
+        if not user:
+            logger.error(f"User: {user_pk} introuvable")
+            return
+        registry = get_current_registry()
+        folder_path = _export_folder_path(dossier.slug, export_id)
+
+        # Build the archive directly in the artifact store
+        # https://docs.python.org/fr/3/library/zipfile.html#zipfile.ZIP_DEFLATED
+        failed_lectures = progress_repository.get_failed_lectures(dossier_pk, export_id)
+        archive_file = dossier_export_repository.new_export_file()
         try:
-            shutil.rmtree(folder_path)
-        except OSError as e:
-            print("Error: %s : %s" % (folder_path, e.strerror))
+            with archive_file, ZipFile(
+                archive_file, "w", compression=ZIP_DEFLATED
+            ) as zipObj:
+                logger.info(f"Export Création du zip")
+                _move_to_zip(
+                    zipObj,
+                    f"{folder_path}/Equipe-{dossier.slug}.xlsx",
+                    basename(f"{dossier.slug}/Equipe-{dossier.slug}.xlsx"),
+                )
+                for lecture in dossier.lectures:
+                    if lecture.pk in failed_lectures or not all(
+                        os.path.exists(f"{folder_path}/{lecture.zip_key}.{extension}")
+                        for extension in ["xlsx", "pdf", "json"]
+                    ):
+                        # Failed, or added after the export was started
+                        logger.warning(f"Lecture {lecture.zip_key} non exportée")
+                        continue
+                    logger.info(f"Ajout de la lecture {lecture.zip_key} dans l'archive")
+                    for extension in ["xlsx", "pdf", "json"]:
+                        _move_to_zip(
+                            zipObj,
+                            f"{folder_path}/{lecture.zip_key}.{extension}",
+                            f"{dossier.slug}/{lecture.zip_key}.{extension}",
+                        )
+        except BaseException:
+            os.remove(archive_file.name)
+            raise
+
+        logger.info(f"Ajout de l'archive {dossier.slug}.zip dans les exports")
+        dossier_export_repository.set_export_file(dossier, archive_file.name)
+        progress_repository.reset_export_progress(dossier_pk, export_id)
 
         try:
-            os.remove(f"{folder_path}.zip")
+            shutil.rmtree(folder_path)
         except OSError as e:
-            print("Error: %s : %s" % (f"{folder_path}.zip", e.strerror))
+            print("Error: %s : %s" % (folder_path, e.strerror))
 
         # Envoi du mail
         dossier_url = huey.get_url_dossier_from_ini(dossier.slug)
@@ -144,6 +220,16 @@ def export_dossier(dossier_pk: int, user_pk: int) -> None:
         ExportDossierZipReady.create(dossier, user)
 
 
+def _export_folder_path(dossier_slug: str, export_id: str) -> str:
+    upload_path = get_current_registry().settings["zam.uploads_backup_dir"]
+    return f"{upload_path}/{dossier_slug}/{export_id}"
+
+
+def _move_to_zip(zip_file: ZipFile, path: str, arcname: str) -> None:
+    zip_file.write(path, arcname)
+    os.remove(path)
+
+
 @huey.task(retries=3, retry_delay=RETRY_DELAY)
 def export_lecture_pdf(
     lecture_pk: int, user_pk: int, articles_pk: List[int] = []
@@ -24,6 +24,7 @@ from zam_repondeur.models import (
     Phase,
     Amendement,
 )
+from zam_repondeur.models.events.base import bulk_events
 from zam_repondeur.models.events.dossier import LecturesRecuperees, ArchiverDossier
 from zam_repondeur.models.events.dossiers_list import ArchiverDossiersList
 from zam_repondeur.models.events.lecture import (
@@ -43,7 +44,7 @@ from zam_repondeur.services.data import repository
 from zam_repondeur.services.fetch import get_articles
 from zam_repondeur.services.fetch.amendements import MAX_404, RemoteSource
 from zam_repondeur.services.fetch.an.dossiers.models import DossierRef, LectureRef
-from zam_repondeur.services.fetch.http import get_http_session
+from zam_repondeur.services.fetch.http import get_http_cache_stats, get_http_session
 from zam_repondeur.services.fetch.missions import ID_TXT_MISSIONS
 from zam_repondeur.services.fetch.senat.scraping import create_dossier_ref
 from zam_repondeur.tasks.huey import huey, init_huey
@@ -295,7 +296,9 @@ def fetch_amendements(lecture_pk: Optional[int], max_404: int = MAX_404) -> bool
         logger.error(f"fetch_amendements: lecture_pk is None")
         return False
 
-    with huey.lock_task(f"lecture-{lecture_pk}"):
+    # Collecting is the long part (downloads), so it only excludes other fetches of
+    # the same lecture: the lecture itself is only locked to apply the changes.
+    with huey.lock_task(f"fetch-amendements-{lecture_pk}"):
 
         lecture = DBSession.query(Lecture).get(lecture_pk)
         if lecture is None:
@@ -339,6 +342,7 @@ def fetch_amendements(lecture_pk: Optional[int], max_404: int = MAX_404) -> bool
                     "message": exception.message,
                 }
                 alert_data_task(context, exception.error, lecture_pk=lecture.pk)
+                return False
         logger.info("Time to collect: %.1fs", collect_timer.elapsed())
 
         # Then apply the actual changes in a fresh transaction, in order to minimize
@@ -352,55 +356,59 @@ def fetch_amendements(lecture_pk: Optional[int], max_404: int = MAX_404) -> bool
             transaction.commit()
             DBSession.expire_all()
 
-        lecture = DBSession.query(Lecture).with_for_update().get(lecture_pk)
-        if lecture is None:
-            logger.error(f"Lecture {lecture_pk} introuvable")
-            return False
+        with huey.lock_task(f"lecture-{lecture_pk}"):
+            lecture = DBSession.query(Lecture).with_for_update().get(lecture_pk)
+            if lecture is None:
+                logger.error(f"Lecture {lecture_pk} introuvable")
+                return False
 
-        with Timer() as apply_timer:
-            amendements, created, errored = source.apply_changes(lecture, changes)
-        logger.info("Time to apply: %.1fs", apply_timer.elapsed())
+            with Timer() as apply_timer, bulk_events():
+                amendements, created, errored = source.apply_changes(lecture, changes)
+            logger.info("Time to apply: %.1fs", apply_timer.elapsed())
 
-        logger.info(
-            "Total time: %.1fs",
-            sum(t.elapsed() for t in (prepare_timer, collect_timer, apply_timer)),
-        )
+            logger.info(
+                "Total time: %.1fs",
+                sum(t.elapsed() for t in (prepare_timer, collect_timer, apply_timer)),
+            )
+            http_cache_stats = get_http_cache_stats()
+            if http_cache_stats is not None:
+                logger.info("HTTP cache: %r", http_cache_stats)
 
-        if not amendements:
-            AmendementsNonTrouves.create(lecture=lecture)
+            if not amendements:
+                AmendementsNonTrouves.create(lecture=lecture)
 
-        if created:
-            AmendementsRecuperes.create(lecture=lecture, count=created)
+            if created:
+                AmendementsRecuperes.create(lecture=lecture, count=created)
 
-        if errored:
-            AmendementsNonRecuperes.create(lecture=lecture, missings=errored)
+            if errored:
+                AmendementsNonRecuperes.create(lecture=lecture, missings=errored)
 
-        changed = bool(amendements and not (created or errored))
-        if changed:
-            AmendementsAJour.create(lecture=lecture)
+            changed = bool(amendements and not (created or errored))
+            if changed:
+                AmendementsAJour.create(lecture=lecture)
 
-        if not lecture.partie:
-            nb_amendements = (
-                DBSession.query(Amendement.sort)
-                .filter(Amendement.lecture_pk == lecture_pk)
-                .count()
-            )
-            if nb_amendements:
-                nb_amendements_with_sort = (
+            if not lecture.partie:
+                nb_amendements = (
                     DBSession.query(Amendement.sort)
-                    .filter(
-                        and_(
-                            Amendement.lecture_pk == lecture_pk,
-                            Amendement.sort.isnot(None),
-                            Amendement.sort != "",
-                        )
-                    )
+                    .filter(Amendement.lecture_pk == lecture_pk)
                     .count()
                 )
-                if nb_amendements_with_sort == nb_amendements and lecture.update:
-                    lecture.update = False
-                    AutomaticDisablingSortAmendements.create(lecture=lecture)
-        return changed
+                if nb_amendements:
+                    nb_amendements_with_sort = (
+                        DBSession.query(Amendement.sort)
+                        .filter(
+                            and_(
+                                Amendement.lecture_pk == lecture_pk,
+                                Amendement.sort.isnot(None),
+                                Amendement.sort != "",
+                            )
+                        )
+                        .count()
+                    )
+                    if nb_amendements_with_sort == nb_amendements and lecture.update:
+                        lecture.update = False
+                        AutomaticDisablingSortAmendements.create(lecture=lecture)
+            return changed
 
 
 @huey.task()
@@ -2,7 +2,7 @@
 NB: make sure tasks.huey.init_huey() has been called before importing this module
 """
 import logging
-from typing import Set
+from typing import TYPE_CHECKING, Optional, Set
 
 from huey import crontab
 
@@ -10,6 +10,9 @@ from zam_repondeur.models import DBSession, Dossier, Team, Texte
 from zam_repondeur.tasks.fetch import update_dossier, update_dossier2texte
 from zam_repondeur.tasks.huey import huey
 
+if TYPE_CHECKING:
+    from zam_repondeur.services.data import OpenDataChanges
+
 logger = logging.getLogger(__name__)
 
 CRON_UPDATE_DATA = huey.settings.get("zam.cron.update_data") or "1 * * * *"
@@ -21,40 +24,45 @@ CRON_UPDATE_DOSSIERS2TEXTE = (
 
 @huey.periodic_task(crontab(*CRON_UPDATE_DATA.split(" ")))
 def update_data() -> None:
-    update_data_repository()
-    update_textes()
-    update_dossiers()
+    changes = update_data_repository()
+    update_textes(changes.textes)
+    update_dossiers(changes.dossiers)
     update_dossiers2textes()
 
 
-def update_data_repository() -> None:
+def update_data_repository() -> "OpenDataChanges":
     """
     Fetch AN open data, scrape Sénat dossiers, and put everything in Redis cache
+
+    Returns the uids of AN dossiers and textes that changed since the last update.
     """
     from zam_repondeur.services.data import repository
 
     logger.info("Data update start")
-    repository.load_data()
-    logger.info("Data update end")
+    changes = repository.load_data()
+    logger.info("Data update end (cache: %r)", repository.cache.stats())
+    return changes
 
 
-def update_dossiers() -> None:
+def update_dossiers(an_ids: Optional[Set[str]] = None) -> None:
     """
     Update Dossiers in database based on data in Redis cache
+
+    If `an_ids` is given, only these AN dossiers are considered.
     """
     logger.info("Dossiers update start")
-    create_missing_dossiers_an()
+    create_missing_dossiers_an(an_ids)
     create_missing_dossiers_senat()
     logger.info("Dossiers update end")
 
 
-def create_missing_dossiers_an() -> None:
+def create_missing_dossiers_an(an_ids: Optional[Set[str]] = None) -> None:
     """
     Create new dossiers based on dossier_refs in AN open data
     """
     from zam_repondeur.services.data import repository
 
-    known_an_ids = _known_an_ids()
+    known_an_ids = _known_an_ids() if an_ids is None else an_ids
     existing_an_ids = _existing_an_ids()
     # existing_senat_ids = _existing_senat_ids()
     missing_an_ids = known_an_ids - existing_an_ids
@@ -144,14 +152,18 @@ def _existing_senat_ids() -> Set[str]:
     )
 
 
-def update_textes() -> None:
+def update_textes(uids: Optional[Set[str]] = None) -> None:
     """
     Update Textes in database based on data in Redis cache
+
+    If `uids` is given, only these textes are considered.
     """
     from zam_repondeur.services.data import repository
 
     logger.info("Textes update start")
-    create_missing_textes(set(repository.list_opendata_textes()))
+    if uids is None:
+        uids = set(repository.list_opendata_textes())
+    create_missing_textes(uids)
     logger.info("Textes  update end")
 
 
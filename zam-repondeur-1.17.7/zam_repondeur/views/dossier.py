@@ -1,6 +1,4 @@
-import os
 from datetime import date
-from tempfile import NamedTemporaryFile
 
 from pyramid.httpexceptions import HTTPFound
 from pyramid.request import Request
@@ -82,16 +80,20 @@ def dossier_export(context: DossierResource, request: Request) -> Response:
 
     date_str = export["created_at"].strftime("%Y_%m_%d_%H_%M")
 
-    with NamedTemporaryFile() as file_:
-        tmp_file_path = os.path.abspath(file_.name)
-        file_.write(export["export_content"])
-        response = FileResponse(tmp_file_path)
-        attach_name = f"{dossier.slug}-{date_str}.zip"
-        response.content_type = "application/zip"
-        response.headers[
-            "Content-Disposition"
-        ] = f'attachment; filename="{attach_name}"'
-        return response
+    # streamed from the artifact store, in chunks
+    response = FileResponse(
+        str(export["export_path"]), request=request, content_type="application/zip"
+    )
+    attach_name = f"{dossier.slug}-{date_str}.zip"
+    response.headers["Content-Disposition"] = f'attachment; filename="{attach_name}"'
+    return response
+
+
+@view_config(context=DossierResource, name="export_progress_status", renderer="json")
+def export_progress_status(context: DossierResource, request: Request) -> dict:
+    from zam_repondeur.services.progress import repository as progress_repository
+
+    return progress_repository.get_export_progress(context.dossier.pk)
 
 
 @view_config(context=DossierResource, name="manual_refresh", permission="active")
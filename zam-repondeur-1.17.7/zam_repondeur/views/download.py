@@ -19,7 +19,7 @@ from zam_repondeur.services.import_export.pdf import (
     WritePdfSplitMode,
     WritePdfGEnerationMode,
 )
-from zam_repondeur.services.import_export.xlsx import export_xlsx
+from zam_repondeur.services.import_export.xlsx import export_lecture_xlsx
 from zam_repondeur.tasks.asynchrone import export_lecture_pdf
 
 DOWNLOAD_FORMATS = {
@@ -71,7 +71,8 @@ class Downloads:
         if fmt not in DOWNLOAD_FORMATS.keys():
             raise HTTPBadRequest(f'Invalid value "{fmt}" for "format" param')
 
-        options = PDF_OPTIONS if fmt == "pdf" else EXPORT_OPTIONS
+        # The spreadsheet is streamed from the database (see export_lecture_xlsx)
+        options = {"pdf": PDF_OPTIONS, "json": EXPORT_OPTIONS, "xlsx": []}[fmt]
         lecture = self.context.parent.model(*options)
 
         with NamedTemporaryFile() as file_:
@@ -81,7 +82,7 @@ class Downloads:
                 export_json(lecture=lecture, filename=tmp_file_path)
                 ExportJSON.create(lecture=lecture, request=self.request)
             elif fmt == "xlsx":
-                export_xlsx(filename=tmp_file_path, amendements=lecture.amendements)
+                export_lecture_xlsx(filename=tmp_file_path, lecture=lecture)
                 ExportExcel.create(lecture=lecture, request=self.request)
             elif fmt == "pdf":
                 StartExportPDF.create(lecture=lecture, request=None, user=self.request.user)
@@ -1,4 +1,5 @@
 import os
+from collections import Counter
 from tempfile import NamedTemporaryFile
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -8,11 +9,17 @@ from pyramid.response import FileResponse, Response
 from pyramid.view import view_config, view_defaults
 from sqlalchemy import and_, func, not_, or_
 from sqlalchemy.orm import Query, joinedload, load_only, subqueryload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from zam_repondeur.data_sanitize import sanitize_string
 from zam_repondeur.message import Message
 from zam_repondeur.models import Amendement, Article, Batch, DBSession, Lecture
-from zam_repondeur.models.amendement import AVIS, SEARCHING_SORTS, AmendementUserContent
+from zam_repondeur.models.amendement import (
+    AVIS,
+    SEARCH_CONFIGURATION,
+    SEARCHING_SORTS,
+    AmendementUserContent,
+)
 from zam_repondeur.resources import (
     AmendementCollection,
     LectureResource,
@@ -26,43 +33,41 @@ from zam_repondeur.services.clean import (
 from zam_repondeur.services.import_export.xlsx import export_xlsx
 
 
+INDEX_AMENDEMENT_OPTIONS = [
+    load_only(
+        "article_pk",
+        "auteur",
+        "id_identique",
+        "lecture_pk",
+        "mission_titre",
+        "mission_titre_court",
+        "num",
+        "parent_pk",
+        "position",
+        "rectif",
+        "sort",
+        "modified",
+    ),
+    joinedload("user_content").load_only(
+        "avis", "has_reponse", "objet", "reponse_hash"
+    ),
+    joinedload("location").options(
+        subqueryload("batch")
+        .joinedload("amendements_locations")
+        .joinedload("amendement")
+        .load_only("num", "rectif"),
+        subqueryload("shared_table").load_only("titre"),
+        subqueryload("user_table").joinedload("user").load_only("email", "name"),
+    ),
+]
+
+
 @view_config(context=AmendementCollection, renderer="lecture_index.html")
 def lecture_index(context: AmendementCollection, request: Request) -> dict:
     """
     The index lists all amendements in a lecture
     """
-    lecture = context.parent.model(
-        subqueryload("articles").defer("content"),
-        subqueryload("amendements").options(
-            load_only(
-                "article_pk",
-                "auteur",
-                "id_identique",
-                "lecture_pk",
-                "mission_titre",
-                "mission_titre_court",
-                "num",
-                "parent_pk",
-                "position",
-                "rectif",
-                "sort",
-                "modified",
-            ),
-            joinedload("user_content").load_only(
-                "avis", "has_reponse", "objet", "reponse_hash"
-            ),
-            joinedload("location").options(
-                subqueryload("batch")
-                .joinedload("amendements_locations")
-                .joinedload("amendement")
-                .load_only("num", "rectif"),
-                subqueryload("shared_table").load_only("titre"),
-                subqueryload("user_table")
-                .joinedload("user")
-                .load_only("email", "name"),
-            ),
-        ),
-    )
+    lecture = context.parent.model(subqueryload("articles").defer("content"))
     object_articles_sorted = sorted(lecture.articles)
 
     # Récupération du bouton de switch pour la pagination
@@ -73,22 +78,32 @@ def lecture_index(context: AmendementCollection, request: Request) -> dict:
     infos_pagination = set_pagination(
         request=request,
         active_seuil=request.session.get(f"seuil_dossier_{lecture.dossier.pk}"),
-        amendements=lecture.amendements,
+        amendements_counts=count_amendements_by_article(lecture),
         seuil=request.registry.settings["zam.seuil_pagination"],
         object_articles_sorted=object_articles_sorted,
         article_session=request.session.get(f"article_lecture_{lecture.pk}", ""),
         lecture_pk=lecture.pk,
     )
 
+    # The quick search and the identiques/similaires of the amendements on the page
+    # only need a few columns of every amendement in the lecture
+    all_amendements = load_lightweight_amendements(lecture)
+
+    # Only the amendements on the current page are fully loaded
+    query = DBSession.query(Amendement).filter(Amendement.lecture_pk == lecture.pk)
+    if infos_pagination["current_article"] is not None:
+        query = query.filter(
+            Amendement.article_pk == infos_pagination["current_article"].pk
+        )
+    amendements_onpage = sorted(query.options(*INDEX_AMENDEMENT_OPTIONS))
+
     sort_key, reverse = get_sort_config(request)
 
     return {
         "lecture": lecture,
-        "all_amendements": lecture.amendements,
-        "amendements_onpage": infos_pagination["all_amendements"],
-        "main_amendements": Batch.collapsed_batches(
-            infos_pagination["all_amendements"]
-        ),
+        "all_amendements": all_amendements,
+        "amendements_onpage": amendements_onpage,
+        "main_amendements": Batch.collapsed_batches(amendements_onpage),
         "sort_key": sort_key,
         "reverse": reverse,
         "articles": object_articles_sorted,
@@ -104,6 +119,48 @@ def lecture_index(context: AmendementCollection, request: Request) -> dict:
     }
 
 
+def count_amendements_by_article(lecture: Lecture) -> Dict[int, int]:
+    return dict(
+        DBSession.query(Amendement.article_pk, func.count(Amendement.pk))
+        .filter(Amendement.lecture_pk == lecture.pk)
+        .group_by(Amendement.article_pk)
+    )
+
+
+def load_lightweight_amendements(lecture: Lecture) -> List[Amendement]:
+    """
+    Load the columns needed to sort the amendements of the lecture and to compute
+    their identiques, discussions communes and similaires, and use them as the
+    `lecture.amendements` collection
+
+    From the user content, only the avis (for `is_displayable`) and the hash of the
+    reponse (computed by the database) are needed. The amendements come already
+    ordered by position, so that sorting them is little more than a check.
+    """
+    amendements: List[Amendement] = (
+        DBSession.query(Amendement)
+        .filter(Amendement.lecture_pk == lecture.pk)
+        .options(
+            load_only(
+                "article_pk",
+                "auteur",
+                "id_discussion_commune",
+                "id_identique",
+                "lecture_pk",
+                "num",
+                "position",
+                "rectif",
+                "sort",
+            ),
+            joinedload("user_content").load_only("avis", "reponse_hash"),
+        )
+        .order_by(Amendement.position, Amendement.num)  # NULLs last
+        .all()
+    )
+    set_committed_value(lecture, "amendements", amendements)
+    return amendements
+
+
 @view_config(context=RechercheCollection, renderer="lecture_search.html")
 def lecture_index_search(context: RechercheCollection, request: Request) -> dict:
     """
@@ -146,11 +203,11 @@ def lecture_index_search(context: RechercheCollection, request: Request) -> dict
     object_articles_sorted = sorted(lecture.articles)
 
     champs_simples = {
-        "expose": Amendement.expose_search,
-        "corps": Amendement.corps_search,
-        "objet": AmendementUserContent.objet_search,
-        "reponse": AmendementUserContent.reponse_search,
-        "commentaires": AmendementUserContent.comments_search,
+        "expose": Amendement.expose_tsv,
+        "corps": Amendement.corps_tsv,
+        "objet": AmendementUserContent.objet_tsv,
+        "reponse": AmendementUserContent.reponse_tsv,
+        "commentaires": AmendementUserContent.comments_tsv,
     }
     sorts = sorted(list(SEARCHING_SORTS.values()))
     champs_multiple = {
@@ -209,9 +266,17 @@ def lecture_index_search(context: RechercheCollection, request: Request) -> dict
     active_search: int = 0
     search_values: Dict[str, Optional[List[str]]] = {}
 
+    ranks: List[Any] = []
     for champ, column in champs_simples.items():
         query, active_search, search_values = set_simple_filtre(
-            request, lecture, query, active_search, champ, column, search_values,
+            request,
+            lecture,
+            query,
+            active_search,
+            champ,
+            column,
+            search_values,
+            ranks,
         )
 
     for champ, element in champs_multiple.items():
@@ -229,24 +294,42 @@ def lecture_index_search(context: RechercheCollection, request: Request) -> dict
     if "recherche-button" in request.POST:
         active_search += 1
 
-    amendements = query.all()
+    if ranks:
+        # Les plus pertinents en premier
+        rank = sum(ranks[1:], ranks[0]).label("search_rank")
+        amendements = []
+        for amendement, search_rank in query.add_columns(rank).order_by(
+            rank.desc()
+        ):
+            amendement.search_rank = search_rank
+            amendements.append(amendement)
+    else:
+        amendements = query.all()
     infos_pagination = set_pagination(
         request=request,
         active_seuil=request.session.get(f"seuil_dossier_{lecture.dossier.pk}"),
-        amendements=amendements,
+        amendements_counts=Counter(amdt.article_pk for amdt in amendements),
         seuil=request.registry.settings["zam.seuil_pagination"],
         object_articles_sorted=object_articles_sorted,
         article_session=request.session.get(f"article_lecture_{lecture.pk}", ""),
         lecture_pk=lecture.pk,
     )
+    current_article = infos_pagination["current_article"]
+    amendements_onpage = sorted(
+        amdt
+        for amdt in amendements
+        if current_article is None or amdt.article_pk == current_article.pk
+    )
 
-    sort_key, reverse = get_sort_config(request)
+    sort_key, reverse = get_sort_config(
+        request, default="search_rank" if ranks else "sort_key"
+    )
 
     return {
         "lecture": lecture,
         "all_amendements": amendements,
-        "amendements_onpage": infos_pagination["all_amendements"],
-        "main_amendements": infos_pagination["all_amendements"],
+        "amendements_onpage": amendements_onpage,
+        "main_amendements": amendements_onpage,
         "sort_key": sort_key,
         "reverse": reverse,
         "articles": object_articles_sorted,
@@ -310,27 +393,29 @@ def set_simple_filtre(
     libelle: str,
     column: Optional[str],
     search_values: Dict[str, Optional[List[str]]],
+    ranks: Optional[List[Any]] = None,
 ) -> Tuple[Query, int, Dict[str, Optional[List[str]]]]:
+    """
+    Full-text search on a `*_tsv` column, the relevance of the match is appended
+    to `ranks`
+    """
     value = get_simple_search(request, lecture, libelle)
     is_exact_search = get_exact_search(request, lecture, libelle)
 
     if value is not None:
+        text = decode_special_car(value)
         if is_exact_search:
-            query = query.filter(
-                column.ilike(f"%{value}%")  # type: ignore
-            )
+            tsquery = func.phraseto_tsquery(SEARCH_CONFIGURATION, text)
             search_values[f"exact-search-{libelle}"] = ["checked"]
         else:
-            terms = value.split(" ")
-            query = query.filter(
-                and_(
-                    column.ilike(f"%{term}%")  # type: ignore
-                    for term in terms
-                )
-            )
+            # All the terms must be found
+            tsquery = func.plainto_tsquery(SEARCH_CONFIGURATION, text)
+        query = query.filter(column.op("@@")(tsquery))  # type: ignore
+        if ranks is not None:
+            ranks.append(func.ts_rank(column, tsquery))
 
         active_search += 1
-        search_values[libelle] = [decode_special_car(value)]
+        search_values[libelle] = [text]
     else:
         search_values[libelle] = None
     return query, active_search, search_values
@@ -421,72 +506,76 @@ def get_name_author(auteur: Optional[str]) -> Optional[str]:
 
 def paginate(
     active_seuil: str,
-    amendements: List[Amendement],
+    nb_amendements: int,
     seuil: str,
     object_articles_sorted: List[Article],
 ) -> bool:
     if active_seuil is None:
         if object_articles_sorted:
-            return len(amendements) >= int(seuil)
+            return nb_amendements >= int(seuil)
     else:
-        if int(active_seuil) != 0 and amendements:
+        if int(active_seuil) != 0 and nb_amendements:
             return True
     return False
 
 
-def get_sort_config(request: Request) -> Tuple[str, bool]:
+def get_sort_config(request: Request, default: str = "sort_key") -> Tuple[str, bool]:
 
     # Récupération de la clef pour le tri
-    sort_key = request.GET.get("sort_key", "sort_key")
+    sort_key = request.GET.get("sort_key", default)
     reverse = bool(request.GET.get("reverse", False))
 
     # Vérification que la clef de tri est autorisée
-    if sort_key not in ["num", "sort_key"]:
+    if sort_key not in ["num", "sort_key", default]:
         sort_key = "sort_key"
 
+    # Par pertinence, les meilleurs résultats en premier
+    if sort_key == "search_rank" and "reverse" not in request.GET:
+        reverse = True
+
     return (sort_key, reverse)
 
 
 def set_pagination(
     request: Request,
     active_seuil: str,
-    amendements: List[Amendement],
+    amendements_counts: Dict[int, int],
     seuil: str,
     object_articles_sorted: List[Article],
     article_session: str,
     lecture_pk: int,
 ) -> Dict[str, Any]:
-    pagination = paginate(active_seuil, amendements, seuil, object_articles_sorted)
+    """
+    The pagination shows one article at a time, the current one is returned so that
+    only its amendements are loaded
+
+    `amendements_counts` gives the number of amendements of each article (by pk).
+    """
+    pagination = paginate(
+        active_seuil, sum(amendements_counts.values()), seuil, object_articles_sorted
+    )
     if pagination:
-        try:
-            type_, num, mult, pos = request.GET.get(
-                "article_derouleur", article_session
-            ).split(".")
-        except Exception:
+        url_key = request.GET.get("article_derouleur", article_session)
+        if len(url_key.split(".")) != 4:
             # Par défaut sur l'article liminaire
-            type_, num, mult, pos = ("article", "0", "", "")
-
-        # Requéte pour récupérer les articles de la lecture possédant
-        # au moins un amendement
-        non_empty_articles_query = DBSession.query(Article).filter(
-            Article.lecture_pk == lecture_pk,
-            Amendement.article_pk == Article.pk,
-            Article.pk.in_(amdt.article_pk for amdt in amendements),  # type: ignore
-        )
-
-        current_article = non_empty_articles_query.filter(
-            Article.type == type_,
-            Article.num == num,
-            Article.mult == mult,
-            Article.pos == pos,
-        ).first()
+            url_key = "article.0.."
 
-        # Tri des articles
-        non_empty_articles_sorted = sorted(non_empty_articles_query.all())
+        # Articles de la lecture possédant au moins un amendement, déjà triés
+        non_empty_articles_sorted = [
+            article
+            for article in object_articles_sorted
+            if amendements_counts.get(article.pk)
+        ]
 
         # Si pas d'article courant on prend le premier
-        if not current_article:
-            current_article = non_empty_articles_sorted[0]
+        current_article = next(
+            (
+                article
+                for article in non_empty_articles_sorted
+                if article.url_key == url_key
+            ),
+            non_empty_articles_sorted[0],
+        )
 
         articles_titre_nums = [
             (str(article) or "Retiré", f"{article.url_key}")
@@ -496,10 +585,6 @@ def set_pagination(
         request.session[f"article_lecture_{lecture_pk}"] = f"{current_article.url_key}"
         page = non_empty_articles_sorted.index(current_article)
 
-        article_amendements = [
-            amdt for amdt in amendements if amdt.article_pk == current_article.pk
-        ]
-
         return {
             "pagination_data": {
                 "previous": get_previous(page, articles_titre_nums),
@@ -510,7 +595,7 @@ def set_pagination(
                 "last": get_last(page, articles_titre_nums),
                 "next": get_next(page, articles_titre_nums),
             },
-            "all_amendements": sorted(article_amendements),
+            "current_article": current_article,
             "page": page,
             "articles_titre_nums": articles_titre_nums,
             "article_title": current_article.format(short=False),
@@ -519,7 +604,7 @@ def set_pagination(
     else:
         return {
             "pagination_data": {},
-            "all_amendements": sorted(amendements),
+            "current_article": None,
             "page": 0,
             "articles_titre_nums": [],
             "article_title": "",